@@ -5,48 +5,76 @@ import os
 import threading
 from queue import Queue
 from collections import deque
+import sys
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from risk import RiskEngine
+
 # === CONFIG ===
 SYMBOL = "BTC/USD"
 TEST_TRADE_SIZE_USD = 10 
 TRADE_PORT = 5558
 TRADE_URL = f"tcp://127.0.0.1:{TRADE_PORT}"
 MAX_QUEUE_SIZE = 1000
+BARS_PER_YEAR = 525600  # Sharpe annualisation (1-min bars)
+VERBOSE = True  # Print every simulated fill
+VENUE = 'backtest'  # Venue of simulated fills in the risk engine
 
 equity_curve = []  # List to track equity at each trade close
 initial_capital = TEST_TRADE_SIZE_USD * 10  # Assume starting capital
 current_equity = initial_capital
 
-# === Backtest Mode - No real exchange ===
-print("BACKTEST MODE - No real trades executed")
-print(f"Listening on {TRADE_URL} for strategy orders")
-print(f"Trade size: ${TEST_TRADE_SIZE_USD} {SYMBOL}")
-print("-" * 60)
-
 # === Trade Records (for metrics) ===
-trades_df = pd.DataFrame(columns=[
+TRADE_COLUMNS = [
     'timestamp', 'strategy_name', 'symbol', 'order_type', 
     'entry_price', 'amount', 'exit_price', 'exit_time', 
     'pnl_pct', 'pnl_usd'
-])
+]
+trade_records = []  # Completed trades; appending to a DataFrame per fill is too slow for replays
 total_trades_count = 0
-current_positions = {}  # Track open positions: {symbol: {'entry_price': x, 'amount': y, 'strategy': z}}
+current_positions = {}  # Open longs for the trade records: {symbol: {'entry_price': x, 'amount': y, 'strategy': z}}
 
-# === ZMQ PULL socket ===
-context = zmq.Context()
-pull_sock = context.socket(zmq.PULL)
-pull_sock.bind(TRADE_URL)
-pull_sock.setsockopt(zmq.RCVTIMEO, 1000)
+# fill_model(order_type, symbol, price, amount, timestamp) -> (fill price, filled amount).
+# None fills everything at the order's price (no slippage); fill_sim.BookFillModel walks recorded depth
+fill_model = None
+
+# Same position/limit engine as the live trade daemon; orders it rejects aren't filled
+risk = RiskEngine()
 
 order_queue = Queue(maxsize=MAX_QUEUE_SIZE)
 
+def reset_state():
+    """Clear trades, positions and equity so the simulator can be reused in-process"""
+    global total_trades_count, current_equity
+    trade_records.clear()
+    total_trades_count = 0
+    current_positions.clear()
+    equity_curve.clear()
+    current_equity = initial_capital
+    risk.reset()
+
+def set_fill_model(model):
+    global fill_model
+    fill_model = model
+
+def set_risk_engine(engine):
+    global risk
+    risk = engine
+
+def risk_rejected(strategy_name, symbol, order_type, amount, price, timestamp):
+    """Run the pre-trade checks; True (and a warning) if the order is rejected"""
+    reason = risk.check(strategy_name, symbol, VENUE, order_type, amount, price, timestamp)
+    if reason is not None and VERBOSE:
+        print(f"[{time.strftime('%H:%M:%S')}] ⛔ {order_type} {symbol} rejected: {reason}")
+    return reason is not None
+
 def simulate_execution(order_data):
     """Simulate trade execution and track position"""
-    global total_trades_count
+    global total_trades_count, current_equity
     
     try:
         order_type = order_data['order_type']
@@ -56,17 +84,37 @@ def simulate_execution(order_data):
         
         amount = TEST_TRADE_SIZE_USD / price
         
-        timestamp = time.time()
+        # Use the order's own timestamp so replays are deterministic
+        timestamp = order_data.get('timestamp', time.time())
         
         if order_type == 'BUY':
-            # Open long position
-            current_positions[symbol] = {
-                'entry_price': price,
-                'amount': amount,
-                'strategy': strategy_name,
-                'entry_time': timestamp
-            }
-            print(f"[{time.strftime('%H:%M:%S')}] 📈 LONG {symbol} @ ${price:.6f} | Pos: {amount:.6f}")
+            if risk_rejected(strategy_name, symbol, order_type, amount, price, timestamp):
+                return
+            accepted = amount
+            if fill_model is not None:
+                price, amount = fill_model(order_type, symbol, price, amount, timestamp)
+                if amount <= 0:
+                    risk.release(strategy_name, symbol, VENUE, order_type, accepted)
+                    if VERBOSE:
+                        print(f"[{time.strftime('%H:%M:%S')}] ⚠️  No liquidity to buy {symbol}")
+                    return
+            risk.on_fill(strategy_name, symbol, VENUE, order_type, amount, price, accepted=accepted)
+            pos = current_positions.get(symbol)
+            if pos is None:
+                # Open long position
+                pos = current_positions[symbol] = {
+                    'entry_price': price,
+                    'amount': amount,
+                    'strategy': strategy_name,
+                    'entry_time': timestamp
+                }
+            else:
+                # Add to the long at the average entry, as the risk engine does
+                total = pos['amount'] + amount
+                pos['entry_price'] = (pos['entry_price'] * pos['amount'] + price * amount) / total
+                pos['amount'] = total
+            if VERBOSE:
+                print(f"[{time.strftime('%H:%M:%S')}] 📈 LONG {symbol} @ ${price:.6f} | Pos: {pos['amount']:.6f}")
             
         elif order_type == 'SELL':
             # Close long position (or open short - simplified)
@@ -74,6 +122,17 @@ def simulate_execution(order_data):
                 pos = current_positions[symbol]
                 entry_price = pos['entry_price']
                 entry_amount = pos['amount']
+                if risk_rejected(strategy_name, symbol, order_type, entry_amount, price, timestamp):
+                    return
+                accepted = entry_amount
+                if fill_model is not None:
+                    price, entry_amount = fill_model(order_type, symbol, price, entry_amount, timestamp)
+                    if entry_amount <= 0:
+                        risk.release(strategy_name, symbol, VENUE, order_type, accepted)
+                        if VERBOSE:
+                            print(f"[{time.strftime('%H:%M:%S')}] ⚠️  No liquidity to sell {symbol}")
+                        return
+                risk.on_fill(strategy_name, symbol, VENUE, order_type, entry_amount, price, accepted=accepted)
                 
                 # Calculate P&L
                 pnl_pct = (price - entry_price) / entry_price * 100
@@ -92,116 +151,159 @@ def simulate_execution(order_data):
                     'pnl_pct': pnl_pct,
                     'pnl_usd': pnl_usd
                 }
-                trades_df.loc[len(trades_df)] = trade_record
+                trade_records.append(trade_record)
                 total_trades_count += 1
                 
-                del current_positions[symbol]
-                print(f"[{time.strftime('%H:%M:%S')}] ✅ CLOSED {symbol} | P&L: {pnl_pct:+.2f}% (${pnl_usd:+.2f}) | Total: {total_trades_count}")
-            else:
+                if entry_amount < pos['amount']:
+                    pos['amount'] -= entry_amount  # Partial fill, the rest stays open
+                else:
+                    del current_positions[symbol]
+
+                current_equity += pnl_usd
+                equity_curve.append({
+                    'timestamp': timestamp,
+                    'equity': current_equity
+                })
+                if VERBOSE:
+                    print(f"[{time.strftime('%H:%M:%S')}] ✅ CLOSED {symbol} | P&L: {pnl_pct:+.2f}% (${pnl_usd:+.2f}) | Total: {total_trades_count}")
+            elif VERBOSE:
                 print(f"[{time.strftime('%H:%M:%S')}] ⚠️  No position to close: {symbol}")
-            
-            global current_equity
-            current_equity += pnl_usd
-            equity_curve.append({
-                'timestamp': timestamp,
-                'equity': current_equity
-            })
-
-        print("-" * 60)
+
+        if VERBOSE:
+            print("-" * 60)
         
     except Exception as e:
         print(f"ERROR simulating trade: {e}")
 
-def process_order_queue():
-    """Process orders from queue"""
-    while True:
-        try:
-            order_data = order_queue.get(timeout=1)
-            simulate_execution(order_data)
-            order_queue.task_done()
-        except:
-            continue
-
-# Start processing thread
-processing_thread = threading.Thread(target=process_order_queue, daemon=True)
-processing_thread.start()
-
-print("Backtest processor started...")
-print("Waiting for strategy orders...\n")
-
-# Main receive loop
-while True:
-    try:
-        msg = pull_sock.recv_string()
-        order_data = json.loads(msg)
-        
-        try:
-            order_queue.put(order_data, timeout=1)
-            queue_size = order_queue.qsize()
-            print(f"[{time.strftime('%H:%M:%S')}] 📨 Order queued: {order_data['order_type']} {order_data['symbol']} | Q: {queue_size}")
-        except:
-            print(f"[{time.strftime('%H:%M:%S')}] ⚠️ Queue full - dropping order")
-            
-    except zmq.Again:
-        continue
-    except KeyboardInterrupt:
-        break
-    except Exception as e:
-        print(f"Receive error: {e}")
-        time.sleep(0.1)
+def get_trades_df():
+    """Completed trades as a DataFrame"""
+    return pd.DataFrame(trade_records, columns=TRADE_COLUMNS)
 
-# === COMPUTE METRICS on shutdown ===
-print("\n" + "="*70)
-print("BACKTEST RESULTS")
-print("="*70)
+def compute_metrics(trades, equity, capital=None):
+    """Compute backtest metrics from completed trades and the equity curve.
 
-if len(trades_df) > 0:
+    trades is a DataFrame with at least pnl_pct/pnl_usd columns, equity a list of
+    {'timestamp', 'equity'} dicts (or a DataFrame with those columns).
+    Returns None when there are no completed trades.
+    """
+    if capital is None:
+        capital = initial_capital
+    if len(trades) == 0:
+        return None
 
     # Create equity DataFrame
-    equity_df = pd.DataFrame(equity_curve)
+    equity_df = pd.DataFrame(equity)
     equity_df.set_index('timestamp', inplace=True)
     
     # Calculate running peak and drawdown [web:11]
     equity_df['peak'] = equity_df['equity'].cummax()
     equity_df['drawdown_pct'] = (equity_df['equity'] - equity_df['peak']) / equity_df['peak'] * 100
-    equity_df['drawdown_usd'] = equity_df['drawdown_pct'] / 100 * initial_capital
+    equity_df['drawdown_usd'] = equity_df['drawdown_pct'] / 100 * capital
     
-    # Max drawdown metrics
-    max_dd_pct = equity_df['drawdown_pct'].min()
-    max_dd_usd = equity_df['drawdown_usd'].min()
-
-    completed_trades = trades_df['pnl_pct']
+    completed_trades = trades['pnl_pct'].astype(float)
     winning_trades = completed_trades > 0
     total_trades = len(completed_trades)
     
     # Basic metrics
-    win_rate = (len(winning_trades[winning_trades]) / total_trades) * 100
-    avg_profit_per_trade = completed_trades.mean()
-    avg_winner = completed_trades[winning_trades].mean() if len(winning_trades[winning_trades]) > 0 else 0
-    avg_loser = completed_trades[~winning_trades].mean() if len(completed_trades[~winning_trades]) > 0 else 0
+    avg_winner = completed_trades[winning_trades].mean() if winning_trades.any() else 0
+    avg_loser = completed_trades[~winning_trades].mean() if (~winning_trades).any() else 0
     
     # Sharpe (simplified - assumes 1-min bars)
     returns = completed_trades / 100  # Convert to decimal
-    sharpe_ratio = (returns.mean() / returns.std() * np.sqrt(525600)) if returns.std() > 0 else 0
-    
-    total_pnl_usd = trades_df['pnl_usd'].sum()
-    
-    print(f"Total trades:      {total_trades}")
-    print(f"Win rate:          {win_rate:.1f}%")
-    print(f"Max drawdown:      {max_dd_pct:.2f}%")
-    print(f"Max drawdown USD:  ${max_dd_usd:.2f}")
-    print(f"Avg P&L/trade:     {avg_profit_per_trade:.2f}%")
-    print(f"Avg winner:        {avg_winner:.2f}%")
-    print(f"Avg loser:         {avg_loser:.2f}%")
-    print(f"Profit factor:     {abs(avg_winner/avg_loser):.2f}" if avg_winner != 0 and avg_loser != 0 else "N/A")
-    print(f"Sharpe ratio:      {sharpe_ratio:.2f}")
-    print(f"Total P&L:         ${total_pnl_usd:.2f}")
-else:
-    print("No trades completed")
-
-print(f"Open positions: {len(current_positions)}")
-print("="*70)
-
-# Cleanup
-pull_sock.close()
-context.term()
+    std = returns.std()
+    sharpe_ratio = (returns.mean() / std * np.sqrt(BARS_PER_YEAR)) if std > 0 else 0
+
+    return {
+        'total_trades': total_trades,
+        'win_rate': winning_trades.sum() / total_trades * 100,
+        'max_dd_pct': equity_df['drawdown_pct'].min(),
+        'max_dd_usd': equity_df['drawdown_usd'].min(),
+        'avg_pnl_pct': completed_trades.mean(),
+        'avg_winner': avg_winner,
+        'avg_loser': avg_loser,
+        'profit_factor': abs(avg_winner / avg_loser) if avg_winner != 0 and avg_loser != 0 else np.nan,
+        'sharpe': sharpe_ratio,
+        'total_pnl_usd': trades['pnl_usd'].astype(float).sum(),
+    }
+
+def print_results(metrics, open_positions):
+    """Print the backtest summary in the same layout for every engine"""
+    print("\n" + "="*70)
+    print("BACKTEST RESULTS")
+    print("="*70)
+
+    if metrics is not None:
+        print(f"Total trades:      {metrics['total_trades']}")
+        print(f"Win rate:          {metrics['win_rate']:.1f}%")
+        print(f"Max drawdown:      {metrics['max_dd_pct']:.2f}%")
+        print(f"Max drawdown USD:  ${metrics['max_dd_usd']:.2f}")
+        print(f"Avg P&L/trade:     {metrics['avg_pnl_pct']:.2f}%")
+        print(f"Avg winner:        {metrics['avg_winner']:.2f}%")
+        print(f"Avg loser:         {metrics['avg_loser']:.2f}%")
+        print(f"Profit factor:     {metrics['profit_factor']:.2f}" if not np.isnan(metrics['profit_factor']) else "Profit factor:     N/A")
+        print(f"Sharpe ratio:      {metrics['sharpe']:.2f}")
+        print(f"Total P&L:         ${metrics['total_pnl_usd']:.2f}")
+    else:
+        print("No trades completed")
+
+    print(f"Open positions: {open_positions}")
+    print("="*70)
+
+def process_order_queue():
+    """Process orders from queue"""
+    while True:
+        try:
+            order_data = order_queue.get(timeout=1)
+            simulate_execution(order_data)
+            order_queue.task_done()
+        except:
+            continue
+
+
+if __name__ == '__main__':
+    # === Backtest Mode - No real exchange ===
+    print("BACKTEST MODE - No real trades executed")
+    print(f"Listening on {TRADE_URL} for strategy orders")
+    print(f"Trade size: ${TEST_TRADE_SIZE_USD} {SYMBOL}")
+    print("-" * 60)
+
+    # === ZMQ PULL socket ===
+    context = zmq.Context()
+    pull_sock = context.socket(zmq.PULL)
+    pull_sock.bind(TRADE_URL)
+    pull_sock.setsockopt(zmq.RCVTIMEO, 1000)
+
+    # Start processing thread
+    processing_thread = threading.Thread(target=process_order_queue, daemon=True)
+    processing_thread.start()
+
+    print("Backtest processor started...")
+    print("Waiting for strategy orders...\n")
+
+    # Main receive loop
+    while True:
+        try:
+            msg = pull_sock.recv_string()
+            order_data = json.loads(msg)
+            
+            try:
+                order_queue.put(order_data, timeout=1)
+                queue_size = order_queue.qsize()
+                print(f"[{time.strftime('%H:%M:%S')}] 📨 Order queued: {order_data['order_type']} {order_data['symbol']} | Q: {queue_size}")
+            except:
+                print(f"[{time.strftime('%H:%M:%S')}] ⚠️ Queue full - dropping order")
+                
+        except zmq.Again:
+            continue
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            print(f"Receive error: {e}")
+            time.sleep(0.1)
+
+    # === COMPUTE METRICS on shutdown ===
+    print_results(compute_metrics(get_trades_df(), equity_curve), len(current_positions))
+
+    # Cleanup
+    pull_sock.close()
+    context.term()
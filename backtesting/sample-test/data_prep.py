@@ -4,15 +4,16 @@ import numpy as np
 import pandas as pd
 import os
 import time
-import struct
+import argparse
+import sys
+from functools import partial
 
-#just data out to 5557
-
-#config ports
-context = zmq.Context()
-pub_socket = context.socket(zmq.PUB)
-pub_socket.bind("tcp://*:5557")  # Signals back to backtester
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from replay_feed import ReplayServer
+from quote_batch import QuoteBatcher, pack_batches
+from quote_codec import QuoteEncoder, topic
 
+#just data out to 5557
 
 #import data
 PROJ_PATH = "/home/asus_laptop/projects/trading_bot/"
@@ -22,64 +23,163 @@ DATAFILE_PATH = os.path.join(
     "btcusd-m1-bid-2025-03-19-2025-12-18T08-48.csv",
 )
 
-# load data
-print("Loading data from:", DATAFILE_PATH)
-df = pd.read_csv(DATAFILE_PATH)
-
-# timestamp to datetime and index
-df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-df = df.set_index("timestamp")
-
 # simulate bid/ask from mid
 avg_spread_pct = 0.00005     # 0.005%
 std_spread_pct = 0.00025     # 0.025%
 
-df["mid"] = (df["open"] + df["close"]) / 2
-
-spread_pct = np.clip(
-    np.random.normal(avg_spread_pct, std_spread_pct, size=len(df)),
-    0,
-    None,
-)
-
-mid = df["mid"].to_numpy()
-half_spread = mid * spread_pct / 2
-
-df["bid"] = (mid - half_spread).round(2)
-df["ask"] = (mid + half_spread).round(2)
-
 # time to send data
 SYMBOL = "BTC/USD"  # or whatever you want, padded to 16 bytes like ccxt script
-
-print(f"Replaying {len(df)} rows over tcp://*:5557 as bid/ask stream...")
-
-try:
-    for idx, row in df.iterrows():
-        bid = float(row["bid"])
-        ask = float(row["ask"])
-        ts  = idx.timestamp()  # float UNIX timestamp
-
-        # pack: bid (double), ask (double), timestamp (double), symbol (16-byte string)
-        msg = struct.pack(
-            "!ddd16s",
-            bid,
-            ask,
-            ts,
-            SYMBOL.encode().ljust(16, b"\0")
-        )
-        pub_socket.send(msg)
-        # Optional: slow down so it looks like a live feed
-        #time.sleep(0.01)
-
-        # Optional: print occasionally
-        # print(f"{idx}  bid={bid:.2f} ask={ask:.2f}")
-
-except KeyboardInterrupt:
-    print("\nReplay stopped by user.")
-
-# 
-
-pub_socket.close()
-context.term()
-
-print("Data replay finished.")
+PUB_URL = "tcp://*:5557"
+CONTROL_URL = "tcp://*:5559"  # Subscriber handshake / credit channel
+REPORT_EVERY = 5  # Seconds between ticks/sec reports
+
+
+def load_quotes(path=DATAFILE_PATH, seed=None):
+    """Load a Backtest Manager OHLCV CSV and simulate bid/ask around the bar mid.
+
+    Returns a DataFrame indexed by timestamp with mid/bid/ask columns.
+    Pass a seed to get the same simulated spread on every run.
+    """
+    print("Loading data from:", path)
+    df = pd.read_csv(path)
+
+    # timestamp to datetime and index
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df = df.set_index("timestamp")
+
+    df["mid"] = (df["open"] + df["close"]) / 2
+
+    rng = np.random.default_rng(seed)
+    spread_pct = np.clip(
+        rng.normal(avg_spread_pct, std_spread_pct, size=len(df)),
+        0,
+        None,
+    )
+
+    mid = df["mid"].to_numpy()
+    half_spread = mid * spread_pct / 2
+
+    df["bid"] = (mid - half_spread).round(2)
+    df["ask"] = (mid + half_spread).round(2)
+    return df
+
+
+def iter_csv_chunks(path, seed=None, model_spec="normal"):
+    """(ts ns, bid, ask) array chunks synthesized from a CSV, cached when seeded"""
+    import quote_synth
+    model = quote_synth.load_model(model_spec)
+    for chunk in quote_synth.iter_quote_chunks(path, seed, model):
+        yield chunk["ts"], chunk["bid"], chunk["ask"]
+
+
+def iter_recording_chunks(root, exchange, symbol, start=None, end=None):
+    """(ts ns, bid, ask) array chunks from quoting/recorder.py files, one per hour"""
+    from recording import iter_quote_chunks
+    from tick_store import to_ns
+    for records in iter_quote_chunks(root, exchange, symbol, to_ns(start), to_ns(end)):
+        yield (records["exch_ts_ns"].astype(np.int64), records["bid"].astype(np.float64),
+               records["ask"].astype(np.float64))
+
+
+def iter_store_chunks(root, exchange, symbol, start=None, end=None):
+    """(ts ns, bid, ask) array chunks, one per stored day"""
+    from tick_store import iter_range
+    for cols in iter_range(root, exchange, symbol, start, end):
+        yield cols["ts"], cols["bid"], cols["ask"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Data Prep',
+                    description='Replay historical OHLCV data as a bid/ask quote stream.')
+
+    parser.add_argument('--data', type=str, default=DATAFILE_PATH, help='OHLCV CSV file to replay')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the simulated spread (seeded runs are cached)')
+    parser.add_argument('--model', type=str, default='normal',
+                        help="Spread model: 'constant:PCT', 'normal[:MEAN,STD]' or a fitted model JSON")
+    parser.add_argument('--store', type=str, help='Replay from this tick store root instead of a CSV')
+    parser.add_argument('--recording', type=str, help='Replay quoting/recorder.py files under this root instead of a CSV')
+    parser.add_argument('--exchange', type=str, default='binance', help='Tick store / recording exchange')
+    parser.add_argument('--start', type=str, help='Tick store / recording range start, e.g. 2025-06-01')
+    parser.add_argument('--end', type=str, help='Tick store / recording range end (exclusive)')
+    parser.add_argument('--flow', choices=['credit', 'push'], default='credit',
+                        help='credit: PUB to N subscribers with credit flow control; push: PUSH/PULL to one consumer')
+    parser.add_argument('--subscribers', type=int, default=1, help='Subscribers to wait for before replaying')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='0 = max throughput, 1 = real time, N = N x the original timestamps')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='Quotes per frame (1 = classic single-record messages)')
+    parser.add_argument('--batch_ms', type=float, default=5, help='Max age of a partial batch in ms')
+
+    args = parser.parse_args()
+
+    #config ports
+    context = zmq.Context()
+    server = ReplayServer(context, PUB_URL, CONTROL_URL, args.flow, args.subscribers)
+
+    # load data
+    if args.recording:
+        chunks = iter_recording_chunks(args.recording, args.exchange, SYMBOL, args.start, args.end)
+        print(f"Replaying {args.exchange} {SYMBOL} from {args.recording} over {PUB_URL} as bid/ask stream...")
+    elif args.store:
+        chunks = iter_store_chunks(args.store, args.exchange, SYMBOL, args.start, args.end)
+        print(f"Replaying {args.exchange} {SYMBOL} from {args.store} over {PUB_URL} as bid/ask stream...")
+    else:
+        chunks = iter_csv_chunks(args.data, args.seed, args.model)
+        print(f"Replaying {args.data} over {PUB_URL} as bid/ask stream...")
+
+    server.wait_for_subscribers()
+
+    # Stored/recorded data keeps its exchange id; synthesized CSV quotes go out as 'replay'
+    exchange = args.exchange if args.store or args.recording else "replay"
+    encoder = QuoteEncoder(exchange, SYMBOL)
+    send = partial(server.send, topic=topic(exchange, SYMBOL))  # Same topics as the live quote bus
+    batcher = QuoteBatcher(send, encoder, args.batch, args.batch_ms / 1000)
+    add_quote = batcher.add
+    wall_start = time.perf_counter()
+    last_report, last_count = wall_start, 0
+    first_ts = None
+    ticks = 0
+
+    try:
+        for ts_arr, bid_arr, ask_arr in chunks:
+            if args.speed <= 0 and args.batch > 1:
+                # Max throughput: build the whole chunk's frames in NumPy
+                for frame in pack_batches(bid_arr, ask_arr, ts_arr, encoder, args.batch):
+                    send(frame)
+                ticks += len(ts_arr)
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY:
+                    print(f"  {ticks:,} ticks | {(ticks - last_count) / (now - last_report):,.0f} ticks/sec")
+                    last_report, last_count = now, ticks
+                continue
+
+            for ts, bid, ask in zip(ts_arr.tolist(), bid_arr.tolist(), ask_arr.tolist()):
+                if args.speed > 0:
+                    # Pace against the original timestamps
+                    if first_ts is None:
+                        first_ts = ts
+                    delay = (ts - first_ts) / 1e9 / args.speed - (time.perf_counter() - wall_start)
+                    if delay > 0.001:
+                        batcher.flush()  # Don't hold quotes back while we wait
+                        time.sleep(delay)
+
+                # quote_codec record: exchange, seq, exchange/publish ns timestamps, bid, ask, symbol
+                add_quote(bid, ask, ts)
+                ticks += 1
+
+                if ticks % 10000 == 0:
+                    now = time.perf_counter()
+                    if now - last_report >= REPORT_EVERY:
+                        print(f"  {ticks:,} ticks | {(ticks - last_count) / (now - last_report):,.0f} ticks/sec")
+                        last_report, last_count = now, ticks
+
+    except KeyboardInterrupt:
+        print("\nReplay stopped by user.")
+
+    batcher.flush()
+    elapsed = time.perf_counter() - wall_start
+    server.close()
+    context.term()
+
+    print(f"Data replay finished: {ticks:,} ticks in {server.sent:,} frames, {elapsed:.1f}s ({ticks / max(elapsed, 1e-9):,.0f} ticks/sec)")
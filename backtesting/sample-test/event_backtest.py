@@ -0,0 +1,134 @@
+# Event-driven backtest harness
+# Feeds historical quotes straight into a strategy object's on_quote() and routes
+# its orders to backtester_core.simulate_execution with plain function calls.
+# No sockets, so no slow-joiner drops and the same input always gives the same trades.
+#
+# With --book, fills walk recorded L2 depth from the tick store (fill_sim.py)
+# instead of filling at the quote price:
+#
+#   python3 event_backtest.py --book data/store --exchange binance
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+import backtester_core
+from backtester_core import compute_metrics, print_results
+from data_prep import DATAFILE_PATH
+import quote_synth
+from fill_sim import BookReplay, BookFillModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'strategies'))
+from strategy_dual_ema import DualEmaStrategy
+from strategy_stat_arb import StatArbStrategy
+import strategy_dual_ema
+import strategy_stat_arb
+
+
+def simulated_order_sender(order_log=None):
+    """send_order callback that executes directly against backtester_core"""
+    def send_order(order_type, symbol, price, strategy_name, ts=None):
+        order = {
+            'order_type': order_type,
+            'symbol': symbol,
+            'price': price,
+            'strategy_name': strategy_name,
+            'timestamp': ts
+        }
+        if order_log is not None:
+            order_log.append(order)
+        backtester_core.simulate_execution(order)
+        return True
+    return send_order
+
+
+def merge_streams(*streams):
+    """Merge (symbol, ts, bid, ask) array streams into one time-ordered tick list.
+
+    Ticks with equal timestamps keep the order the streams were passed in.
+    """
+    symbols = np.concatenate([np.full(len(s[1]), i, dtype=np.int32) for i, s in enumerate(streams)])
+    ts = np.concatenate([s[1] for s in streams])
+    bid = np.concatenate([s[2] for s in streams])
+    ask = np.concatenate([s[3] for s in streams])
+    order = np.lexsort((symbols, ts))
+    names = [s[0] for s in streams]
+    return (bid[order].tolist(), ask[order].tolist(), ts[order].tolist(),
+            [names[i] for i in symbols[order]])
+
+
+def run_backtest(strategy, ticks, replay=None):
+    """Replay ticks (bids, asks, timestamps, symbols) through strategy.on_quote.
+
+    A fill_sim.BookReplay is advanced to each tick's timestamp first, so fills
+    see the book as of the quote. Resets backtester_core first.
+    Returns (trades_df, equity_curve, open_positions, ticks/sec).
+    """
+    backtester_core.reset_state()
+    on_quote = strategy.on_quote
+    bids, asks, tss, symbols = ticks
+
+    start = time.perf_counter()
+    if replay is None:
+        for bid, ask, ts, symbol in zip(bids, asks, tss, symbols):
+            on_quote(bid, ask, ts, symbol)
+    else:
+        advance_to = replay.advance_to
+        for bid, ask, ts, symbol in zip(bids, asks, tss, symbols):
+            advance_to(int(ts * 1e9))
+            on_quote(bid, ask, ts, symbol)
+    elapsed = time.perf_counter() - start
+
+    rate = len(tss) / elapsed if elapsed > 0 else float('inf')
+    return (backtester_core.get_trades_df(), list(backtester_core.equity_curve),
+            len(backtester_core.current_positions), rate)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Event Backtest',
+                    description='Replay historical quotes through a strategy object in-process.')
+
+    parser.add_argument('--strategy', choices=['dual_ema', 'stat_arb'], default='dual_ema')
+    parser.add_argument('--data', type=str, default=DATAFILE_PATH, help='OHLCV CSV (SYMBOL1 for stat_arb)')
+    parser.add_argument('--data2', type=str, help='OHLCV CSV for SYMBOL2 (stat_arb only)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated spread (cached per seed)')
+    parser.add_argument('--verbose', action='store_true', help='Print every signal and fill')
+    parser.add_argument('--book', type=str, help='Tick store root with recorded L2 depth; fills walk the book')
+    parser.add_argument('--exchange', type=str, default='binance', help='Exchange of the recorded depth')
+    parser.add_argument('--bars', type=float, metavar='SECONDS',
+                        help='Run the strategy on time-aligned bars of this many seconds')
+
+    args = parser.parse_args()
+    backtester_core.VERBOSE = args.verbose
+    send_order = simulated_order_sender()
+
+    if args.strategy == 'dual_ema':
+        ts, bid, ask = quote_synth.quote_arrays(args.data, args.seed)
+        ticks = merge_streams((strategy_dual_ema.SYMBOL, ts, bid, ask))
+        strategy = DualEmaStrategy(send_order, verbose=args.verbose, bar_interval=args.bars)
+    else:
+        if not args.data2:
+            parser.error('--data2 is required for stat_arb')
+        ts1, bid1, ask1 = quote_synth.quote_arrays(args.data, args.seed)
+        ts2, bid2, ask2 = quote_synth.quote_arrays(args.data2, args.seed + 1)
+        ticks = merge_streams((strategy_stat_arb.SYMBOL1, ts1, bid1, ask1),
+                              (strategy_stat_arb.SYMBOL2, ts2, bid2, ask2))
+        strategy = StatArbStrategy(send_order, verbose=args.verbose, bar_interval=args.bars)
+
+    replay = fill_model = None
+    if args.book:
+        if args.strategy != 'dual_ema':
+            parser.error('--book supports one symbol (dual_ema)')
+        replay = BookReplay(args.book, args.exchange, strategy_dual_ema.SYMBOL)
+        fill_model = BookFillModel(replay)
+    backtester_core.set_fill_model(fill_model)
+
+    trades, equity, open_positions, rate = run_backtest(strategy, ticks, replay)
+
+    print_results(compute_metrics(trades, equity), open_positions)
+    print(f"Ticks: {len(ticks[0])} | {rate:,.0f} ticks/sec")
+    if fill_model is not None and fill_model.slippage:
+        print(f"Book updates: {replay.updates} | avg slippage {np.mean(fill_model.slippage):.2f} bps "
+              f"over {len(fill_model.slippage)} fills")
@@ -0,0 +1,202 @@
+# L2 fill simulator
+#
+# Replays recorded depth from the tick store (tick_store.iter_range(book=True))
+# into a tools/order_book.py book and fills orders against it:
+#
+#   - market orders walk the book level by level (VWAP of the levels taken)
+#   - limit orders that cross fill like a market order up to their price; the
+#     rest rests at the back of the queue: queue_ahead starts at the level's
+#     size plus what our earlier orders at that price still have open, and
+#     every order's queue_ahead shrinks by the volume that leaves the level
+#     (trades and cancels ahead of us). An order fills once queue_ahead would
+#     go negative (the overflow is our fill) or once the opposite side trades
+#     through our price.
+#
+# backtester_core uses it through set_fill_model(BookFillModel(replay)); the
+# event backtest advances the replay to each quote's timestamp before on_quote.
+# Strategies only send market orders, so BookFillModel only calls market();
+# limit() and the queue model are for driving a BookReplay directly.
+import os
+import sys
+import math
+import numpy as np
+
+import tick_store
+from tick_store import BOOK_CLEAR
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from order_book import OrderBook, walk_levels
+from quote_codec import BID, ASK
+
+
+class LimitOrder:
+    __slots__ = ('order_id', 'side', 'price', 'qty', 'filled', 'queue_ahead', 'fill_cost')
+
+    def __init__(self, order_id, side, price, qty, queue_ahead):
+        self.order_id = order_id
+        self.side = side  # BID = buy, ASK = sell
+        self.price = price
+        self.qty = qty
+        self.filled = 0.0
+        self.queue_ahead = queue_ahead
+        self.fill_cost = 0.0  # Sum of price * qty filled
+
+    @property
+    def remaining(self):
+        return self.qty - self.filled
+
+    @property
+    def avg_price(self):
+        return self.fill_cost / self.filled if self.filled else math.nan
+
+
+class BookReplay:
+    """Stored book events applied in time order, with resting limit orders matched as levels change"""
+
+    def __init__(self, root, exchange, symbol, start=None, end=None, on_fill=None):
+        self.book = OrderBook(symbol, record_deltas=False)
+        self.on_fill = on_fill  # on_fill(order, qty, price, ts_ns)
+        self.orders = {}
+        self.resting = {}  # (side, price) -> [LimitOrder], price-time order
+        self.next_id = 0
+        self.ts_ns = 0
+        self.updates = 0
+        self._chunks = tick_store.iter_range(root, exchange, symbol, start, end, book=True)
+        self._rows = iter(())
+        self._pending = None  # First row past the last advance_to
+
+    def _next_row(self):
+        while True:
+            row = next(self._rows, None)
+            if row is not None:
+                return row
+            cols = next(self._chunks, None)
+            if cols is None:
+                return None
+            self._rows = zip(cols['ts'].tolist(), cols['side'].tolist(), cols['price'].tolist(),
+                             cols['size'].tolist(), cols['kind'].tolist())
+
+    def advance_to(self, ts_ns):
+        """Apply every book event with timestamp <= ts_ns"""
+        sides = self.book.sides
+        resting = self.resting
+        row = self._pending or self._next_row()
+        n = 0
+        while row is not None and row[0] <= ts_ns:
+            t, side, price, size, kind = row
+            if kind == BOOK_CLEAR:
+                self.book.bids.clear()
+                self.book.asks.clear()
+            else:
+                prev = sides[side].set(price, size)
+                if resting:
+                    self._on_level(t, side, price, prev, size)
+            n += 1
+            row = self._next_row()
+        self._pending = row
+        self.updates += n
+        self.ts_ns = ts_ns
+        return n
+
+    def run(self):
+        """Apply every remaining event. Returns the number applied"""
+        return self.advance_to(math.inf)
+
+    # --- orders ---
+
+    def market(self, side, qty):
+        """Take qty from the book. side is BID to buy (walks asks) or ASK to sell.
+
+        Returns (avg_price, filled_qty). The book itself isn't changed: replayed
+        depth already contains the market's reaction, not ours.
+        """
+        return self.book.vwap(ASK if side == BID else BID, qty)
+
+    def limit(self, side, price, qty):
+        """Place a limit order. Crossing quantity fills now; the rest joins the queue"""
+        order = LimitOrder(self.next_id, side, price, qty, 0.0)
+        self.next_id += 1
+        opposite = ASK if side == BID else BID
+        prices, sizes = self.book.depth(opposite)
+        crossing = prices <= price if side == BID else prices >= price
+        n = int(np.argmin(crossing)) if not crossing.all() else len(crossing)
+        if n:
+            avg, filled = walk_levels(prices[:n], sizes[:n], qty)
+            self._fill(order, filled, avg)
+        if order.remaining > 0:
+            queue = self.resting.setdefault((side, price), [])
+            order.queue_ahead = self.book.sides[side].size_at(price) + sum(o.remaining for o in queue)
+            self.orders[order.order_id] = order
+            queue.append(order)
+        return order
+
+    def cancel(self, order_id):
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            self._unrest(order)
+        return order
+
+    def _fill(self, order, qty, price):
+        if qty <= 0:
+            return
+        order.filled += qty
+        order.fill_cost += qty * price
+        if self.on_fill is not None:
+            self.on_fill(order, qty, price, self.ts_ns)
+
+    def _unrest(self, order):
+        queue = self.resting[(order.side, order.price)]
+        i = queue.index(order)
+        for behind in queue[i + 1:]:
+            behind.queue_ahead = max(behind.queue_ahead - order.remaining, 0.0)
+        del queue[i]
+        if not queue:
+            del self.resting[(order.side, order.price)]
+
+    def _on_level(self, ts_ns, side, price, prev, size):
+        """Match resting orders against one level change"""
+        self.ts_ns = ts_ns
+        queue = self.resting.get((side, price))
+        if queue and size < prev:
+            # Volume left the level: it came out of the queue ahead of every resting
+            # order (each order's queue_ahead already counts our orders before it)
+            consumed = prev - size
+            for order in list(queue):
+                order.queue_ahead -= consumed
+                if order.queue_ahead >= 0:
+                    continue
+                take = min(order.remaining, -order.queue_ahead)
+                order.queue_ahead = 0.0
+                self._fill(order, take, order.price)
+                if order.remaining <= 0:
+                    self._done(order)
+        # Opposite side quoting through a resting price means we'd have traded
+        if size > 0:
+            for (order_side, order_price), orders in list(self.resting.items()):
+                if order_side == side:
+                    continue
+                if (order_side == BID and price <= order_price) or (order_side == ASK and price >= order_price):
+                    for order in list(orders):
+                        self._fill(order, order.remaining, order.price)
+                        self._done(order)
+
+    def _done(self, order):
+        self.orders.pop(order.order_id, None)
+        self._unrest(order)
+
+
+class BookFillModel:
+    """backtester_core fill model: market orders walk the replayed book"""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.slippage = []  # Fill price vs the order's price, in bps (positive = worse)
+
+    def __call__(self, order_type, symbol, price, amount, timestamp):
+        side = BID if order_type == 'BUY' else ASK
+        fill_price, filled = self.replay.market(side, amount)
+        if filled <= 0:
+            return price, 0.0
+        worse = fill_price - price if side == BID else price - fill_price
+        self.slippage.append(worse / price * 1e4)
+        return fill_price, filled
@@ -0,0 +1,174 @@
+# Parameter sweep optimizer
+# Grid or random search over strategy constants (EMA_FAST/EMA_SLOW/TIME_PERIOD,
+# LOOKBACK/ENTRY_Z/EXIT_Z/TIME_PERIOD). Parameter sets fan out over a
+# ProcessPoolExecutor; the price arrays are loaded once and shared with the
+# workers through shared memory instead of being pickled per task.
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+import backtester_core
+from backtester_core import compute_metrics
+from data_prep import DATAFILE_PATH
+from vector_backtest import align_arrays, run_dual_ema, run_stat_arb
+import quote_synth
+
+# Strategy constant -> engine keyword, per strategy
+PARAMS = {
+    'dual_ema': {'EMA_FAST': 'ema_fast', 'EMA_SLOW': 'ema_slow', 'TIME_PERIOD': 'time_period'},
+    'stat_arb': {'LOOKBACK': 'lookback', 'ENTRY_Z': 'entry_z', 'EXIT_Z': 'exit_z', 'TIME_PERIOD': 'time_period'},
+}
+ENGINES = {'dual_ema': run_dual_ema, 'stat_arb': run_stat_arb}
+METRIC_COLUMNS = ['total_trades', 'sharpe', 'max_dd_pct', 'win_rate', 'profit_factor',
+                  'avg_pnl_pct', 'total_pnl_usd']
+
+# Set in each worker by _attach_arrays
+_worker_arrays = None
+_worker_shm = None
+
+
+def share_arrays(arrays):
+    """Copy float64 arrays into shared memory blocks.
+
+    Returns (blocks, specs) where specs is the picklable (name, length) list
+    workers use to attach. Caller must close() and unlink() the blocks.
+    """
+    blocks, specs = [], []
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf)[:] = arr
+        blocks.append(shm)
+        specs.append((shm.name, len(arr)))
+    return blocks, specs
+
+
+def _attach_arrays(specs):
+    """Worker initializer: map the shared blocks as read-only NumPy arrays"""
+    global _worker_arrays, _worker_shm
+    backtester_core.VERBOSE = False  # The engines fill through simulate_execution
+    _worker_shm = [shared_memory.SharedMemory(name=name) for name, _ in specs]
+    _worker_arrays = []
+    for shm, (_, length) in zip(_worker_shm, specs):
+        arr = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+        arr.flags.writeable = False
+        _worker_arrays.append(arr)
+
+
+def evaluate(strategy, params):
+    """Run one parameter set against the worker's shared arrays -> metrics row"""
+    names = PARAMS[strategy]
+    kwargs = {names[k]: v for k, v in params.items()}
+    trades, equity, _ = ENGINES[strategy](*_worker_arrays, **kwargs)
+    metrics = compute_metrics(trades, equity) or {'total_trades': 0}
+    row = dict(params)
+    row.update({k: metrics.get(k, np.nan) for k in METRIC_COLUMNS})
+    return row
+
+
+def valid_params(strategy, params):
+    """Drop combinations the strategy logic can't use"""
+    if strategy == 'dual_ema':
+        return params.get('EMA_FAST', 0) < params.get('EMA_SLOW', np.inf)
+    return params.get('EXIT_Z', 0) < params.get('ENTRY_Z', np.inf)
+
+
+def grid_search_space(strategy, grid):
+    """All valid combinations of a {name: [values]} grid"""
+    keys = list(grid)
+    combos = (dict(zip(keys, values)) for values in itertools.product(*grid.values()))
+    return [p for p in combos if valid_params(strategy, p)]
+
+
+def random_search_space(strategy, grid, n, seed=None):
+    """n distinct valid combinations sampled from a {name: [values]} grid"""
+    space = grid_search_space(strategy, grid)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(space), size=min(n, len(space)), replace=False)
+    return [space[i] for i in sorted(picks)]
+
+
+def optimize(strategy, arrays, param_sets, workers=None, rank_by='sharpe'):
+    """Evaluate every parameter set in parallel -> DataFrame ranked best first"""
+    blocks, specs = share_arrays(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_arrays,
+                                 initargs=(specs,)) as pool:
+            chunksize = max(1, len(param_sets) // ((workers or os.cpu_count() or 1) * 4))
+            rows = list(pool.map(evaluate, itertools.repeat(strategy), param_sets,
+                                 chunksize=chunksize))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    # Every metric is better when larger (drawdown is stored as a negative pct)
+    table = pd.DataFrame(rows)
+    return table.sort_values(rank_by, ascending=False, na_position='last').reset_index(drop=True)
+
+
+def parse_range(spec):
+    """'5:20:5' -> [5, 10, 15, 20] (inclusive), '60,300' -> [60, 300]"""
+    cast = float if '.' in spec else int
+    if ':' in spec:
+        start, stop, step = (cast(x) for x in spec.split(':'))
+        values = np.arange(start, stop + step / 2, step)
+        return [cast(round(v, 10)) for v in values]
+    return [cast(x) for x in spec.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Optimizer',
+                    description='Parallel grid/random search over strategy parameters.')
+
+    parser.add_argument('--strategy', choices=list(PARAMS), default='dual_ema')
+    parser.add_argument('--data', type=str, default=DATAFILE_PATH, help='OHLCV CSV (SYMBOL1 for stat_arb)')
+    parser.add_argument('--data2', type=str, help='OHLCV CSV for SYMBOL2 (stat_arb only)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated spread (cached per seed)')
+    parser.add_argument('--grid', nargs='+', required=True,
+                        help='NAME=start:stop:step or NAME=v1,v2 e.g. EMA_FAST=5:20:1 EMA_SLOW=20:100:5')
+    parser.add_argument('--random', type=int, default=0, help='Sample N combinations instead of the full grid')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--rank_by', choices=METRIC_COLUMNS, default='sharpe')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print')
+    parser.add_argument('--out', type=str, help='Optional CSV for the full ranked table')
+
+    args = parser.parse_args()
+
+    grid = {}
+    for item in args.grid:
+        name, spec = item.split('=', 1)
+        if name not in PARAMS[args.strategy]:
+            parser.error(f"{name} is not a {args.strategy} parameter ({', '.join(PARAMS[args.strategy])})")
+        grid[name] = parse_range(spec)
+
+    if args.strategy == 'dual_ema':
+        arrays = quote_synth.quote_arrays(args.data, args.seed)
+    else:
+        if not args.data2:
+            parser.error('--data2 is required for stat_arb')
+        arrays = align_arrays(*quote_synth.quote_arrays(args.data, args.seed),
+                              *quote_synth.quote_arrays(args.data2, args.seed + 1))
+
+    if args.random:
+        param_sets = random_search_space(args.strategy, grid, args.random, args.seed)
+    else:
+        param_sets = grid_search_space(args.strategy, grid)
+
+    print(f"Evaluating {len(param_sets)} parameter sets over {len(arrays[0])} rows...")
+    start = time.perf_counter()
+    table = optimize(args.strategy, arrays, param_sets, args.workers, args.rank_by)
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s ({len(param_sets) / elapsed:.1f} sets/sec)\n")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.head(args.top).to_string(index=False))
+
+    if args.out:
+        table.to_csv(args.out, index=False)
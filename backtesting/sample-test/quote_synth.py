@@ -0,0 +1,177 @@
+# Seeded, chunked bid/ask synthesis
+# Streams an OHLCV CSV in fixed-size chunks and simulates bid/ask around the bar
+# mid with a pluggable spread model. Outputs are cached as tick_store column
+# files keyed by (source file, seed, model), so repeat runs just memory-map them.
+#
+# Spread models (fraction of mid, full spread):
+#   {'model': 'constant', 'spread_pct': 0.00005}
+#   {'model': 'normal', 'mean': 0.00005, 'std': 0.00025}   clipped at 0, as data_prep
+#   {'model': 'empirical', 'quantiles': [...]}             from fit_spread_model()
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+import tick_store
+from data_prep import avg_spread_pct, std_spread_pct, DATAFILE_PATH
+
+CHUNK_ROWS = 100_000
+DEFAULT_MODEL = {'model': 'normal', 'mean': avg_spread_pct, 'std': std_spread_pct}
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'quote_cache')
+
+
+def fit_spread_model(bid, ask, n_quantiles=101):
+    """Fit an empirical spread model from real L1 quotes"""
+    bid = np.asarray(bid, dtype=np.float64)
+    ask = np.asarray(ask, dtype=np.float64)
+    mid = (bid + ask) / 2
+    ok = (mid > 0) & (ask >= bid)
+    spread_pct = (ask[ok] - bid[ok]) / mid[ok]
+    if len(spread_pct) == 0:
+        raise ValueError("No valid bid/ask rows to fit a spread model")
+    qs = np.quantile(spread_pct, np.linspace(0, 1, n_quantiles))
+    return {'model': 'empirical', 'quantiles': qs.tolist()}
+
+
+def sample_spread(rng, model, n):
+    """Draw n spread fractions from the model, consuming rng in stream order"""
+    kind = model['model']
+    if kind == 'constant':
+        return np.full(n, float(model['spread_pct']))
+    if kind == 'normal':
+        return np.clip(rng.normal(model['mean'], model['std'], size=n), 0, None)
+    if kind == 'empirical':
+        qs = np.asarray(model['quantiles'])
+        return np.interp(rng.random(n), np.linspace(0, 1, len(qs)), qs)
+    raise ValueError(f"Unknown spread model: {kind}")
+
+
+def generate_chunks(path, seed=None, model=DEFAULT_MODEL, chunk_rows=CHUNK_ROWS, decimals=2):
+    """Yield {'ts', 'bid', 'ask', 'mid'} chunks (ts in int64 ns) for an OHLCV CSV.
+
+    The spread stream doesn't depend on chunk_rows: the same seed gives the same
+    quotes as data_prep.load_quotes for the default normal model.
+    """
+    rng = np.random.default_rng(seed)
+    for df in pd.read_csv(path, chunksize=chunk_rows, usecols=['timestamp', 'open', 'close']):
+        mid = ((df['open'] + df['close']) / 2).to_numpy(dtype=np.float64)
+        half_spread = mid * sample_spread(rng, model, len(mid)) / 2
+        yield {
+            'ts': df['timestamp'].to_numpy(dtype=np.int64) * 1_000_000,  # ms -> ns
+            'bid': (mid - half_spread).round(decimals),
+            'ask': (mid + half_spread).round(decimals),
+            'mid': mid,
+        }
+
+
+def cache_key(path, seed, model, decimals=2):
+    st = os.stat(path)
+    ident = {
+        'source': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'seed': seed,
+        'model': model,
+        'decimals': decimals,
+    }
+    return hashlib.sha1(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def ensure_cached(path, seed, model=DEFAULT_MODEL, cache_root=DEFAULT_CACHE, chunk_rows=CHUNK_ROWS):
+    """Generate the quotes into the cache if they aren't there yet -> cache directory"""
+    if seed is None:
+        raise ValueError("Caching needs a seed: unseeded quotes differ on every run")
+    final = os.path.join(cache_root, cache_key(path, seed, model))
+    if os.path.isdir(final):
+        return final
+
+    tmp = final + f'.tmp{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        files = {name: open(tick_store.column_file(tmp, name), 'wb') for name in tick_store.COLUMNS}
+        try:
+            for chunk in generate_chunks(path, seed, model, chunk_rows):
+                for name, f in files.items():
+                    np.ascontiguousarray(chunk[name], dtype=tick_store.COLUMNS[name]).tofile(f)
+        finally:
+            for f in files.values():
+                f.close()
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'source': os.path.abspath(path), 'seed': seed, 'model': model}, f)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        # Another process finished the same cache entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(final):
+            raise
+    return final
+
+
+def iter_quote_chunks(path, seed=None, model=DEFAULT_MODEL, cache_root=DEFAULT_CACHE, chunk_rows=CHUNK_ROWS):
+    """Stream {'ts', 'bid', 'ask', 'mid'} chunks, from the cache when seeded"""
+    if seed is None:
+        yield from generate_chunks(path, seed, model, chunk_rows)
+        return
+    cols = tick_store.open_columns(ensure_cached(path, seed, model, cache_root, chunk_rows))
+    for lo in range(0, len(cols['ts']), chunk_rows):
+        yield {name: col[lo:lo + chunk_rows] for name, col in cols.items()}
+
+
+def quote_arrays(path, seed, model=DEFAULT_MODEL, cache_root=DEFAULT_CACHE):
+    """(ts seconds, bid, ask) for the backtest engines, memory-mapped from the cache"""
+    cols = tick_store.open_columns(ensure_cached(path, seed, model, cache_root))
+    return cols['ts'] / 1e9, cols['bid'], cols['ask']
+
+
+def load_model(spec):
+    """--model value: 'constant:0.0001', 'normal:mean,std' or a JSON file from --fit"""
+    if os.path.isfile(spec):
+        with open(spec) as f:
+            return json.load(f)
+    kind, _, params = spec.partition(':')
+    if kind == 'constant':
+        return {'model': 'constant', 'spread_pct': float(params)}
+    if kind == 'normal':
+        if not params:
+            return dict(DEFAULT_MODEL)
+        mean, std = (float(x) for x in params.split(','))
+        return {'model': 'normal', 'mean': mean, 'std': std}
+    raise ValueError(f"Can't parse spread model: {spec}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Quote Synth',
+                    description='Generate and cache seeded synthetic bid/ask quotes from OHLCV data.')
+
+    parser.add_argument('--data', type=str, default=DATAFILE_PATH, help='OHLCV CSV file')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated spread')
+    parser.add_argument('--model', type=str, default='normal',
+                        help="'constant:PCT', 'normal[:MEAN,STD]' or a fitted model JSON file")
+    parser.add_argument('--fit', type=str,
+                        help='CSV of real L1 quotes (bid,ask columns) to fit an empirical model from')
+    parser.add_argument('--fit_out', type=str, default='spread_model.json', help='Where to write the fitted model')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE, help='Cache directory')
+
+    args = parser.parse_args()
+
+    if args.fit:
+        l1 = pd.read_csv(args.fit, usecols=['bid', 'ask'])
+        model = fit_spread_model(l1['bid'], l1['ask'])
+        with open(args.fit_out, 'w') as f:
+            json.dump(model, f)
+        print(f"Fitted spread model from {len(l1)} quotes -> {args.fit_out}")
+    else:
+        model = load_model(args.model)
+        path = ensure_cached(args.data, args.seed, model, args.cache)
+        rows = os.path.getsize(tick_store.column_file(path, 'ts')) // 8
+        print(f"{rows} quotes cached in {path}")
@@ -0,0 +1,269 @@
+# Columnar, memory-mapped tick store
+# Converts Backtest Manager CSVs once into raw little-endian column files:
+#
+#   <root>/<exchange>/<SYMBOL>/<YYYY-MM-DD>/ts.i8    int64 ns since epoch (UTC)
+#                                           bid.f8   float64
+#                                           ask.f8   float64
+#                                           mid.f8   float64
+#
+# Backtests and the replayer open days with numpy.memmap and slice time ranges
+# without copying, so startup cost and memory don't grow with the range length.
+#
+# Recorded L2 depth lives next to the quotes, one row per level change:
+#
+#   <root>/<exchange>/<SYMBOL>.book/<YYYY-MM-DD>/ts.i8     int64 ns since epoch (UTC)
+#                                                side.u1   quote_codec.BID / ASK
+#                                                price.f8  float64
+#                                                size.f8   float64, 0 deletes the level
+#                                                kind.u1   BOOK_DELTA, or BOOK_CLEAR: a row
+#                                                          that empties the book (a snapshot follows)
+#
+# write_book starts every day with a snapshot, so days can be replayed on their own.
+import os
+import sys
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+
+COLUMNS = {'ts': '<i8', 'bid': '<f8', 'ask': '<f8', 'mid': '<f8'}
+BOOK_COLUMNS = {'ts': '<i8', 'side': '|u1', 'price': '<f8', 'size': '<f8', 'kind': '|u1'}
+BOOK_DELTA = 0
+BOOK_CLEAR = 1
+BOOK_SUFFIX = '.book'
+NS_PER_DAY = 86_400 * 1_000_000_000
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'store')
+
+
+def symbol_dir(symbol):
+    """'BTC/USD' -> 'BTC-USD' (safe as a directory name)"""
+    return symbol.replace('/', '-')
+
+
+def day_path(root, exchange, symbol, day):
+    return os.path.join(root, exchange.lower(), symbol_dir(symbol), day)
+
+
+def book_day_path(root, exchange, symbol, day):
+    return os.path.join(root, exchange.lower(), symbol_dir(symbol) + BOOK_SUFFIX, day)
+
+
+def to_ns(t):
+    """int ns / float seconds / anything pd.Timestamp understands -> int ns (UTC)"""
+    if t is None:
+        return None
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    if isinstance(t, (float, np.floating)):
+        return int(round(t * 1e9))
+    ts = pd.Timestamp(t)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.as_unit('ns').value
+
+
+def write_day(root, exchange, symbol, day, ts_ns, bid, ask, mid=None):
+    """Write one day of columns. Replaces the day atomically if it already exists"""
+    if mid is None:
+        mid = (bid + ask) / 2
+    write_columns(day_path(root, exchange, symbol, day),
+                  {'ts': ts_ns, 'bid': bid, 'ask': ask, 'mid': mid})
+
+
+def write_columns(final, values, columns=COLUMNS):
+    """Write {column: array} into directory `final`, replacing it atomically"""
+    tmp = final + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, dtype in columns.items():
+        np.ascontiguousarray(values[name], dtype=dtype).tofile(column_file(tmp, name, columns))
+    if os.path.exists(final):
+        shutil.rmtree(final)
+    os.rename(tmp, final)
+
+
+def split_days(ts_ns):
+    """(day, lo, hi) row ranges of time-sorted ns timestamps, one per UTC day"""
+    day_ids = ts_ns // NS_PER_DAY
+    bounds = np.flatnonzero(np.diff(day_ids)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(ts_ns)]))
+    for lo, hi in zip(starts, ends):
+        yield pd.Timestamp(int(day_ids[lo]) * NS_PER_DAY).strftime('%Y-%m-%d'), lo, hi
+
+
+def write_quotes(root, exchange, symbol, ts_ns, bid, ask, mid=None):
+    """Split time-sorted quote arrays into UTC days and write each. Returns days written"""
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    if mid is None:
+        mid = (bid + ask) / 2
+    days = []
+    for day, lo, hi in split_days(ts_ns):
+        write_day(root, exchange, symbol, day, ts_ns[lo:hi], bid[lo:hi], ask[lo:hi], mid[lo:hi])
+        days.append(day)
+    return days
+
+
+def write_book(root, exchange, symbol, ts_ns, side, price, size, kind):
+    """Write time-sorted book event arrays, one directory per UTC day. Returns days written.
+
+    Days after the first get the book as it stood at midnight prepended as a snapshot.
+    """
+    from order_book import OrderBook
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    book = OrderBook(record_deltas=False)
+    days = []
+    for day, lo, hi in split_days(ts_ns):
+        cols = {'ts': ts_ns[lo:hi], 'side': side[lo:hi], 'price': price[lo:hi],
+                'size': size[lo:hi], 'kind': kind[lo:hi]}
+        if days and not (hi > lo and kind[lo] == BOOK_CLEAR):
+            snapshot = snapshot_rows(book, int(ts_ns[lo]))
+            cols = {name: np.concatenate((snapshot[name], cols[name])) for name in BOOK_COLUMNS}
+        write_columns(book_day_path(root, exchange, symbol, day), cols, BOOK_COLUMNS)
+        apply_book_rows(book, cols)
+        days.append(day)
+    return days
+
+
+def apply_book_rows(book, cols):
+    """Apply book event columns to a tools/order_book.py OrderBook"""
+    sides = book.sides
+    for s, p, q, k in zip(cols['side'].tolist(), cols['price'].tolist(),
+                          cols['size'].tolist(), cols['kind'].tolist()):
+        if k == BOOK_CLEAR:
+            book.bids.clear()
+            book.asks.clear()
+        else:
+            sides[s].set(p, q)
+
+
+def snapshot_rows(book, ts_ns):
+    """Book event columns that rebuild `book`: a BOOK_CLEAR row, then every level"""
+    levels = book.snapshot_levels()
+    n = len(levels) + 1
+    side, price, size = zip(*levels) if levels else ((), (), ())
+    return {'ts': np.full(n, ts_ns, dtype=np.int64),
+            'side': np.array((0,) + side, dtype=np.uint8),
+            'price': np.array((0.0,) + price, dtype=np.float64),
+            'size': np.array((0.0,) + size, dtype=np.float64),
+            'kind': np.array([BOOK_CLEAR] + [BOOK_DELTA] * (n - 1), dtype=np.uint8)}
+
+
+def book_events(messages):
+    """quote_codec book messages (snapshots/deltas, in order) -> {column: array} for write_book"""
+    from quote_codec import decode_book, MSG_BOOK_SNAPSHOT
+    chunks = []
+    for msg in messages:
+        msg_type, _, _, exch_ts_ns, _, _, levels = decode_book(msg)
+        rows = np.zeros(len(levels) + (msg_type == MSG_BOOK_SNAPSHOT), dtype=[
+            (name, dtype) for name, dtype in BOOK_COLUMNS.items()])
+        rows['ts'] = exch_ts_ns
+        if msg_type == MSG_BOOK_SNAPSHOT:
+            rows['kind'][0] = BOOK_CLEAR
+        body = rows[len(rows) - len(levels):]
+        body['side'] = levels['side']
+        body['price'] = levels['price']
+        body['size'] = levels['size']
+        chunks.append(rows)
+    if not chunks:
+        events = np.zeros(0, dtype=[(name, dtype) for name, dtype in BOOK_COLUMNS.items()])
+    else:
+        events = np.concatenate(chunks)
+    return {name: events[name] for name in BOOK_COLUMNS}
+
+
+def import_csv(path, root, exchange, symbol, seed=0):
+    """Convert a Backtest Manager OHLCV CSV (bid/ask simulated by data_prep) into the store"""
+    from data_prep import load_quotes
+    df = load_quotes(path, seed)
+    ts_ns = df.index.as_unit('ns').asi8
+    order = np.argsort(ts_ns, kind='stable')
+    return write_quotes(root, exchange, symbol, ts_ns[order], df['bid'].to_numpy()[order],
+                        df['ask'].to_numpy()[order], df['mid'].to_numpy()[order])
+
+
+def list_days(root, exchange, symbol, suffix=''):
+    base = os.path.join(root, exchange.lower(), symbol_dir(symbol) + suffix)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d for d in os.listdir(base) if not d.endswith('.tmp'))
+
+
+def column_file(path, name, columns=COLUMNS):
+    return os.path.join(path, f'{name}.{columns[name][1:]}')
+
+
+def open_columns(path, columns=COLUMNS):
+    """Memory-map a directory of column files -> {column: read-only memmap}"""
+    cols = {}
+    for name, dtype in columns.items():
+        fname = column_file(path, name, columns)
+        if os.path.getsize(fname) == 0:
+            cols[name] = np.empty(0, dtype=dtype)
+        else:
+            cols[name] = np.memmap(fname, dtype=dtype, mode='r')
+    return cols
+
+
+def open_day(root, exchange, symbol, day):
+    """Memory-map one day -> {column: read-only memmap}"""
+    return open_columns(day_path(root, exchange, symbol, day))
+
+
+def iter_range(root, exchange, symbol, start=None, end=None, book=False):
+    """Yield per-day {column: view} slices covering [start, end).
+
+    Slices are views into the memmaps, nothing is read until the caller
+    touches the values. With book=True the slices are book events; a range
+    starting mid-day begins at that day's first row, so the book is complete.
+    """
+    start_ns, end_ns = to_ns(start), to_ns(end)
+    suffix, columns = (BOOK_SUFFIX, BOOK_COLUMNS) if book else ('', COLUMNS)
+    for day in list_days(root, exchange, symbol, suffix):
+        day_start = pd.Timestamp(day).value
+        if end_ns is not None and day_start >= end_ns:
+            break
+        if start_ns is not None and day_start + NS_PER_DAY <= start_ns:
+            continue
+        cols = open_columns(os.path.join(root, exchange.lower(), symbol_dir(symbol) + suffix, day), columns)
+        ts = cols['ts']
+        lo = 0 if start_ns is None or book else int(np.searchsorted(ts, start_ns, side='left'))
+        hi = len(ts) if end_ns is None else int(np.searchsorted(ts, end_ns, side='left'))
+        if hi > lo:
+            yield {name: col[lo:hi] for name, col in cols.items()}
+
+
+def load_range(root, exchange, symbol, start=None, end=None, columns=('ts', 'bid', 'ask')):
+    """Contiguous arrays for [start, end). A single day is returned zero-copy"""
+    chunks = list(iter_range(root, exchange, symbol, start, end))
+    if not chunks:
+        return tuple(np.empty(0, dtype=COLUMNS[c]) for c in columns)
+    if len(chunks) == 1:
+        return tuple(chunks[0][c] for c in columns)
+    return tuple(np.concatenate([chunk[c] for chunk in chunks]) for c in columns)
+
+
+def quote_arrays(root, exchange, symbol, start=None, end=None):
+    """(ts seconds, bid, ask) float64 arrays, the shape the backtest engines take"""
+    ts_ns, bid, ask = load_range(root, exchange, symbol, start, end)
+    return ts_ns / 1e9, np.asarray(bid), np.asarray(ask)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Tick Store',
+                    description='Convert Backtest Manager CSVs into the memory-mapped tick store.')
+
+    parser.add_argument('csv', nargs='+', help='OHLCV CSV files to import')
+    parser.add_argument('--root', type=str, default=DEFAULT_ROOT, help='Store root directory')
+    parser.add_argument('--exchange', type=str, required=True, help='Exchange the data came from, e.g. binance')
+    parser.add_argument('--symbol', type=str, required=True, help='Symbol, e.g. BTC/USD')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated spread')
+
+    args = parser.parse_args()
+
+    for path in args.csv:
+        days = import_csv(path, args.root, args.exchange, args.symbol, args.seed)
+        print(f"{path}: wrote {len(days)} days ({days[0]} .. {days[-1]})" if days else f"{path}: no rows")
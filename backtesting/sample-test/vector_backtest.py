@@ -0,0 +1,300 @@
+# Vectorized backtest engine
+# Runs the dual EMA and stat arb signal logic over whole NumPy arrays in one
+# process, instead of replaying rows through data_prep -> strategy -> backtester_core.
+# The orders it derives are filled by backtester_core.simulate_execution, like the
+# event engine's; --check runs event_backtest on the same quotes and asserts the
+# trades are identical.
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+import backtester_core
+from backtester_core import compute_metrics, print_results
+from data_prep import DATAFILE_PATH
+import tick_store
+import quote_synth
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+import recording
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'strategies'))
+import strategy_dual_ema
+import strategy_stat_arb
+
+
+def sample_indices(ts, start, period):
+    """Indices where the strategies' TIME_PERIOD throttle fires.
+
+    The first update happens at `start` (end of warm-up), then on the first tick
+    at least `period` seconds after the previous update.
+    """
+    n = len(ts)
+    if start >= n:
+        return np.empty(0, dtype=np.int64)
+    if np.all(np.diff(ts[start:]) >= period):
+        # Bars at least `period` apart: every tick is an update
+        return np.arange(start, n, dtype=np.int64)
+
+    # Next update after each tick: first j > i with ts[j] - ts[i] >= period.
+    # searchsorted works on ts[i] + period, so fix up the odd rounding edge.
+    nxt = np.searchsorted(ts, ts + period, side='left')
+    nxt = np.maximum(nxt, np.arange(1, n + 1))
+    lo = np.maximum(nxt - 1, 0)
+    nxt = np.where((nxt - 1 > np.arange(n)) & (ts[lo] - ts >= period), nxt - 1, nxt)
+    hi = np.minimum(nxt, n - 1)
+    nxt = np.where((nxt < n) & (ts[hi] - ts < period), nxt + 1, nxt)
+
+    nxt = nxt.tolist()
+    out = []
+    i = start
+    while i < n:
+        out.append(i)
+        i = nxt[i]
+    return np.asarray(out, dtype=np.int64)
+
+
+def ema(values, period):
+    """Same recursion as indicators.EMA, seeded with the first value"""
+    return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+
+
+def _state_changes(state):
+    """Indices where a forward-filled position state changes, and the new/old state.
+
+    `state` holds the target position at each sample, NaN where no rule fired.
+    """
+    fired = ~np.isnan(state)
+    idx = np.where(fired, np.arange(len(state)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    pos = np.where(idx >= 0, state[np.maximum(idx, 0)], 0.0)
+    prev = np.concatenate(([0.0], pos[:-1]))
+    changed = np.flatnonzero(pos != prev)
+    return changed, pos[changed], prev[changed]
+
+
+def _build_result(legs):
+    """Fill per-symbol order legs with backtester_core.simulate_execution.
+
+    legs is a list of (symbol, strategy_name, seq, order_ts, sides, prices) where seq
+    is the global order sequence number used to interleave symbols and sides are
+    +1 (BUY) / -1 (SELL). Orders go through the same position model, risk checks
+    and fill model as the event engine; only the signals are vectorized.
+    Returns (trades_df, equity_df, open_positions).
+    """
+    backtester_core.reset_state()
+    if legs:
+        seq = np.concatenate([leg[2] for leg in legs])
+        order = np.argsort(seq, kind='stable')
+        symbols = np.concatenate([np.full(len(leg[2]), k) for k, leg in enumerate(legs)])[order].tolist()
+        order_ts = np.concatenate([leg[3] for leg in legs])[order].tolist()
+        sides = np.concatenate([leg[4] for leg in legs])[order].tolist()
+        prices = np.concatenate([leg[5] for leg in legs])[order].tolist()
+
+        simulate_execution = backtester_core.simulate_execution
+        for k, ts, side, price in zip(symbols, order_ts, sides, prices):
+            simulate_execution({
+                'order_type': 'BUY' if side == 1 else 'SELL',
+                'symbol': legs[k][0],
+                'price': price,
+                'strategy_name': legs[k][1],
+                'timestamp': ts
+            })
+
+    equity_df = pd.DataFrame(backtester_core.equity_curve, columns=['timestamp', 'equity'])
+    return backtester_core.get_trades_df(), equity_df, len(backtester_core.current_positions)
+
+
+def run_dual_ema(ts, bid, ask, ema_fast=None, ema_slow=None, time_period=None,
+                 symbol=None, strategy_name=None):
+    """Vectorized strategy_dual_ema over one symbol's quotes.
+
+    Defaults come from strategy_dual_ema. Returns (trades_df, equity_df, open_positions).
+    """
+    ema_fast = strategy_dual_ema.EMA_FAST if ema_fast is None else ema_fast
+    ema_slow = strategy_dual_ema.EMA_SLOW if ema_slow is None else ema_slow
+    time_period = strategy_dual_ema.TIME_PERIOD if time_period is None else time_period
+    symbol = strategy_dual_ema.SYMBOL if symbol is None else symbol
+    strategy_name = strategy_dual_ema.STRATEGY_NAME if strategy_name is None else strategy_name
+
+    # The live loop warms up once it has seen EMA_SLOW quotes
+    samples = sample_indices(ts, ema_slow - 1, time_period)
+
+    mid = (bid[samples] + ask[samples]) / 2
+    diff = ema(mid, ema_fast) - ema(mid, ema_slow)
+
+    # BUY when fast > slow and not long, SELL when fast < slow and not short
+    state = np.where(diff > 0, 1.0, np.where(diff < 0, -1.0, np.nan))
+    changed, new_pos, _ = _state_changes(state)
+    order_idx = samples[changed]
+    sides = new_pos.astype(np.int8)
+    prices = np.where(sides == 1, ask[order_idx], bid[order_idx])
+
+    legs = [(symbol, strategy_name, np.arange(len(order_idx)), ts[order_idx], sides, prices)]
+    return _build_result(legs)
+
+
+def run_stat_arb(ts, bid1, ask1, bid2, ask2, lookback=None, entry_z=None, exit_z=None,
+                 time_period=None, symbol1=None, symbol2=None, strategy_name=None):
+    """Vectorized strategy_stat_arb over two time-aligned quote series.
+
+    Matches StatArbStrategy on the merged stream, where SYMBOL1 quotes come first
+    at equal timestamps: each SYMBOL1 quote pairs with the previous row's SYMBOL2
+    quote, both in the rolling fit and in the checks it triggers. Only the first
+    check, on the SYMBOL2 quote that ends the warm-up, fits and prices whole rows.
+    Defaults come from strategy_stat_arb. Returns (trades_df, equity_df, open_positions).
+    """
+    lookback = strategy_stat_arb.LOOKBACK if lookback is None else lookback
+    entry_z = strategy_stat_arb.ENTRY_Z if entry_z is None else entry_z
+    exit_z = strategy_stat_arb.EXIT_Z if exit_z is None else exit_z
+    time_period = strategy_stat_arb.TIME_PERIOD if time_period is None else time_period
+    symbol1 = strategy_stat_arb.SYMBOL1 if symbol1 is None else symbol1
+    symbol2 = strategy_stat_arb.SYMBOL2 if symbol2 is None else symbol2
+    strategy_name = strategy_stat_arb.STRATEGY_NAME if strategy_name is None else strategy_name
+
+    samples = sample_indices(ts, lookback - 1, time_period)
+    if len(samples) == 0:
+        return _build_result([])
+
+    p1 = (bid1 + ask1) / 2
+    p2 = (bid2 + ask2) / 2
+    # Row of the SYMBOL2 quote each check sees: the previous row, except the first check
+    row2 = samples - 1
+    row2[0] = samples[0]
+
+    # Rolling fit of p1 on the lagged p2 (row i fits rows i-lookback+1..i)
+    y = pd.Series(p1)
+    x = pd.Series(np.concatenate(([np.nan], p2[:-1])))
+    roll_x, roll_y = x.rolling(lookback), y.rolling(lookback)
+    mean_x = roll_x.mean().to_numpy()[samples]
+    mean_y = roll_y.mean().to_numpy()[samples]
+    var_x = roll_x.var(ddof=0).to_numpy()[samples]
+    var_y = roll_y.var(ddof=0).to_numpy()[samples]
+    cov = roll_y.cov(x, ddof=0).to_numpy()[samples]
+
+    # The first check fits the aligned first `lookback` rows
+    first_x, first_y = p2[:lookback], p1[:lookback]
+    mean_x[0], mean_y[0] = first_x.mean(), first_y.mean()
+    var_x[0], var_y[0] = first_x.var(), first_y.var()
+    cov[0] = ((first_x - mean_x[0]) * (first_y - mean_y[0])).mean()
+
+    # OLS slope of p1 on p2 (np.polyfit(p2, p1, 1)[0]) and the spread's mean/std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = np.where(var_x > 0, cov / var_x, 0.0)
+        mean_spread = mean_y - beta * mean_x
+        std_spread = np.sqrt(np.clip(var_y - 2 * beta * cov + beta * beta * var_x, 0, None))
+        current_spread = p1[samples] - beta * p2[row2]
+        zscore = np.where(std_spread != 0, (current_spread - mean_spread) / std_spread, 0.0)
+
+    state = np.full(len(samples), np.nan)
+    state[np.abs(zscore) < exit_z] = 0.0
+    state[zscore < -entry_z] = 1.0
+    state[zscore > entry_z] = -1.0
+    changed, new_pos, old_pos = _state_changes(state)
+    order_idx = samples[changed]
+    order_idx2 = row2[changed]
+
+    # Spread up (long spread / close short): BUY sym1, SELL sym2; spread down: the reverse
+    sides1 = np.where(new_pos > old_pos, 1, -1).astype(np.int8)
+    sides2 = -sides1
+    prices1 = np.where(sides1 == 1, ask1[order_idx], bid1[order_idx])
+    prices2 = np.where(sides2 == 1, ask2[order_idx2], bid2[order_idx2])
+    seq = np.arange(len(order_idx)) * 2
+
+    legs = [
+        (symbol1, strategy_name, seq, ts[order_idx], sides1, prices1),
+        (symbol2, strategy_name, seq + 1, ts[order_idx], sides2, prices2),
+    ]
+    return _build_result(legs)
+
+
+def align_arrays(ts1, bid1, ask1, ts2, bid2, ask2):
+    """Inner-join two (ts, bid, ask) series on timestamp -> ts, bid1, ask1, bid2, ask2"""
+    ts, i1, i2 = np.intersect1d(ts1, ts2, assume_unique=True, return_indices=True)
+    return (ts, np.asarray(bid1)[i1], np.asarray(ask1)[i1],
+            np.asarray(bid2)[i2], np.asarray(ask2)[i2])
+
+
+def event_trades(strategy, ts, *quotes):
+    """Trades event_backtest.run_backtest gets on the same arrays (bid, ask or bid1, ask1, bid2, ask2)"""
+    import event_backtest  # Imports this module, so not at the top
+    send_order = event_backtest.simulated_order_sender()
+    if strategy == 'dual_ema':
+        bid, ask = quotes
+        ticks = event_backtest.merge_streams((strategy_dual_ema.SYMBOL, ts, bid, ask))
+        obj = strategy_dual_ema.DualEmaStrategy(send_order, verbose=False)
+    else:
+        bid1, ask1, bid2, ask2 = quotes
+        ticks = event_backtest.merge_streams((strategy_stat_arb.SYMBOL1, ts, bid1, ask1),
+                                             (strategy_stat_arb.SYMBOL2, ts, bid2, ask2))
+        obj = strategy_stat_arb.StatArbStrategy(send_order, verbose=False)
+    return event_backtest.run_backtest(obj, ticks)[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Vector Backtest',
+                    description='Single-process vectorized backtest of the dual EMA / stat arb strategies.')
+
+    parser.add_argument('--strategy', choices=['dual_ema', 'stat_arb'], default='dual_ema')
+    parser.add_argument('--data', type=str, default=DATAFILE_PATH, help='OHLCV CSV (SYMBOL1 for stat_arb)')
+    parser.add_argument('--data2', type=str, help='OHLCV CSV for SYMBOL2 (stat_arb only)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulated spread (cached per seed)')
+    parser.add_argument('--store', type=str, help='Read quotes from this tick store root instead of CSVs')
+    parser.add_argument('--recording', type=str, help='Read quotes from quoting/recorder.py files under this root')
+    parser.add_argument('--exchange', type=str, default='binance', help='Tick store / recording exchange')
+    parser.add_argument('--start', type=str, help='Tick store / recording range start, e.g. 2025-06-01')
+    parser.add_argument('--end', type=str, help='Tick store / recording range end (exclusive)')
+    parser.add_argument('--trades_csv', type=str, help='Optional path to write the trade list')
+    parser.add_argument('--check', action='store_true',
+                        help='Also run event_backtest on the same quotes and fail unless the trades match')
+
+    args = parser.parse_args()
+    backtester_core.VERBOSE = False
+
+    def recorded(symbol):
+        return recording.quote_arrays(args.recording, args.exchange, symbol,
+                                      tick_store.to_ns(args.start), tick_store.to_ns(args.end))
+
+    start = time.perf_counter()
+    if args.strategy == 'dual_ema':
+        if args.recording:
+            ts, bid, ask = recorded(strategy_dual_ema.SYMBOL)
+        elif args.store:
+            ts, bid, ask = tick_store.quote_arrays(args.store, args.exchange, strategy_dual_ema.SYMBOL,
+                                                   args.start, args.end)
+        else:
+            ts, bid, ask = quote_synth.quote_arrays(args.data, args.seed)
+        quotes = (bid, ask)
+        loaded = time.perf_counter()
+        trades, equity, open_positions = run_dual_ema(ts, bid, ask)
+    else:
+        if args.recording:
+            leg1, leg2 = recorded(strategy_stat_arb.SYMBOL1), recorded(strategy_stat_arb.SYMBOL2)
+        elif args.store:
+            leg1 = tick_store.quote_arrays(args.store, args.exchange, strategy_stat_arb.SYMBOL1, args.start, args.end)
+            leg2 = tick_store.quote_arrays(args.store, args.exchange, strategy_stat_arb.SYMBOL2, args.start, args.end)
+        elif not args.data2:
+            parser.error('--data2 is required for stat_arb')
+        else:
+            leg1 = quote_synth.quote_arrays(args.data, args.seed)
+            leg2 = quote_synth.quote_arrays(args.data2, args.seed + 1)
+        ts, bid1, ask1, bid2, ask2 = align_arrays(*leg1, *leg2)
+        quotes = (bid1, ask1, bid2, ask2)
+        loaded = time.perf_counter()
+        trades, equity, open_positions = run_stat_arb(ts, bid1, ask1, bid2, ask2)
+    done = time.perf_counter()
+
+    print_results(compute_metrics(trades, equity), open_positions)
+    print(f"Rows: {len(ts)} | load {loaded - start:.2f}s | backtest {done - loaded:.3f}s")
+
+    if args.trades_csv:
+        trades.to_csv(args.trades_csv, index=False)
+
+    if args.check:
+        expected = event_trades(args.strategy, ts, *quotes)
+        assert trades.equals(expected), \
+            f"Vector and event engines disagree: {len(trades)} vs {len(expected)} trades"
+        print(f"Check: same {len(expected)} trades as event_backtest")
@@ -0,0 +1,111 @@
+# Consolidated best bid/offer across exchanges
+#
+# Subscribes to the quote bus, keeps every venue's latest quote per symbol
+# (tools/venue_quotes.py) and publishes on its own port only when something
+# changed: a venue's bid/ask, or the best bid/ask venues (e.g. one went stale).
+#
+#   [b'bbo|<SYMBOL>|', quote_codec BBO message]
+#
+# The message carries the best bid/ask with their exchanges and the quote of
+# every fresh venue, so strategies that want a cross-venue view subscribe here
+# instead of opening a socket per venue and redoing min(asks) / max(bids).
+#
+#   python3 quoting/bbo_service.py --symbols BTC/USDT ETH/USDT
+import argparse
+import os
+import sys
+import time
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from quote_codec import (QuoteRecord, iter_quotes, symbol_topic, bbo_topic, symbol_bytes, encode_bbo,
+                         NO_EXCHANGE)
+from venue_quotes import VenueQuotes, STALE_AFTER
+
+QUOTE_URL = "tcp://127.0.0.1:5000"  # quote_daemon.py bus
+BBO_URL = "tcp://127.0.0.1:5010"
+REPORT_EVERY = 30  # Seconds between stats lines
+
+
+class BboBook:
+    """Venue table and last published state for one symbol"""
+
+    def __init__(self, symbol, stale_after):
+        self.topic = bbo_topic(symbol)
+        self.symbol_raw = symbol_bytes(symbol)
+        self.quotes = VenueQuotes(max_age=int(stale_after * 1e9))  # Timestamps in ns
+        self.published = None  # (bid venue, bid, ask venue, ask) last sent
+
+    def update(self, exchange_id, bid, ask, ts_ns):
+        """Apply one quote. Returns (best, fresh venues) if the BBO should be published"""
+        changed = self.quotes.update(exchange_id, bid, ask, ts_ns)
+        best = self.quotes.best()
+        if not changed and best == self.published:
+            return None
+        self.published = best
+        q = self.quotes
+        venues = [(v, q.bid[i], q.ask[i], q.ts[i]) for i, v in enumerate(q.venues) if q.fresh(i)]
+        return best, venues
+
+
+def run_service(quote_url=QUOTE_URL, bbo_url=BBO_URL, symbols=None, stale_after=STALE_AFTER):
+    context = zmq.Context()
+    sub = context.socket(zmq.SUB)
+    sub.connect(quote_url)
+    for symbol in symbols or ['']:
+        sub.setsockopt(zmq.SUBSCRIBE, symbol_topic(symbol) if symbol else b'quote|')
+    pub = context.socket(zmq.PUB)
+    pub.bind(bbo_url)
+
+    print(f"Consolidating {', '.join(symbols) if symbols else 'all symbols'} from {quote_url}, "
+          f"publishing BBO on {bbo_url}")
+
+    books = {}
+    seq = 0
+    received = 0
+    last_report = time.time()
+    quote = QuoteRecord()
+    try:
+        while True:
+            msg = sub.recv_multipart()[-1]
+            for quote in iter_quotes(msg, quote):
+                received += 1
+                book = books.get(quote.symbol)
+                if book is None:
+                    book = books[quote.symbol] = BboBook(quote.symbol, stale_after)
+                update = book.update(quote.exchange_id, quote.bid, quote.ask, quote.exch_ts_ns)
+                if update is None:
+                    continue
+                (bid_venue, bid, ask_venue, ask), venues = update
+                seq += 1
+                pub.send_multipart([book.topic, encode_bbo(
+                    seq, quote.exch_ts_ns, book.symbol_raw,
+                    bid, NO_EXCHANGE if bid_venue is None else bid_venue,
+                    ask, NO_EXCHANGE if ask_venue is None else ask_venue,
+                    venues)], zmq.NOBLOCK)
+
+            now = time.time()
+            if now - last_report >= REPORT_EVERY:
+                print(f"{received} quotes in, {seq} BBO updates out, {len(books)} symbols")
+                last_report = now
+    except KeyboardInterrupt:
+        print("\nBBO service stopped.")
+    finally:
+        sub.close(linger=0)
+        pub.close(linger=0)
+        context.term()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='BBO Service',
+                    description='Publish a consolidated best bid/offer per symbol across exchanges.')
+
+    parser.add_argument('--quote_url', type=str, default=QUOTE_URL, help='Quote bus to subscribe to')
+    parser.add_argument('--bind', type=str, default=BBO_URL, help='Where to publish BBO updates')
+    parser.add_argument('--symbols', nargs='*', help='Symbols to consolidate (default: all)')
+    parser.add_argument('--stale', type=float, default=STALE_AFTER, help='Drop venues quiet for this many seconds')
+
+    args = parser.parse_args()
+
+    run_service(args.quote_url, args.bind, args.symbols, args.stale)
@@ -1,6 +0,0 @@
-exec python3 /home/asus_laptop/projects/trading_bot/quoting/btc-usdt/quote_binance_btc-usd.py &
-exec python3 /home/asus_laptop/projects/trading_bot/quoting/btc-usdt/quote_cryptocoms_btc-usd.py & 
-exec python3 /home/asus_laptop/projects/trading_bot/quoting/btc-usdt/quote_kraken_btc-usd.py &
-exec python3 /home/asus_laptop/projects/trading_bot/quoting/btc-usdt/quote_kucoin_btc-usd.py &
-
-wait
\ No newline at end of file
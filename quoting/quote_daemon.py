@@ -0,0 +1,118 @@
+# Multi-exchange, multi-symbol quote daemon
+#
+# Runs every exchange x symbol feed in quoting/feeds.json as a task in one
+# event loop and publishes them all on one PUB socket. Each message is
+# [topic, quote record] with topic = quote_codec.topic(exchange, symbol), so
+# subscribers pick feeds with SUBSCRIBE instead of connecting to a port each.
+#
+# One ccxt.pro instance (one load_markets, one set of WebSocket connections)
+# per exchange, shared by all of its symbols. Adding a pair is one line in
+# the config:
+#
+#   {"exchange": "kraken", "symbol": "ETH/USDT"}
+#   {"exchange": "binance", "symbol": "SOL/USDT", "book": true}
+#
+# "book" feeds also publish L2 book deltas behind quote_codec.book_topic().
+#
+# Every feed runs under ws_gateway.supervise(): an exception run_feed doesn't
+# handle is logged and that feed alone restarts with backoff, the others keep
+# publishing. A permanent error (e.g. a symbol the exchange doesn't list) stops
+# just that feed; the daemon exits once every feed has stopped.
+#
+# "exchanges" takes per-exchange ws_gateway options, e.g. for offline runs:
+#
+#   "exchanges": {"binance": {"ws_url": "ws://127.0.0.1:8765", "markets": "frames.jsonl.markets.json"}}
+import asyncio
+import argparse
+import functools
+import json
+import os
+import sys
+import zmq
+
+from ws_gateway import FeedStats, create_exchange, prepare_exchange, report_stats, run_feed, supervise
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from quote_codec import topic, book_topic
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feeds.json')
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        config = json.load(f)
+    seen = set()
+    for feed in config['feeds']:
+        key = (feed['exchange'], feed['symbol'])
+        if key in seen:
+            raise ValueError(f"Duplicate feed {key} in {path}")
+        seen.add(key)
+    return config
+
+
+def topic_publisher(sock, feed_topic):
+    def publish(msg):
+        sock.send_multipart([feed_topic, msg], zmq.NOBLOCK)
+    return publish
+
+
+async def main(config):
+    context = zmq.Context()
+    sock = context.socket(zmq.PUB)
+    sock.bind(config['bind'])
+
+    exchanges = {}
+    record_files = []
+    feeds = []
+    try:
+        for name in sorted({feed['exchange'] for feed in config['feeds']}):
+            options = config.get('exchanges', {}).get(name, {})
+            exchange = create_exchange(name)
+            exchanges[name] = exchange
+            record_file = await prepare_exchange(exchange, options.get('markets'), options.get('ws_url'),
+                                                 options.get('record'))
+            if record_file is not None:
+                record_files.append(record_file)
+
+        tasks = []
+        for feed in config['feeds']:
+            exchange = exchanges[feed['exchange']]
+            stats = FeedStats(f"{feed['exchange']} {feed['symbol']}")
+            feeds.append(stats)
+            publish = topic_publisher(sock, topic(exchange.id, feed['symbol']))
+            publish_book = topic_publisher(sock, book_topic(exchange.id, feed['symbol']))
+            start_feed = functools.partial(run_feed, exchange, feed['symbol'], publish, feed.get('book', False),
+                                           stats, publish_book)
+            tasks.append(supervise(start_feed, stats))
+            print(f"  {feed['exchange']:<10} {feed['symbol']:<12} {'order book' if feed.get('book') else 'ticker'}")
+
+        print(f"Publishing {len(tasks)} feeds from {len(exchanges)} exchanges on {config['bind']}")
+        reporter = asyncio.ensure_future(report_stats(feeds))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+    finally:
+        for stats in feeds:
+            print(stats.report())
+        for exchange in exchanges.values():
+            await exchange.close()
+        for f in record_files:
+            f.close()
+        sock.close(linger=0)
+        context.term()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Quote Daemon',
+                    description='Stream every configured exchange/symbol feed to one ZMQ PUB socket.')
+
+    parser.add_argument('--config', type=str, default=CONFIG_PATH, help='Feeds config (JSON)')
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(load_config(args.config)))
+    except KeyboardInterrupt:
+        print("\nQuote daemon stopped.")
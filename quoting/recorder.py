@@ -0,0 +1,206 @@
+# Quote bus recorder
+#
+# Subscribes to the quote bus and appends every frame, with its topic and
+# receive time, to hourly files under data/recordings/ (format: tools/recording.py).
+#
+#   python3 quoting/recorder.py                      # everything on the bus
+#   python3 quoting/recorder.py --topic 'quote|BTC/USDT|' --fsync always
+#
+# The receive loop only copies frames into the current block. Full blocks (or
+# blocks older than --block_ms) go to a bounded queue; a writer thread
+# compresses, writes and fsyncs them, so a slow disk never stalls the bus. If
+# the queue is full the block is dropped and counted rather than waiting.
+#
+# fsync policy: 'always' after every block, 'interval' at most every
+# --fsync_every seconds (default), 'never' leaves it to the OS. Files are
+# always fsynced when they rotate and on shutdown.
+#
+# Backtests read the files directly:
+#
+#   python3 backtesting/sample-test/vector_backtest.py --recording data/recordings --exchange binance
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from recording import FRAME_HEADER, DEFAULT_ROOT, pack_block, hour_path, NS_PER_HOUR
+
+QUOTE_URL = "tcp://127.0.0.1:5000"  # quote_daemon.py bus
+BLOCK_BYTES = 1 << 20  # Uncompressed block size
+BLOCK_MS = 1000  # Max age of a partial block
+MAX_PENDING = 64  # Blocks waiting for the writer (~64 MB)
+FSYNC_EVERY = 1.0  # Seconds, for the 'interval' policy
+RCVHWM = 100_000  # Frames ZMQ may queue for us before the PUB side drops
+REPORT_EVERY = 30
+
+
+class BlockWriter(threading.Thread):
+    """Compresses and appends blocks to hourly files on its own thread"""
+
+    def __init__(self, root, fsync='interval', fsync_every=FSYNC_EVERY, max_pending=MAX_PENDING):
+        super().__init__(name='recorder-writer', daemon=True)
+        self.root = root
+        self.fsync = fsync
+        self.fsync_every = fsync_every
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dropped_blocks = 0
+        self.dropped_frames = 0
+        self.written_frames = 0
+        self.written_bytes = 0
+        self.file = None
+        self.hour = None
+        self.last_sync = time.monotonic()
+
+    def submit(self, payload, count, first_ns, last_ns):
+        """Queue a block without blocking. Returns False if it was dropped"""
+        try:
+            self.pending.put_nowait((payload, count, first_ns, last_ns))
+            return True
+        except queue.Full:
+            self.dropped_blocks += 1
+            self.dropped_frames += count
+            return False
+
+    def close(self):
+        self.pending.put(None)
+        self.join()
+
+    def run(self):
+        while True:
+            block = self.pending.get()
+            if block is None:
+                break
+            payload, count, first_ns, last_ns = block
+            hour = first_ns // NS_PER_HOUR
+            if hour != self.hour:
+                self._rotate(first_ns, hour)
+            data = pack_block(payload, count, first_ns, last_ns)  # zlib releases the GIL
+            self.file.write(data)
+            self.written_frames += count
+            self.written_bytes += len(data)
+            self._maybe_sync()
+        self._close_file()
+
+    def _rotate(self, ts_ns, hour):
+        self._close_file()
+        path = hour_path(self.root, ts_ns)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'ab')
+        self.hour = hour
+        print(f"Recording to {path}")
+
+    def _maybe_sync(self):
+        if self.fsync == 'always':
+            self._sync()
+        elif self.fsync == 'interval' and time.monotonic() - self.last_sync >= self.fsync_every:
+            self._sync()
+        elif self.fsync == 'never':
+            self.file.flush()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+    def _close_file(self):
+        if self.file is not None:
+            self._sync()
+            self.file.close()
+            self.file = None
+
+
+def run_recorder(quote_url=QUOTE_URL, root=DEFAULT_ROOT, topics=(b"",), fsync='interval',
+                 block_bytes=BLOCK_BYTES, block_ms=BLOCK_MS, max_pending=MAX_PENDING):
+    context = zmq.Context()
+    sub = context.socket(zmq.SUB)
+    sub.setsockopt(zmq.RCVHWM, RCVHWM)
+    sub.connect(quote_url)
+    for t in topics:
+        sub.setsockopt(zmq.SUBSCRIBE, t)
+
+    writer = BlockWriter(root, fsync, max_pending=max_pending)
+    writer.start()
+    print(f"Recording {quote_url} to {root} (fsync {fsync})")
+
+    pack_frame = FRAME_HEADER.pack
+    recv_multipart = sub.recv_multipart
+    clock = time.time_ns
+    block_ns = block_ms * 1_000_000
+    block = bytearray()
+    count = 0
+    first_ns = last_ns = 0
+    received = 0
+    last_report = time.time()
+
+    def flush():
+        nonlocal block, count
+        if count:
+            writer.submit(block, count, first_ns, last_ns)
+            block = bytearray()
+            count = 0
+
+    try:
+        while True:
+            try:
+                frames = recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                # Quiet bus: don't sit on a partial block past block_ms
+                wait_ms = block_ms
+                if count:
+                    wait_ms = (first_ns + block_ns - clock()) // 1_000_000
+                    if wait_ms <= 0:
+                        flush()
+                        wait_ms = block_ms
+                sub.poll(wait_ms)
+                continue
+            last_ns = clock()
+            if not count:
+                first_ns = last_ns
+            elif last_ns // NS_PER_HOUR != first_ns // NS_PER_HOUR:
+                flush()  # Blocks never span an hour, so each lands in its own file
+                first_ns = last_ns
+            topic, msg = (frames[0], frames[-1]) if len(frames) > 1 else (b"", frames[0])
+            block += pack_frame(last_ns, len(topic), len(msg))
+            block += topic
+            block += msg
+            count += 1
+            received += 1
+            if len(block) >= block_bytes or last_ns - first_ns >= block_ns:
+                flush()
+
+            if received % 100_000 == 0:
+                now = time.time()
+                if now - last_report >= REPORT_EVERY:
+                    print(f"{received:,} frames in, {writer.written_frames:,} written "
+                          f"({writer.written_bytes / 1e6:.1f} MB), {writer.dropped_frames:,} dropped")
+                    last_report = now
+    except KeyboardInterrupt:
+        print("\nRecorder stopped.")
+    finally:
+        flush()
+        writer.close()
+        print(f"{received:,} frames in, {writer.written_frames:,} written "
+              f"({writer.written_bytes / 1e6:.1f} MB), {writer.dropped_frames:,} dropped")
+        sub.close(linger=0)
+        context.term()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Recorder',
+                    description='Record the quote bus to hourly compressed files for backtesting.')
+
+    parser.add_argument('--quote_url', type=str, default=QUOTE_URL, help='Quote bus to subscribe to')
+    parser.add_argument('--root', type=str, default=DEFAULT_ROOT, help='Recording directory')
+    parser.add_argument('--topic', action='append', help='Topic prefix to record (repeatable, default: all)')
+    parser.add_argument('--fsync', choices=['always', 'interval', 'never'], default='interval')
+    parser.add_argument('--block_ms', type=int, default=BLOCK_MS, help='Max age of a partial block in ms')
+
+    args = parser.parse_args()
+    topics = [t.encode() for t in args.topic] if args.topic else [b""]
+
+    run_recorder(args.quote_url, args.root, topics, args.fsync, block_ms=args.block_ms)
@@ -0,0 +1,2 @@
+# All exchange/symbol feeds in one process, see quoting/feeds.json
+exec python3 /home/asus_laptop/projects/trading_bot/quoting/quote_daemon.py --config /home/asus_laptop/projects/trading_bot/quoting/feeds.json
@@ -0,0 +1,305 @@
+# Async WebSocket market-data gateway (ccxt.pro)
+#
+# Replaces REST fetch_ticker polling: every watch_ticker / watch_order_book
+# update is published to the ZMQ bus the moment it arrives, as a
+# tools/quote_codec.py record behind its bus topic.
+#
+#   python3 quoting/ws_gateway.py --exchange binance --symbol BTC/USDT --port 5001
+#   python3 quoting/ws_gateway.py --exchange kraken --symbol BTC/USDT --port 5003 --book
+#
+# Reconnects with exponential backoff on ccxt NetworkErrors (which include
+# ExchangeNotAvailable and RequestTimeout). Any other exception ends run_feed;
+# supervise() logs it and restarts the feed, also with backoff, so one bad
+# feed can't take the process down. PERMANENT_ERRORS (a misspelt symbol, bad
+# keys, an unsupported watch method) stop the feed for good instead. Gaps are tracked per feed: every
+# disconnect (and how long we were without data) and every sequence gap ccxt
+# detects in an order book stream (InvalidNonce, it resyncs on the next watch).
+# Downstream, quote_codec sequence numbers stay contiguous per feed, so
+# subscribers can spot quotes dropped on the bus.
+#
+# With --book the gateway also keeps a tools/order_book.py book and publishes
+# the levels that changed on each update as book deltas behind
+# quote_codec.book_topic(exchange, symbol); a full snapshot goes out first,
+# after every reconnect or sequence gap, and every SNAPSHOT_EVERY seconds so
+# late joiners and subscribers that dropped a delta can resync.
+#
+# Offline testing: record real frames once with --record FILE, which also saves
+# the markets to FILE.markets.json, then replay them with ws_replay_server.py:
+#
+#   python3 quoting/ws_replay_server.py FILE --port 8765
+#   python3 quoting/ws_gateway.py --exchange binance --symbol BTC/USDT \
+#       --ws_url ws://127.0.0.1:8765 --markets FILE.markets.json
+import asyncio
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import time
+import zmq
+import ccxt
+import ccxt.pro as ccxtpro
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from quote_codec import QuoteEncoder, BookEncoder, MSG_BOOK_DELTA, MSG_BOOK_SNAPSHOT, topic, book_topic
+from order_book import OrderBook
+from rate_limit import RateLimiter, attach, MARKET_DATA
+
+HOST = '127.0.0.1'
+BACKOFF_START = 0.5  # Seconds before the first reconnect attempt
+BACKOFF_MAX = 30
+BOOK_DEPTH = 20
+SNAPSHOT_EVERY = 5  # Seconds between full book snapshots
+STATS_EVERY = 30  # Seconds between feed stats lines
+
+# ccxt errors no retry will fix: the feed is stopped instead of reconnecting forever
+PERMANENT_ERRORS = (ccxt.BadRequest, ccxt.AuthenticationError, ccxt.NotSupported, ccxt.ArgumentsRequired)
+
+
+class FeedStats:
+    """Update, reconnect and gap counters for one feed"""
+
+    def __init__(self, name):
+        self.name = name
+        self.updates = 0
+        self.reconnects = 0
+        self.gaps = 0
+        self.restarts = 0
+        self.outage = 0.0  # Seconds spent without data because of disconnects
+        self.last_update = None
+        self.last_nonce = None
+        self.disconnected = False
+
+    def on_update(self, nonce=None):
+        now = time.time()
+        if self.disconnected:
+            # First update after a reconnect: everything since the last update is missing
+            lost = now - self.last_update if self.last_update is not None else 0.0
+            self.outage += lost
+            self.gaps += 1
+            self.disconnected = False
+            jump = f", sequence {self.last_nonce} -> {nonce}" if self.last_nonce is not None and nonce is not None else ""
+            print(f"{self.name}: reconnected, {lost:.1f}s without data{jump}")
+        self.updates += 1
+        self.last_update = now
+        if nonce is not None:
+            self.last_nonce = nonce
+
+    def on_disconnect(self, error):
+        self.reconnects += 1
+        self.disconnected = True
+        print(f"{self.name}: disconnected ({type(error).__name__}: {error})")
+
+    def on_crash(self, error, delay):
+        self.restarts += 1
+        self.disconnected = True
+        print(f"{self.name}: feed crashed ({type(error).__name__}: {error}), restarting in {delay:.1f}s")
+
+    def on_stop(self, error):
+        self.disconnected = True
+        print(f"{self.name}: feed stopped ({type(error).__name__}: {error})")
+
+    def on_sequence_gap(self, error):
+        self.gaps += 1
+        print(f"{self.name}: sequence gap, resyncing ({error})")
+
+    def report(self):
+        return (f"{self.name}: {self.updates} updates, {self.reconnects} reconnects, "
+                f"{self.restarts} restarts, {self.gaps} gaps ({self.outage:.1f}s without data)")
+
+
+async def run_feed(exchange, symbol, publish, book=False, stats=None, publish_book=None):
+    """Watch one symbol forever and publish(msg) each top-of-book update.
+
+    In book mode, publish_book(msg) (if given) gets the book deltas.
+    """
+    encoder = QuoteEncoder(exchange.id, symbol)
+    book_encoder = BookEncoder(exchange.id, symbol) if publish_book else None
+    local_book = OrderBook(symbol)
+    resync = True  # Next book message is a snapshot
+    next_snapshot = 0.0
+    stats = stats or FeedStats(f"{exchange.id} {symbol}")
+    backoff = BACKOFF_START
+    while True:
+        try:
+            if book:
+                orderbook = await exchange.watch_order_book(symbol, BOOK_DEPTH)
+                if not orderbook['bids'] or not orderbook['asks']:
+                    continue
+                bid, ask = orderbook['bids'][0][0], orderbook['asks'][0][0]
+                ts_ms, nonce = orderbook['timestamp'], orderbook.get('nonce')
+                if book_encoder is not None:
+                    ts_ns = int(ts_ms) * 1_000_000 if ts_ms else None
+                    local_book.sync_top(orderbook['bids'], orderbook['asks'], nonce, ts_ns or 0)
+                    deltas = local_book.take_deltas()
+                    now = time.monotonic()
+                    if resync or now >= next_snapshot:
+                        publish_book(book_encoder.encode(MSG_BOOK_SNAPSHOT, local_book.snapshot_levels(), ts_ns))
+                        resync = False
+                        next_snapshot = now + SNAPSHOT_EVERY
+                    elif deltas:
+                        publish_book(book_encoder.encode(MSG_BOOK_DELTA, deltas, ts_ns))
+            else:
+                ticker = await exchange.watch_ticker(symbol)
+                bid, ask, ts_ms, nonce = ticker['bid'], ticker['ask'], ticker['timestamp'], None
+            if bid is None or ask is None:
+                continue
+
+            stats.on_update(nonce)
+            publish(encoder.encode(bid, ask, int(ts_ms) * 1_000_000 if ts_ms else None))
+            backoff = BACKOFF_START
+
+        except asyncio.CancelledError:
+            raise
+        except ccxt.InvalidNonce as e:
+            # Missed book deltas; ccxt drops the book and resubscribes on the next watch
+            stats.on_sequence_gap(e)
+            resync = True
+        except ccxt.NetworkError as e:
+            stats.on_disconnect(e)
+            resync = True
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, BACKOFF_MAX)
+
+
+async def supervise(start_feed, stats):
+    """Await start_feed() (a new run_feed coroutine each time) until it hits a permanent error.
+
+    run_feed retries network errors itself; anything else ends it. Log that and
+    restart the feed with backoff instead of letting it end the event loop.
+    PERMANENT_ERRORS are logged and end the feed: supervise() returns.
+    """
+    backoff = BACKOFF_START
+    while True:
+        started = time.monotonic()
+        try:
+            await start_feed()
+            error = RuntimeError("feed returned")
+        except asyncio.CancelledError:
+            raise
+        except PERMANENT_ERRORS as e:
+            stats.on_stop(e)
+            return
+        except Exception as e:
+            error = e
+        if time.monotonic() - started > BACKOFF_MAX:
+            backoff = BACKOFF_START  # It ran for a while; this isn't a crash loop
+        delay = backoff * random.uniform(0.5, 1.0)
+        stats.on_crash(error, delay)
+        await asyncio.sleep(delay)
+        backoff = min(backoff * 2, BACKOFF_MAX)
+
+
+async def report_stats(feeds, every=STATS_EVERY):
+    while True:
+        await asyncio.sleep(every)
+        for stats in feeds:
+            print(stats.report())
+
+
+def override_ws_urls(exchange, ws_url):
+    """Point every public WebSocket endpoint of an exchange at ws_url"""
+    def replace(urls):
+        if isinstance(urls, str):
+            return ws_url
+        return {key: replace(value) for key, value in urls.items()}
+    exchange.urls['api']['ws'] = replace(exchange.urls['api']['ws'])
+
+
+def record_frames(exchange, path):
+    """Append every raw WebSocket message the exchange receives to a JSONL file"""
+    f = open(path, 'a')
+    handle_message = exchange.handle_message
+
+    def recording_handle_message(client, message):
+        f.write(json.dumps({'t': time.time(), 'msg': message}) + '\n')
+        return handle_message(client, message)
+
+    # Clients pick up exchange.handle_message when they connect
+    exchange.handle_message = recording_handle_message
+    return f
+
+
+def markets_path(record_path):
+    return record_path + '.markets.json'
+
+
+async def prepare_exchange(exchange, markets=None, ws_url=None, record=None):
+    """Preload markets (from a file or REST), apply the ws_url override and recording"""
+    if markets:
+        with open(markets) as f:
+            exchange.set_markets(json.load(f))
+    else:
+        await exchange.load_markets()
+    if ws_url:
+        override_ws_urls(exchange, ws_url)
+    if record:
+        with open(markets_path(record), 'w') as f:
+            json.dump(exchange.markets, f)
+        return record_frames(exchange, record)
+    return None
+
+
+def create_exchange(name):
+    """ccxt.pro exchange whose REST calls (markets, book snapshots) share the host-wide rate limit"""
+    exchange = getattr(ccxtpro, name)({'enableRateLimit': True})
+    return attach(exchange, RateLimiter.for_exchange(exchange), MARKET_DATA)
+
+
+async def main(args):
+    exchange = create_exchange(args.exchange)
+
+    context = zmq.Context()
+    sock = context.socket(zmq.PUB)
+    sock.bind(f"tcp://{HOST}:{args.port}")
+
+    feed_topic = topic(exchange.id, args.symbol)
+    feed_book_topic = book_topic(exchange.id, args.symbol)
+
+    def publish(msg):
+        sock.send_multipart([feed_topic, msg], zmq.NOBLOCK)
+
+    def publish_book(msg):
+        sock.send_multipart([feed_book_topic, msg], zmq.NOBLOCK)
+
+    record_file = None
+    stats = FeedStats(f"{args.exchange} {args.symbol}")
+    try:
+        record_file = await prepare_exchange(exchange, args.markets, args.ws_url, args.record)
+        print(f"Streaming {args.exchange} {args.symbol} {'order book' if args.book else 'ticker'} "
+              f"to tcp://{HOST}:{args.port}")
+        start_feed = functools.partial(run_feed, exchange, args.symbol, publish, args.book, stats, publish_book)
+        reporter = asyncio.ensure_future(report_stats([stats]))
+        try:
+            await supervise(start_feed, stats)  # Returns only if the feed is stopped
+        finally:
+            reporter.cancel()
+    finally:
+        print(stats.report())
+        await exchange.close()
+        if record_file is not None:
+            record_file.close()
+        sock.close(linger=0)
+        context.term()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='WebSocket Gateway',
+                    description='Stream ccxt.pro WebSocket quotes to the ZMQ quote bus.')
+
+    parser.add_argument('--exchange', type=str, required=True, help='ccxt exchange id, e.g. binance')
+    parser.add_argument('--symbol', type=str, default='BTC/USDT', help='Symbol to stream')
+    parser.add_argument('--port', type=int, default=5000, help='ZMQ PUB port')
+    parser.add_argument('--book', action='store_true', help='Use order book updates instead of the ticker')
+    parser.add_argument('--ws_url', type=str, help='Override the WebSocket endpoint, e.g. a local ws_replay_server.py')
+    parser.add_argument('--markets', type=str, help='Load markets from this JSON file instead of REST')
+    parser.add_argument('--record', type=str, help='Append raw WebSocket frames to this JSONL file')
+
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("\nGateway stopped.")
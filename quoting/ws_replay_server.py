@@ -0,0 +1,87 @@
+# Local stand-in for an exchange WebSocket endpoint
+#
+# Replays frames recorded by ws_gateway.py --record to every client that
+# connects, so the gateway (and ccxt.pro's parsing) can be exercised offline.
+# JSON-RPC style subscribe requests ({"id": ...}, Binance / Crypto.com) are
+# acknowledged; everything else the exchange sent, subscription acks included,
+# is in the recording and is replayed as-is after the client's first request.
+#
+# Exchanges that negotiate a WebSocket token over REST first (KuCoin) can't be
+# replayed this way.
+#
+#   python3 quoting/ws_replay_server.py frames.jsonl --port 8765 --speed 1
+import asyncio
+import argparse
+import json
+from aiohttp import web, WSMsgType
+
+
+def load_frames(path):
+    """[(seconds since first frame, message)] from a ws_gateway.py recording"""
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if not rows:
+        return []
+    t0 = rows[0]['t']
+    return [(row['t'] - t0, row['msg']) for row in rows]
+
+
+async def stream(ws, frames, speed, loop):
+    while True:
+        start = asyncio.get_running_loop().time()
+        for offset, message in frames:
+            if speed > 0:
+                delay = offset / speed - (asyncio.get_running_loop().time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await ws.send_str(json.dumps(message))
+        if not loop:
+            break
+    print(f"Replayed {len(frames)} frames")
+
+
+def make_app(frames, speed=1.0, loop=False):
+    async def handle(request):
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        print(f"Client connected on {request.path}")
+        streaming = None
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    req = json.loads(msg.data)
+                except ValueError:
+                    continue
+                if isinstance(req, dict) and 'id' in req:
+                    await ws.send_str(json.dumps({'result': None, 'id': req['id']}))
+                if streaming is None:
+                    streaming = asyncio.ensure_future(stream(ws, frames, speed, loop))
+        finally:
+            if streaming is not None:
+                streaming.cancel()
+            print("Client disconnected")
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)  # ccxt appends stream paths to the base URL
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='WebSocket Replay Server',
+                    description='Replay recorded exchange WebSocket frames for offline gateway tests.')
+
+    parser.add_argument('frames', type=str, help='JSONL recording from ws_gateway.py --record')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to bind')
+    parser.add_argument('--speed', type=float, default=1.0, help='0 = as fast as possible, 1 = recorded pace')
+    parser.add_argument('--loop', action='store_true', help='Start over at the end of the recording')
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    print(f"Loaded {len(frames)} frames from {args.frames}, serving on ws://{args.host}:{args.port}")
+    web.run_app(make_app(frames, args.speed, args.loop), host=args.host, port=args.port)
@@ -1,132 +1,121 @@
 #Strategy: Arbitrage between multiple exchanges
 
 import zmq
-import struct
 import time
-import json
-from collections import deque
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from quote_codec import QuoteRecord, iter_quotes, topic
+from order_sender import zmq_order_sender
+from venue_quotes import VenueQuotes
 
 # === CONFIG ===
-SYMBOL = 'BTC/USD'
+SYMBOL = 'BTC/USDT'
 HOST = '127.0.0.1'
 
 TRADE_PORT = 5001  # Port for sending trade orders
-QUOTE_BINANCE_URL = f"tcp://{HOST}:5001"
-QUOTE_CRYPTOCOMS_URL = f"tcp://{HOST}:5002"
-QUOTE_KRAKEN_URL = f"tcp://{HOST}:5003"
-QUOTE_KUCOIN_URL = f"tcp://{HOST}:5004"
+QUOTE_URL = f"tcp://{HOST}:5000"  # quoting/quote_daemon.py bus, one topic per venue
 
 TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
 STRATEGY_NAME = "Strategy Arb"  # Name of this strategy
 
-def send_order(trade_sock, order_type, symbol, price, strategy_name):
-        """Send order signal to trade daemon via ZMQ PUSH"""
-        order = {
-            'order_type': order_type,  # 'BUY' or 'SELL'
-            'symbol': symbol,
-            'price': price,
-            'strategy_name': strategy_name,
-            'timestamp': time.time()
-        }
-        try:
-            trade_sock.send_string(json.dumps(order), zmq.NOBLOCK)
-            return True
-        except zmq.Again:
-            print(f"  Warning: Could not send {order_type} order (queue full)")
+VENUES = ['binance', 'cryptocom', 'kraken', 'kucoin']  # ccxt ids, as in the bus topics
+STALE_AFTER = 2.0  # Ignore a venue whose last quote is older than this (seconds)
+MIN_EDGE = 0.0  # Best bid must beat best ask by more than this
+EXECUTE = False  # Only report opportunities, don't send orders
+
+
+class ArbStrategy:
+    """Cross-venue arbitrage check on every quote, independent of any transport.
+
+    Keeps the latest quote per venue and re-checks the best bid/ask across
+    fresh venues on each update. send_order(order_type, symbol, price,
+    strategy_name, ts) is called for both legs when execute is set.
+    """
+
+    def __init__(self, send_order, symbol=SYMBOL, venues=VENUES, stale_after=STALE_AFTER,
+                 min_edge=MIN_EDGE, strategy_name=STRATEGY_NAME, execute=EXECUTE, verbose=True):
+        self.send_order = send_order
+        self.symbol = symbol
+        self.quotes = VenueQuotes(venues, stale_after)
+        self.min_edge = min_edge
+        self.strategy_name = strategy_name
+        self.execute = execute
+        self.verbose = verbose
+        self.opportunity = None  # (buy venue, sell venue) while one is open
+        self.opportunities = 0
+
+    def on_quote(self, bid, ask, ts, symbol, venue):
+        """Process one venue quote. Returns True if it opened a new opportunity"""
+        if symbol != self.symbol:
             return False
-        except Exception as e:
-            print(f"  Error sending order: {e}")
+        self.quotes.update(venue, bid, ask, ts)
+        bid_venue, best_bid, ask_venue, best_ask = self.quotes.best()
+
+        if bid_venue is None or ask_venue is None or bid_venue == ask_venue or best_bid - best_ask <= self.min_edge:
+            if self.opportunity is not None and self.verbose:
+                print(f"Opportunity closed: buy {self.opportunity[0]} / sell {self.opportunity[1]}")
+            self.opportunity = None
+            return False
+
+        pair = (ask_venue, bid_venue)
+        if pair == self.opportunity:
             return False
+        self.opportunity = pair
+        self.opportunities += 1
+        if self.verbose:
+            print(f"Arbitrage Opportunity: Buy on {ask_venue} at {best_ask} and Sell on {bid_venue} at {best_bid}")
+        if self.execute:
+            self.send_order('BUY', self.symbol, best_ask, self.strategy_name, ts)
+            self.send_order('SELL', self.symbol, best_bid, self.strategy_name, ts)
+        return True
 
 
 def run_strategy():
-    # === ZMQ SUB setup (receives price quotes) ===
-    binance_context = zmq.Context()
-    quote_sock_binance = binance_context.socket(zmq.SUB)
-    quote_sock_binance.connect(QUOTE_BINANCE_URL)
-    quote_sock_binance.setsockopt_string(zmq.SUBSCRIBE, "")  
-    print("Subscribed to Binance quotes.")
-    cryptocoms_context = zmq.Context()
-    quote_sock_cryptocoms = cryptocoms_context.socket(zmq.SUB)
-    quote_sock_cryptocoms.connect(QUOTE_CRYPTOCOMS_URL)
-    quote_sock_cryptocoms.setsockopt_string(zmq.SUBSCRIBE, "")
-    print("Subscribed to Cryptocoms quotes.")
-    kraken_context = zmq.Context()
-    quote_sock_kraken = kraken_context.socket(zmq.SUB)
-    quote_sock_kraken.connect(QUOTE_KRAKEN_URL)
-    quote_sock_kraken.setsockopt_string(zmq.SUBSCRIBE, "")
-    print("Subscribed to Kraken quotes.")
-    kucoin_context = zmq.Context()
-    quote_sock_kucoin = kucoin_context.socket(zmq.SUB)
-    quote_sock_kucoin.connect(QUOTE_KUCOIN_URL)
-    quote_sock_kucoin.setsockopt_string(zmq.SUBSCRIBE, "")
-    print("Subscribed to Kucoin quotes.")
-    # === ZMQ PUSH setup (sends trade orders) ===
+    """Poll every venue's quote socket on one context and re-check on each quote"""
     context = zmq.Context()
+    poller = zmq.Poller()
+    sockets = []
+    for venue in VENUES:
+        sock = context.socket(zmq.SUB)
+        sock.connect(QUOTE_URL)
+        sock.setsockopt(zmq.SUBSCRIBE, topic(venue, SYMBOL))
+        poller.register(sock, zmq.POLLIN)
+        sockets.append(sock)
+        print(f"Subscribed to {venue} quotes.")
+
+    # === ZMQ PUSH setup (sends trade orders) ===
     trade_sock = context.socket(zmq.PUSH)
     trade_sock.connect(TRADE_URL)
 
-    print(f"Arbitrage Strategy listening for {SYMBOL} on multiple quote URLs and trade pub on {TRADE_URL}...")
+    strategy = ArbStrategy(zmq_order_sender(trade_sock))
+
+    print(f"Arbitrage Strategy listening for {SYMBOL} on {QUOTE_URL} and trade pub on {TRADE_URL}...")
     print("All setup!")
 
+    quote = QuoteRecord()
     while True:
         try:
-            # Receive quotes from all exchanges
-            msg_binance = quote_sock_binance.recv()
-            bid_binance, ask_binance, symbol_binance_bytes = struct.unpack('!dd16s', msg_binance)
-            symbol_binance = symbol_binance_bytes.split(b'\0', 1)[0].decode().strip()
-
-            msg_cryptocoms = quote_sock_cryptocoms.recv()
-            bid_cryptocoms, ask_cryptocoms, symbol_cryptocoms_bytes = struct.unpack('!dd16s', msg_cryptocoms)
-            symbol_cryptocoms = symbol_cryptocoms_bytes.split(b'\0', 1)[0].decode().strip()
-            
-            msg_kraken = quote_sock_kraken.recv()
-            bid_kraken, ask_kraken, symbol_kraken_bytes = struct.unpack('!dd16s', msg_kraken)
-            symbol_kraken = symbol_kraken_bytes.split(b'\0', 1)[0].decode().strip()
-          
-            msg_kucoin = quote_sock_kucoin.recv()
-            bid_kucoin, ask_kucoin, symbol_kucoin_bytes = struct.unpack('!dd16s', msg_kucoin)
-            symbol_kucoin = symbol_kucoin_bytes.split(b'\0', 1)[0].decode().strip()
-            
-            print("Received Prices:")
-            print(f"  Binance: Bid {bid_binance}, Ask {ask_binance}")
-            print(f"  Cryptocoms: Bid {bid_cryptocoms}, Ask {ask_cryptocoms}")
-            print(f"  Kraken: Bid {bid_kraken}, Ask {ask_kraken}")
-            print(f"  Kucoin: Bid {bid_kucoin}, Ask {ask_kucoin}")
-
-            # Simple arbitrage logic
-            # Buy from the exchange with the lowest ask and sell to the one with the highest bid
-            asks = {
-                'binance': ask_binance,
-                'cryptocoms': ask_cryptocoms,
-                'kraken': ask_kraken,
-                'kucoin': ask_kucoin
-            }
-            bids = {
-                'binance': bid_binance,
-                'cryptocoms': bid_cryptocoms,
-                'kraken': bid_kraken,
-                'kucoin': bid_kucoin
-            }
-
-            best_ask_exchange = min(asks, key=asks.get)
-            best_bid_exchange = max(bids, key=bids.get)
-            #print(f"Best Ask: {best_ask_exchange} at {asks[best_ask_exchange]:.2f}, Best Bid: {best_bid_exchange} at {bids[best_bid_exchange]:.2f}")
-
-            if bids[best_bid_exchange] > asks[best_ask_exchange]:
-                # Arbitrage opportunity detected
-                print(f"Arbitrage Opportunity: Buy on {best_ask_exchange} at {asks[best_ask_exchange]} and Sell on {best_bid_exchange} at {bids[best_bid_exchange]}")
-                # Send BUY order to best ask exchange
-                #send_order(trade_sock, 'BUY', SYMBOL, asks[best_ask_exchange], STRATEGY_NAME)
-                # Send SELL order to best bid exchange
-                #send_order(trade_sock, 'SELL', SYMBOL, bids[best_bid_exchange], STRATEGY_NAME)
-            else:
-                print("No arbitrage opportunity detected.")        
+            # Wake on whichever venue quotes first, take one message per ready venue
+            for sock, _ in poller.poll():
+                msg = sock.recv_multipart(zmq.NOBLOCK)[-1]
+                received = time.perf_counter()
+                for quote in iter_quotes(msg, quote):
+                    if strategy.on_quote(quote.bid, quote.ask, quote.ts, quote.symbol, quote.exchange):
+                        print(f"  detected {(time.perf_counter() - received) * 1e6:.0f} us after the {quote.exchange} quote")
+
+        except KeyboardInterrupt:
+            print("\nStrategy stopped.")
+            break
         except Exception as e:
             print("Error:", e)
 
-        time.sleep(0.1)
+    for sock in sockets:
+        sock.close(linger=0)
+    trade_sock.close()
+    context.term()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
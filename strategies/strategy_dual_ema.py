@@ -1,11 +1,19 @@
 # Strategy: Dual EMA
 # This strategy uses two EMAs to determine the trend and entry points.
 import zmq
-import struct
 import time
-import json
-from collections import deque
 import argparse
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from replay_feed import ReplayFeed
+from quote_feed import QuoteFeed
+from quote_codec import QuoteRecord, iter_quotes, symbol_topic
+from order_sender import zmq_order_sender
+from indicators import EMA
+from bars import BarBuilder
 
 # === CONFIG ===
 SYMBOL = 'BTC/USD'
@@ -14,135 +22,178 @@ QUOTE_PORT = 5000  # Port for receiving price quotes
 TRADE_PORT = 5001  # Port for sending trade orders
 QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
 TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
+CONTROL_URL = f"tcp://{HOST}:5559"  # Replay handshake/credit port (backtest only)
+BACKTEST = False
+REPLAY_FLOW = 'credit'
 
 EMA_FAST = 9
 EMA_SLOW = 25
 TIME_PERIOD = 60  # Update EMAs every N seconds (300 = 5 minutes)
-MAX_PRICES_SIZE = 100  # Maximum number of prices to keep in memory
+BAR_INTERVAL = None  # Seconds; update EMAs on every time-aligned bar close instead (TIME_PERIOD unused)
 STRATEGY_NAME = "dual_ema"  # Name of this strategy
 
+class DualEmaStrategy:
+    """Per-tick dual EMA decision logic, independent of any transport.
+
+    send_order(order_type, symbol, price, strategy_name, ts) is called for every
+    signal and should return True if the order was accepted.
+    """
+
+    def __init__(self, send_order, symbol=SYMBOL, ema_fast=EMA_FAST, ema_slow=EMA_SLOW,
+                 time_period=TIME_PERIOD, strategy_name=STRATEGY_NAME, verbose=True,
+                 bar_interval=BAR_INTERVAL):
+        self.send_order = send_order
+        self.symbol = symbol
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.time_period = time_period
+        self.strategy_name = strategy_name
+        self.verbose = verbose
+
+        self.fast = EMA(ema_fast)
+        self.slow = EMA(ema_slow)
+        self.ema9 = None
+        self.ema25 = None
+        self.quotes = 0  # Quotes seen, for the warm-up
+        self.position = 0  # 0 = flat, 1 = long, -1 = short
+        self.last_update_time = None  # Track when we last updated EMAs
+        # Bar mode: EMAs of bar closes, so every bar counts whatever the quote rate, see on_bar
+        self.bars = BarBuilder([symbol], bar_interval, self.on_bar) if bar_interval else None
+        self.bars_seen = 0
+        self.bid = self.ask = self.current_time = None
+
+    def check_crossover(self, price, bid, ask, ts):
+        """Trade a crossover of the current EMAs: BUY at ask, SELL at bid"""
+        ema9, ema25 = self.ema9, self.ema25
+
+        # === SIMPLE CROSSOVER LOGIC ===
+        if ema9 > ema25 and self.position <= 0:
+            if self.verbose:
+                print(f"\nBUY SIGNAL @ {price:.6f} | EMA9={ema9:.6f} > EMA25={ema25:.6f}")
+            self.position = 1
+            # Send BUY order to trade daemon
+            if self.send_order('BUY', self.symbol, ask, self.strategy_name, ts) and self.verbose:
+                print(f"  → BUY order sent to trade daemon")
+
+        elif ema9 < ema25 and self.position >= 0:
+            if self.verbose:
+                print(f"\nSELL SIGNAL @ {price:.6f} | EMA9={ema9:.6f} < EMA25={ema25:.6f}")
+            self.position = -1
+            # Send SELL order to trade daemon
+            if self.send_order('SELL', self.symbol, bid, self.strategy_name, ts) and self.verbose:
+                print(f"  → SELL order sent to trade daemon")
+
+    def on_bar(self, start, bars):
+        """Bar mode: update the EMAs on each bar close, signal once ema_slow bars are in"""
+        close = float(bars['close'][0])
+        if math.isnan(close):  # No quote yet
+            return
+        self.ema9 = self.fast.update(close)
+        self.ema25 = self.slow.update(close)
+        self.bars_seen += 1
+        if self.bars_seen < self.ema_slow:
+            if self.verbose:
+                print(f"\rWarming up... {self.bars_seen}/{self.ema_slow} bars", end="")
+            return
+        self.check_crossover(close, self.bid, self.ask, self.current_time)
+
+    def on_quote(self, bid, ask, ts, symbol):
+        """Process one quote; may emit BUY/SELL orders through send_order"""
+        if symbol != self.symbol:  # The SUBSCRIBE topic already filters the bus
+            return
+
+        price = (bid + ask) / 2  # mid price
+        # Store bid/ask for order execution
+        current_bid = bid
+        current_ask = ask
+        current_time = ts
+
+        if self.bars is not None:
+            self.bid, self.ask, self.current_time = bid, ask, ts
+            self.bars.update(symbol, bid, ask, ts)  # Calls on_bar when a bar closes
+            return
+
+        self.quotes += 1
+
+        # Check if it's time to update EMAs (every TIME_PERIOD seconds)
+        should_update = False
+        if self.last_update_time is None:
+            # First update - wait until we have minimum data
+            if self.quotes >= self.ema_slow:
+                should_update = True
+                self.last_update_time = current_time
+            else:
+                if self.verbose:
+                    print(f"\rWarming up... {self.quotes}/{self.ema_slow}", end="")
+                return
+        elif current_time - self.last_update_time >= self.time_period:
+            should_update = True
+            self.last_update_time = current_time
+
+        # Only update EMAs and check signals at the configured time interval
+        if should_update:
+            if self.verbose:
+                print("\rStrategy LIVE!                ", end="")
+
+            # Update EMAs
+            self.ema9 = self.fast.update(price)
+            self.ema25 = self.slow.update(price)
+
+            self.check_crossover(price, current_bid, current_ask, current_time)
+
+        # Optional: print current state every 5 seconds (only if EMAs are initialized)
+        if self.verbose and self.ema9 is not None and self.ema25 is not None and int(current_time) % 5 == 0:
+            status = "LONG " if self.position == 1 else "SHORT" if self.position == -1 else "FLAT "
+            print(f"\r[{time.strftime('%H:%M:%S')}] {status} | Price {price:.6f} | EMA9 {self.ema9:.6f} | EMA25 {self.ema25:.6f}", end="")
+
+
 def run_strategy():
     """Dual EMA strategy: sends trade signals via ZMQ PUSH"""
     # === ZMQ SUB setup (receives price quotes) ===
     context = zmq.Context()
-    quote_sock = context.socket(zmq.SUB)
-    quote_sock.connect(QUOTE_URL)
-    quote_sock.setsockopt_string(zmq.SUBSCRIBE, "")  # subscribe to everything
+    topics = [symbol_topic(SYMBOL)]  # Only our symbol, from every exchange
+    if BACKTEST:
+        # Lossless replay: handshake + flow control with data_prep.py
+        quote_sock = ReplayFeed(context, QUOTE_URL, CONTROL_URL, REPLAY_FLOW, topics=topics)
+    else:
+        quote_sock = QuoteFeed(context, QUOTE_URL, topics)
 
     # === ZMQ PUSH setup (sends trade orders) ===
     trade_sock = context.socket(zmq.PUSH)
     trade_sock.connect(TRADE_URL)
 
-    # For EMA calculation
-    prices = deque()
-    ema9 = None
-    ema25 = None
-    position = 0  # 0 = flat, 1 = long, -1 = short
-    last_update_time = None  # Track when we last updated EMAs
-
-    def update_ema(price, prev_ema, period):
-        if prev_ema is None:
-            return price
-        k = 2 / (period + 1)
-        return price * k + prev_ema * (1 - k)
-
-    def send_order(order_type, symbol, price, strategy_name):
-        """Send order signal to trade daemon via ZMQ PUSH"""
-        order = {
-            'order_type': order_type,  # 'BUY' or 'SELL'
-            'symbol': symbol,
-            'price': price,
-            'strategy_name': strategy_name,
-            'timestamp': time.time()
-        }
-        try:
-            trade_sock.send_string(json.dumps(order), zmq.NOBLOCK)
-            return True
-        except zmq.Again:
-            print(f"  Warning: Could not send {order_type} order (queue full)")
-            return False
-        except Exception as e:
-            print(f"  Error sending order: {e}")
-            return False
+    strategy = DualEmaStrategy(zmq_order_sender(trade_sock), bar_interval=BAR_INTERVAL)
 
     print(f"EMA 9/25 Strategy listening for {SYMBOL} on {QUOTE_URL} and trade pub on {TRADE_URL}...")
-    print(f"Update period: {TIME_PERIOD} seconds ({TIME_PERIOD/60:.1f} minutes)")
+    if BAR_INTERVAL:
+        print(f"Bars: {BAR_INTERVAL} seconds")
+    else:
+        print(f"Update period: {TIME_PERIOD} seconds ({TIME_PERIOD/60:.1f} minutes)")
     print("Waiting for data...\n")
 
+    quote = QuoteRecord()
     while True:
         try:
             # Receive your exact binary message format
             msg = quote_sock.recv()  # blocks until message arrives
-            bid, ask, ts, symbol_bytes = struct.unpack('!ddd16s', msg)
-            symbol = symbol_bytes.split(b'\0', 1)[0].decode().strip()
-
-            if symbol != SYMBOL:  # your quote.py sends "XRPUSDT"
-                print("Skipping non-matching symbol:", symbol)
-                continue
-
-            price = (bid + ask) / 2  # mid price
-            # Store bid/ask for order execution
-            current_bid = bid
-            current_ask = ask
-            current_time = ts
-
-            # Add price and keep only max size
-            prices.append(price)
-            if len(prices) > MAX_PRICES_SIZE:
-                prices.popleft()
-
-            # Check if it's time to update EMAs (every TIME_PERIOD seconds)
-            should_update = False
-            if last_update_time is None:
-                # First update - wait until we have minimum data
-                if len(prices) >= EMA_SLOW:
-                    should_update = True
-                    last_update_time = current_time
-                else:
-                    print(f"\rWarming up... {len(prices)}/{EMA_SLOW}", end="")
-                    continue
-            elif current_time - last_update_time >= TIME_PERIOD:
-                should_update = True
-                last_update_time = current_time
-
-            # Only update EMAs and check signals at the configured time interval
-            if should_update:
-                print("\rStrategy LIVE!                ", end="")
-
-                # Update EMAs
-                ema9 = update_ema(price, ema9, EMA_FAST)
-                ema25 = update_ema(price, ema25, EMA_SLOW)
-
-                # === SIMPLE CROSSOVER LOGIC ===
-                if ema9 > ema25 and position <= 0:
-                    print(f"\nBUY SIGNAL @ {price:.6f} | EMA9={ema9:.6f} > EMA25={ema25:.6f}")
-                    position = 1
-                    # Send BUY order to trade daemon
-                    if send_order('BUY', SYMBOL, current_ask, STRATEGY_NAME):
-                        print(f"  → BUY order sent to trade daemon")
-
-                elif ema9 < ema25 and position >= 0:
-                    print(f"\nSELL SIGNAL @ {price:.6f} | EMA9={ema9:.6f} < EMA25={ema25:.6f}")
-                    position = -1
-                    # Send SELL order to trade daemon
-                    if send_order('SELL', SYMBOL, current_bid, STRATEGY_NAME):
-                        print(f"  → SELL order sent to trade daemon")
-
-            # Optional: print current state every 5 seconds (only if EMAs are initialized)
-            if ema9 is not None and ema25 is not None and int(current_time) % 5 == 0:
-                status = "LONG " if position == 1 else "SHORT" if position == -1 else "FLAT "
-                print(f"\r[{time.strftime('%H:%M:%S')}] {status} | Price {price:.6f} | EMA9 {ema9:.6f} | EMA25 {ema25:.6f}", end="")
+            if msg is None:
+                print("\nReplay finished.")
+                break
+            # Single quote or batch frame, decoded into the same record
+            for quote in iter_quotes(msg, quote):
+                strategy.on_quote(quote.bid, quote.ask, quote.ts, quote.symbol)
 
         except KeyboardInterrupt:
             print("\nStrategy stopped.")
-            quote_sock.close()
-            trade_sock.close()
-            context.term()
             break
         except Exception as e:
             print("Error:", e)
             time.sleep(1)
 
+    quote_sock.close()
+    trade_sock.close()
+    context.term()
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -154,10 +205,17 @@ if __name__ == '__main__':
     parser.add_argument('--trade_port', type=int, default=TRADE_PORT, help='Trade Port to connect to')   
     parser.add_argument('--backtest', action='store_true',
                     help='Set to True if connecting to backtester data feed.')
+    parser.add_argument('--replay_flow', choices=['credit', 'push'], default=REPLAY_FLOW,
+                    help='Flow control mode data_prep.py was started with (backtest only).')
+    parser.add_argument('--bars', type=float, default=BAR_INTERVAL, metavar='SECONDS',
+                    help='Trade on time-aligned bars of this many seconds instead of quotes.')
 
     args = parser.parse_args()
+    BAR_INTERVAL = args.bars
 
     if args.backtest == True:
+        BACKTEST = True
+        REPLAY_FLOW = args.replay_flow
         QUOTE_PORT = 5557  # Backtester data feed port
         QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
 
@@ -0,0 +1,289 @@
+# Strategy Host: many strategies on one quote subscription
+# Each strategy_XYZ.py script is its own process with its own ZMQ context and SUB
+# socket, and decodes every quote itself, so ten EMA settings cost ten decodes
+# of the same stream. The host subscribes once to the union of its strategies'
+# topics, decodes each quote once and calls on_quote() of every strategy
+# registered for that symbol, in the order they were added. The strategies are
+# the same transport-free objects the single scripts and event_backtest.py use;
+# they share one PUSH socket to the trade daemon, and their strategy_name keeps
+# their orders and risk apart.
+#
+# CPU is accounted per strategy and printed every REPORT_EVERY seconds and on
+# exit, next to the host's process CPU (which includes ZMQ's I/O thread). Each
+# on_quote call is timed with perf_counter, ~4x cheaper than the thread CPU
+# clock, which is only read around each frame's dispatch; the calls' wall time
+# is scaled by that CPU/wall ratio, so time the host spent preempted (e.g. by
+# another host on its core) isn't billed to the strategies.
+#
+#   python3 strategies/strategy_host.py --ema 9:25 --ema 5:20 --stat_arb BTC/USDT:ETH/USDT --arb BTC/USDT
+#   python3 strategies/strategy_host.py ... --hosts 4    # strategies split over 4 hosts, one per core
+#   python3 strategies/strategy_host.py ... --cpu 2      # one host pinned to core 2
+import zmq
+import time
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from replay_feed import ReplayFeed
+from quote_feed import QuoteFeed
+from quote_codec import QuoteRecord, iter_quotes, symbol_topic
+from order_sender import zmq_order_sender
+from strategy_dual_ema import DualEmaStrategy
+from strategy_stat_arb import StatArbStrategy
+from strategy_arb import ArbStrategy
+
+# === CONFIG ===
+HOST = '127.0.0.1'
+QUOTE_PORT = 5000  # Port for receiving price quotes
+TRADE_PORT = 5001  # Port for sending trade orders
+QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
+TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
+CONTROL_URL = f"tcp://{HOST}:5559"  # Replay handshake/credit port (backtest only)
+BACKTEST = False
+REPLAY_FLOW = 'credit'
+
+EMA_SYMBOL = 'BTC/USDT'
+REPORT_EVERY = 60  # Seconds between CPU reports (0 = only on exit)
+
+# (kind, constructor arguments), used when no strategy is given on the command line
+STRATEGIES = [
+    ('dual_ema', {'symbol': EMA_SYMBOL, 'ema_fast': 9, 'ema_slow': 25}),
+    ('dual_ema', {'symbol': EMA_SYMBOL, 'ema_fast': 5, 'ema_slow': 20}),
+    ('stat_arb', {'symbol1': 'BTC/USDT', 'symbol2': 'ETH/USDT'}),
+]
+
+
+def base(symbol):
+    return symbol.split('/')[0].lower()
+
+
+def build_strategy(kind, params, send_order, verbose=False):
+    """Strategy object for one spec. Returns (strategy, symbols it trades, whether on_quote takes the venue)"""
+    if kind == 'dual_ema':
+        params = {'strategy_name': f"dual_ema_{base(params.get('symbol', EMA_SYMBOL))}_"
+                                   f"{params['ema_fast']}_{params['ema_slow']}", **params}
+        strategy = DualEmaStrategy(send_order, verbose=verbose, **params)
+        return strategy, [strategy.symbol], False
+    if kind == 'stat_arb':
+        params = {'strategy_name': f"stat_arb_{base(params['symbol1'])}_{base(params['symbol2'])}", **params}
+        strategy = StatArbStrategy(send_order, verbose=verbose, **params)
+        return strategy, [strategy.symbol1, strategy.symbol2], False
+    if kind == 'arb':
+        params = {'strategy_name': f"arb_{base(params['symbol'])}", **params}
+        strategy = ArbStrategy(send_order, verbose=verbose, **params)
+        return strategy, [strategy.symbol], True
+    raise ValueError(f"Unknown strategy kind: {kind}")
+
+
+class StrategyHost:
+    """Decodes each quote frame once and dispatches it to the strategies registered for its symbol"""
+
+    def __init__(self):
+        self.names = []
+        self.routes = {}  # symbol -> [(slot, on_quote, wants venue)]
+        # Per strategy slot (plain lists: cheaper than NumPy for scalar updates)
+        self.calls = []
+        self.busy_ns = []
+        self.errors = []
+        self.quotes = 0
+        self.unrouted = 0
+        self.dispatch_ns = 0  # Wall and thread CPU time inside dispatch()
+        self.dispatch_cpu_ns = 0
+        self.quote = QuoteRecord()
+
+    def add(self, name, strategy, symbols, with_venue=False):
+        """Register a strategy for quotes on `symbols`; with_venue passes the exchange to on_quote too"""
+        if name in self.names:
+            raise ValueError(f"Duplicate strategy name: {name}")
+        slot = len(self.names)
+        self.names.append(name)
+        self.calls.append(0)
+        self.busy_ns.append(0)
+        self.errors.append(0)
+        for symbol in dict.fromkeys(symbols):
+            self.routes.setdefault(symbol, []).append((slot, strategy.on_quote, with_venue))
+        return slot
+
+    def topics(self):
+        return [symbol_topic(symbol) for symbol in self.routes]
+
+    def dispatch(self, msg):
+        """Decode one single-quote or batch frame and run every interested strategy on each quote"""
+        routes, calls, busy_ns = self.routes, self.calls, self.busy_ns
+        clock = time.perf_counter_ns
+        cpu_start, wall_start = time.thread_time_ns(), clock()
+        for quote in iter_quotes(msg, self.quote):
+            self.quotes += 1
+            handlers = routes.get(quote.symbol)
+            if handlers is None:
+                self.unrouted += 1
+                continue
+            bid, ask, ts, symbol = quote.bid, quote.ask, quote.ts, quote.symbol
+            for slot, on_quote, with_venue in handlers:
+                start = clock()
+                try:
+                    if with_venue:
+                        on_quote(bid, ask, ts, symbol, quote.exchange)
+                    else:
+                        on_quote(bid, ask, ts, symbol)
+                except Exception as e:
+                    # One broken strategy mustn't stop the others
+                    self.errors[slot] += 1
+                    print(f"Error in {self.names[slot]}: {e}")
+                busy_ns[slot] += clock() - start
+                calls[slot] += 1
+        self.dispatch_ns += clock() - wall_start
+        self.dispatch_cpu_ns += time.thread_time_ns() - cpu_start
+
+    def cpu_seconds(self):
+        """Each strategy's CPU seconds: its on_quote wall time scaled by dispatch's CPU/wall ratio"""
+        ratio = min(self.dispatch_cpu_ns / self.dispatch_ns, 1.0) if self.dispatch_ns else 1.0
+        return [busy * ratio / 1e9 for busy in self.busy_ns]
+
+    def report(self, label, process_seconds):
+        """Print quotes, host CPU and each strategy's calls, CPU and share of the host's process CPU"""
+        strategy_seconds = self.cpu_seconds()
+        decode = max(self.dispatch_cpu_ns / 1e9 - sum(strategy_seconds), 0.0)
+        print(f"[{label}] {self.quotes:,} quotes | process CPU {process_seconds:.2f} s | "
+              f"decode + dispatch {decode:.2f} s")
+        for name, calls, seconds, errors in zip(self.names, self.calls, strategy_seconds, self.errors):
+            per_call = seconds / calls * 1e6 if calls else 0.0
+            share = seconds / process_seconds * 100 if process_seconds else 0.0
+            print(f"  {name:<28} {calls:>12,} calls {seconds:>9.3f} s {per_call:>8.1f} us/call "
+                  f"{share:>5.1f}%" + (f" | {errors} errors" if errors else ""))
+
+
+def run_host(specs, cpu=None, label='host', verbose=False):
+    """Run `specs` on one subscription until interrupted (or the replay ends), pinned to `cpu` if given"""
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+        label = f"{label} cpu {cpu}"
+
+    # === ZMQ PUSH setup (sends trade orders), shared by every strategy ===
+    context = zmq.Context()
+    trade_sock = context.socket(zmq.PUSH)
+    trade_sock.connect(TRADE_URL)
+    send_order = zmq_order_sender(trade_sock)
+
+    host = StrategyHost()
+    for kind, params in specs:
+        strategy, symbols, with_venue = build_strategy(kind, params, send_order, verbose)
+        host.add(strategy.strategy_name, strategy, symbols, with_venue)
+
+    # === ZMQ SUB setup: one subscription for all of them ===
+    if BACKTEST:
+        # Lossless replay: handshake + flow control with data_prep.py (--subscribers = number of hosts)
+        quote_sock = ReplayFeed(context, QUOTE_URL, CONTROL_URL, REPLAY_FLOW, topics=host.topics())
+    else:
+        quote_sock = QuoteFeed(context, QUOTE_URL, host.topics())
+
+    print(f"[{label}] {len(host.names)} strategies on {', '.join(host.routes)} from {QUOTE_URL}, "
+          f"orders to {TRADE_URL}: {', '.join(host.names)}")
+
+    cpu_start = time.process_time()
+    next_report = time.monotonic() + REPORT_EVERY if REPORT_EVERY else None
+    while True:
+        try:
+            msg = quote_sock.recv()  # blocks until message arrives
+            if msg is None:
+                print(f"\n[{label}] Replay finished.")
+                break
+            host.dispatch(msg)
+            if next_report is not None and time.monotonic() >= next_report:
+                host.report(label, time.process_time() - cpu_start)
+                next_report += REPORT_EVERY
+
+        except KeyboardInterrupt:
+            print(f"\n[{label}] Host stopped.")
+            break
+        except Exception as e:
+            print("Error:", e)
+            time.sleep(1)
+
+    host.report(label, time.process_time() - cpu_start)
+    quote_sock.close()
+    trade_sock.close()
+    context.term()
+
+
+def parse_pair(text, option):
+    parts = text.split(':')
+    if len(parts) != 2:
+        raise argparse.ArgumentTypeError(f"{option} expects A:B, got {text}")
+    return parts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Strategy Host',
+                    description='Run many strategies on one quote subscription, pinned to cores.')
+
+    parser.add_argument('--host', type=str, default=HOST, help='Host to connect to')
+    parser.add_argument('--quote_port', type=int, default=QUOTE_PORT, help='Quote Port to connect to')
+    parser.add_argument('--trade_port', type=int, default=TRADE_PORT, help='Trade Port to connect to')
+    parser.add_argument('--ema', action='append', default=[], metavar='FAST:SLOW',
+                    help='Dual EMA on --ema_symbol; repeat for more settings')
+    parser.add_argument('--ema_symbol', type=str, default=EMA_SYMBOL)
+    parser.add_argument('--stat_arb', action='append', default=[], metavar='SYMBOL1:SYMBOL2',
+                    help='Stat arb pair; repeat for more pairs')
+    parser.add_argument('--arb', action='append', default=[], metavar='SYMBOL',
+                    help='Cross-venue arb on a symbol; repeat for more symbols')
+    parser.add_argument('--hosts', type=int, default=1,
+                    help='Split the strategies over this many host processes, one per core')
+    parser.add_argument('--cpu', type=int, help='Pin a single host to this core')
+    parser.add_argument('--report_every', type=float, default=REPORT_EVERY,
+                    help='Seconds between CPU reports (0 = only on exit)')
+    parser.add_argument('--verbose', action='store_true', help="Print the strategies' own output")
+    parser.add_argument('--backtest', action='store_true',
+                    help='Set to True if connecting to backtester data feed.')
+    parser.add_argument('--replay_flow', choices=['credit', 'push'], default=REPLAY_FLOW,
+                    help='Flow control mode data_prep.py was started with (backtest only).')
+
+    args = parser.parse_args()
+
+    HOST = args.host
+    QUOTE_PORT = args.quote_port
+    TRADE_PORT = args.trade_port
+    REPORT_EVERY = args.report_every
+    if args.backtest == True:
+        BACKTEST = True
+        REPLAY_FLOW = args.replay_flow
+        QUOTE_PORT = 5557  # Backtester data feed port
+        TRADE_PORT = 5558  # Backtester trade order port
+    QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
+    TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
+    CONTROL_URL = f"tcp://{HOST}:5559"
+
+    specs = []
+    for text in args.ema:
+        fast, slow = (int(n) for n in parse_pair(text, '--ema'))
+        specs.append(('dual_ema', {'symbol': args.ema_symbol, 'ema_fast': fast, 'ema_slow': slow}))
+    for text in args.stat_arb:
+        symbol1, symbol2 = parse_pair(text, '--stat_arb')
+        specs.append(('stat_arb', {'symbol1': symbol1, 'symbol2': symbol2}))
+    for symbol in args.arb:
+        specs.append(('arb', {'symbol': symbol}))
+    specs = specs or STRATEGIES
+
+    if args.hosts <= 1:
+        run_host(specs, args.cpu, verbose=args.verbose)
+    else:
+        if BACKTEST and REPLAY_FLOW == 'push':
+            parser.error('--hosts needs --replay_flow credit: PUSH hands each quote to only one host')
+        # Round-robin the strategies over the hosts and each host over the cores we may use
+        cores = sorted(os.sched_getaffinity(0))
+        hosts = min(args.hosts, len(specs))
+        fork = multiprocessing.get_context('fork')  # Children inherit the URLs set above
+        procs = [fork.Process(target=run_host,
+                                 args=(specs[i::hosts], cores[i % len(cores)], f"host {i}", args.verbose))
+                 for i in range(hosts)]
+        for p in procs:
+            p.start()
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            for p in procs:
+                p.join()
@@ -1,189 +1,251 @@
 # Strategy: Statistical Arbitrage (Stat Arb) for BTC/ETH Pair
 # This strategy uses cointegration and mean reversion on the BTC/ETH spread.
 import zmq
-import struct
 import time
-import json
-from collections import deque
 import argparse
-import numpy as np  # For regression and stats
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from replay_feed import ReplayFeed
+from quote_feed import QuoteFeed
+from quote_codec import QuoteRecord, iter_quotes, symbol_topic
+from order_sender import zmq_order_sender
+from indicators import RingBuffer, RollingOLS
+from bars import BarBuilder
 
 # === CONFIG ===
-SYMBOL1 = 'BTCUSDT'  # Primary symbol (e.g., BTC)
-SYMBOL2 = 'ETHUSDT'  # Secondary symbol (e.g., ETH)
+SYMBOL1 = 'BTC/USDT'  # Primary symbol (e.g., BTC)
+SYMBOL2 = 'ETH/USDT'  # Secondary symbol (e.g., ETH)
 HOST = '127.0.0.1'
 QUOTE_PORT = 5000  # Port for receiving price quotes
 TRADE_PORT = 5001  # Port for sending trade orders
 QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
 TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
+CONTROL_URL = f"tcp://{HOST}:5559"  # Replay handshake/credit port (backtest only)
+BACKTEST = False
+REPLAY_FLOW = 'credit'
 
 LOOKBACK = 100  # Number of periods for rolling stats and beta
 ENTRY_Z = 2.0   # Z-score threshold for entry
 EXIT_Z = 0.5    # Z-score threshold for exit (closer to mean)
-TIME_PERIOD = 60  # Update stats every N seconds (60 = 1 minute)
-MAX_PRICES_SIZE = 200  # Maximum number of prices to keep in memory (larger for lookback)
+TIME_PERIOD = 60  # Check signals every N seconds (60 = 1 minute, 0 = every quote)
+BAR_INTERVAL = None  # Seconds; fit and check on time-aligned bar closes instead (TIME_PERIOD unused)
 STRATEGY_NAME = "stat_arb_btc_eth"  # Name of this strategy
 
+class StatArbStrategy:
+    """Per-tick stat arb decision logic, independent of any transport.
+
+    send_order(order_type, symbol, price, strategy_name, ts) is called for every
+    leg and should return True if the order was accepted.
+    """
+
+    def __init__(self, send_order, symbol1=SYMBOL1, symbol2=SYMBOL2, lookback=LOOKBACK,
+                 entry_z=ENTRY_Z, exit_z=EXIT_Z, time_period=TIME_PERIOD,
+                 strategy_name=STRATEGY_NAME, verbose=True, bar_interval=BAR_INTERVAL):
+        self.send_order = send_order
+        self.symbol1 = symbol1
+        self.symbol2 = symbol2
+        self.lookback = lookback
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.time_period = time_period
+        self.strategy_name = strategy_name
+        self.verbose = verbose
+
+        # Rolling fit of SYMBOL1 on SYMBOL2 over the last `lookback` SYMBOL1 quotes,
+        # each paired with the latest SYMBOL2 mid. O(1) per quote whatever the lookback
+        self.ols = RollingOLS(lookback)
+        self.zscore = None
+        # Last quotes of each symbol, only kept until the first check (see on_quote)
+        self.warmup1 = RingBuffer(lookback)
+        self.warmup2 = RingBuffer(lookback)
+        self.current_data = {
+            symbol1: {'bid': 0, 'ask': 0, 'mid': 0},
+            symbol2: {'bid': 0, 'ask': 0, 'mid': 0}
+        }
+        # Bar mode: both symbols' mids resampled onto one clock, see on_bar
+        self.bars = BarBuilder([symbol1, symbol2], bar_interval, self.on_bar) if bar_interval else None
+        self.position = 0  # 0 = flat, 1 = long spread (long BTC, short ETH), -1 = short spread (short BTC, long ETH)
+        self.last_update_time = None  # Track when we last updated stats
+        self.current_time = None
+
+    def send_pair_orders(self, action1, symbol1, price1, action2, symbol2, price2):
+        """Send two orders for the pair"""
+        success1 = self.send_order(action1, symbol1, price1, self.strategy_name, self.current_time)
+        success2 = self.send_order(action2, symbol2, price2, self.strategy_name, self.current_time)
+        if success1 and success2 and self.verbose:
+            print(f"  → Pair orders sent: {action1} {symbol1}, {action2} {symbol2}")
+        return success1 and success2
+
+    def check_signals(self, ols, current_p1, current_p2):
+        """Trade the Z-score of current_p1 - beta * current_p2 against the fit's window"""
+        SYMBOL1, SYMBOL2 = self.symbol1, self.symbol2
+        current_data = self.current_data
+
+        # Beta (hedge ratio) of p1 on p2 and the Z-score of the current spread
+        # against the window's spreads, from the rolling sums
+        beta = ols.beta
+        current_spread = current_p1 - beta * current_p2
+        zscore = self.zscore = ols.spread_zscore(current_p2, current_p1, beta)
+
+        # === STAT ARB LOGIC ===
+        # Long spread: BUY BTC (at ask), SELL ETH (at bid)
+        # Short spread: SELL BTC (at bid), BUY ETH (at ask)
+        if zscore > self.entry_z and self.position != -1:
+            if self.verbose:
+                print(f"\nSHORT SPREAD SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
+            self.send_pair_orders(
+                'SELL', SYMBOL1, current_data[SYMBOL1]['bid'],
+                'BUY', SYMBOL2, current_data[SYMBOL2]['ask']
+            )
+            self.position = -1
+
+        elif zscore < -self.entry_z and self.position != 1:
+            if self.verbose:
+                print(f"\nLONG SPREAD SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
+            self.send_pair_orders(
+                'BUY', SYMBOL1, current_data[SYMBOL1]['ask'],
+                'SELL', SYMBOL2, current_data[SYMBOL2]['bid']
+            )
+            self.position = 1
+
+        elif abs(zscore) < self.exit_z and self.position != 0:
+            if self.verbose:
+                print(f"\nEXIT SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
+            if self.position == 1:  # Close long spread
+                self.send_pair_orders(
+                    'SELL', SYMBOL1, current_data[SYMBOL1]['bid'],
+                    'BUY', SYMBOL2, current_data[SYMBOL2]['ask']
+                )
+            elif self.position == -1:  # Close short spread
+                self.send_pair_orders(
+                    'BUY', SYMBOL1, current_data[SYMBOL1]['ask'],
+                    'SELL', SYMBOL2, current_data[SYMBOL2]['bid']
+                )
+            self.position = 0
+
+    def on_bar(self, start, bars):
+        """Bar mode: fit and check once per interval on the two symbols' bar closes"""
+        close1, close2 = bars['close'].tolist()
+        if math.isnan(close1) or math.isnan(close2):
+            return
+        self.ols.update(close2, close1)
+        if not self.ols.full:
+            if self.verbose:
+                print(f"\rWarming up... {len(self.ols)}/{self.lookback} bars", end="")
+            return
+        self.check_signals(self.ols, close1, close2)
+
+    def on_quote(self, bid, ask, ts, symbol):
+        """Process one quote; may emit paired orders through send_order"""
+        SYMBOL1, SYMBOL2 = self.symbol1, self.symbol2
+        LOOKBACK = self.lookback
+        ols, current_data = self.ols, self.current_data
+
+        if symbol not in [SYMBOL1, SYMBOL2]:
+            return
+
+        price = (bid + ask) / 2  # mid price
+        current_data[symbol]['bid'] = bid
+        current_data[symbol]['ask'] = ask
+        current_data[symbol]['mid'] = price
+        current_time = ts
+        self.current_time = ts
+
+        if self.bars is not None:
+            self.bars.update(symbol, bid, ask, ts)  # Calls on_bar when a bar closes
+            return
+
+        # Each SYMBOL1 quote adds a (SYMBOL2 mid, SYMBOL1 mid) pair to the rolling fit
+        if symbol == SYMBOL1 and current_data[SYMBOL2]['mid']:
+            ols.update(current_data[SYMBOL2]['mid'], price)
+
+        # Check if it's time to update stats (every TIME_PERIOD seconds)
+        should_update = False
+        if self.last_update_time is None:
+            (self.warmup1 if symbol == SYMBOL1 else self.warmup2).append(price)
+            # First update - as soon as both symbols have LOOKBACK quotes. The pair
+            # window can still be a pair short then, so this one check fits the two
+            # quote windows directly
+            if ols.full or (self.warmup1.full and self.warmup2.full):
+                if not ols.full:
+                    ols = RollingOLS(LOOKBACK)
+                    for x, y in zip(self.warmup2.values(), self.warmup1.values()):
+                        ols.update(x, y)
+                self.warmup1 = self.warmup2 = None
+                should_update = True
+                self.last_update_time = current_time
+            else:
+                if self.verbose:
+                    print(f"\rWarming up... {len(ols)}/{LOOKBACK}", end="")
+                return
+        elif current_time - self.last_update_time >= self.time_period:
+            should_update = True
+            self.last_update_time = current_time
+
+        # Only update stats and check signals at the configured time interval
+        if should_update:
+            if self.verbose:
+                print("\rStrategy LIVE!                ", end="")
+
+            self.check_signals(ols, current_data[SYMBOL1]['mid'], current_data[SYMBOL2]['mid'])
+
+        # Optional: print current state every 5 seconds (if warmed up)
+        if self.verbose and self.zscore is not None and int(current_time) % 5 == 0:
+            status = "LONG SPREAD " if self.position == 1 else "SHORT SPREAD" if self.position == -1 else "FLAT "
+            print(f"\r[{time.strftime('%H:%M:%S')}] {status} | BTC {current_data[SYMBOL1]['mid']:.2f} | ETH {current_data[SYMBOL2]['mid']:.2f} | Z {self.zscore:.2f} ", end="")
+
+
 def run_strategy():
     """Stat Arb strategy: sends paired trade signals via ZMQ PUSH"""
     # === ZMQ SUB setup (receives price quotes) ===
     context = zmq.Context()
-    quote_sock = context.socket(zmq.SUB)
-    quote_sock.connect(QUOTE_URL)
-    quote_sock.setsockopt_string(zmq.SUBSCRIBE, "")  # subscribe to everything
+    topics = [symbol_topic(SYMBOL1), symbol_topic(SYMBOL2)]  # Only the pair's quotes
+    if BACKTEST:
+        # Lossless replay: handshake + flow control with data_prep.py
+        quote_sock = ReplayFeed(context, QUOTE_URL, CONTROL_URL, REPLAY_FLOW, topics=topics)
+    else:
+        quote_sock = QuoteFeed(context, QUOTE_URL, topics)
 
     # === ZMQ PUSH setup (sends trade orders) ===
     trade_sock = context.socket(zmq.PUSH)
     trade_sock.connect(TRADE_URL)
 
-    # For price storage
-    prices1 = deque(maxlen=MAX_PRICES_SIZE)  # For SYMBOL1 (BTC)
-    prices2 = deque(maxlen=MAX_PRICES_SIZE)  # For SYMBOL2 (ETH)
-    current_data = {
-        SYMBOL1: {'bid': 0, 'ask': 0, 'mid': 0},
-        SYMBOL2: {'bid': 0, 'ask': 0, 'mid': 0}
-    }
-    position = 0  # 0 = flat, 1 = long spread (long BTC, short ETH), -1 = short spread (short BTC, long ETH)
-    last_update_time = None  # Track when we last updated stats
-
-    def send_order(order_type, symbol, price, strategy_name):
-        """Send order signal to trade daemon via ZMQ PUSH"""
-        order = {
-            'order_type': order_type,  # 'BUY' or 'SELL'
-            'symbol': symbol,
-            'price': price,
-            'strategy_name': strategy_name,
-            'timestamp': time.time()
-        }
-        try:
-            trade_sock.send_string(json.dumps(order), zmq.NOBLOCK)
-            return True
-        except zmq.Again:
-            print(f"  Warning: Could not send {order_type} for {symbol} (queue full)")
-            return False
-        except Exception as e:
-            print(f"  Error sending order for {symbol}: {e}")
-            return False
-
-    def send_pair_orders(action1, symbol1, price1, action2, symbol2, price2):
-        """Send two orders for the pair"""
-        success1 = send_order(action1, symbol1, price1, STRATEGY_NAME)
-        success2 = send_order(action2, symbol2, price2, STRATEGY_NAME)
-        if success1 and success2:
-            print(f"  → Pair orders sent: {action1} {symbol1}, {action2} {symbol2}")
-        return success1 and success2
+    strategy = StatArbStrategy(zmq_order_sender(trade_sock), bar_interval=BAR_INTERVAL)
 
     print(f"Stat Arb Strategy for {SYMBOL1}/{SYMBOL2} listening on {QUOTE_URL} and trade pub on {TRADE_URL}...")
     print(f"Lookback: {LOOKBACK} | Entry Z: {ENTRY_Z} | Exit Z: {EXIT_Z}")
-    print(f"Update period: {TIME_PERIOD} seconds ({TIME_PERIOD/60:.1f} minutes)")
+    if BAR_INTERVAL:
+        print(f"Bars: {BAR_INTERVAL} seconds, lookback in bars")
+    else:
+        print(f"Update period: {TIME_PERIOD} seconds ({TIME_PERIOD/60:.1f} minutes)")
     print("Waiting for data...\n")
 
+    quote = QuoteRecord()
     while True:
         try:
             # Receive quote message
             msg = quote_sock.recv()  # blocks until message arrives
-            bid, ask, ts, symbol_bytes = struct.unpack('!ddd16s', msg)
-            symbol = symbol_bytes.split(b'\0', 1)[0].decode().strip()
-
-            if symbol not in [SYMBOL1, SYMBOL2]:
-                continue
-
-            price = (bid + ask) / 2  # mid price
-            current_data[symbol]['bid'] = bid
-            current_data[symbol]['ask'] = ask
-            current_data[symbol]['mid'] = price
-            current_time = ts
-
-            # Append price to the appropriate deque
-            if symbol == SYMBOL1:
-                prices1.append(price)
-            elif symbol == SYMBOL2:
-                prices2.append(price)
-
-            # Check if it's time to update stats (every TIME_PERIOD seconds)
-            should_update = False
-            if last_update_time is None:
-                # First update - wait until we have minimum data for both
-                if len(prices1) >= LOOKBACK and len(prices2) >= LOOKBACK:
-                    should_update = True
-                    last_update_time = current_time
-                else:
-                    print(f"\rWarming up... BTC: {len(prices1)}/{LOOKBACK} | ETH: {len(prices2)}/{LOOKBACK}", end="")
-                    continue
-            elif current_time - last_update_time >= TIME_PERIOD:
-                should_update = True
-                last_update_time = current_time
-
-            # Only update stats and check signals at the configured time interval
-            if should_update:
-                print("\rStrategy LIVE!                ", end="")
-
-                # Get recent prices (assume roughly synced since quotes are frequent)
-                p1 = np.array(list(prices1)[-LOOKBACK:])
-                p2 = np.array(list(prices2)[-LOOKBACK:])
-
-                # Compute beta (hedge ratio): regress p1 on p2
-                beta = np.polyfit(p2, p1, 1)[0]
-
-                # Compute historical spreads
-                spreads = p1 - beta * p2
-                mean_spread = np.mean(spreads)
-                std_spread = np.std(spreads)
-
-                # Current spread and Z-score
-                current_p1 = current_data[SYMBOL1]['mid']
-                current_p2 = current_data[SYMBOL2]['mid']
-                current_spread = current_p1 - beta * current_p2
-                zscore = (current_spread - mean_spread) / std_spread if std_spread != 0 else 0
-
-                # === STAT ARB LOGIC ===
-                # Long spread: BUY BTC (at ask), SELL ETH (at bid)
-                # Short spread: SELL BTC (at bid), BUY ETH (at ask)
-                if zscore > ENTRY_Z and position != -1:
-                    print(f"\nSHORT SPREAD SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
-                    send_pair_orders(
-                        'SELL', SYMBOL1, current_data[SYMBOL1]['bid'],
-                        'BUY', SYMBOL2, current_data[SYMBOL2]['ask']
-                    )
-                    position = -1
-
-                elif zscore < -ENTRY_Z and position != 1:
-                    print(f"\nLONG SPREAD SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
-                    send_pair_orders(
-                        'BUY', SYMBOL1, current_data[SYMBOL1]['ask'],
-                        'SELL', SYMBOL2, current_data[SYMBOL2]['bid']
-                    )
-                    position = 1
-
-                elif abs(zscore) < EXIT_Z and position != 0:
-                    print(f"\nEXIT SIGNAL @ Z={zscore:.2f} | Spread={current_spread:.6f}")
-                    if position == 1:  # Close long spread
-                        send_pair_orders(
-                            'SELL', SYMBOL1, current_data[SYMBOL1]['bid'],
-                            'BUY', SYMBOL2, current_data[SYMBOL2]['ask']
-                        )
-                    elif position == -1:  # Close short spread
-                        send_pair_orders(
-                            'BUY', SYMBOL1, current_data[SYMBOL1]['ask'],
-                            'SELL', SYMBOL2, current_data[SYMBOL2]['bid']
-                        )
-                    position = 0
-
-            # Optional: print current state every 5 seconds (if warmed up)
-            if len(prices1) >= LOOKBACK and len(prices2) >= LOOKBACK and int(current_time) % 5 == 0:
-                status = "LONG SPREAD " if position == 1 else "SHORT SPREAD" if position == -1 else "FLAT "
-                print(f"\r[{time.strftime('%H:%M:%S')}] {status} | BTC {current_data[SYMBOL1]['mid']:.2f} | ETH {current_data[SYMBOL2]['mid']:.2f} | Z ? ", end="")
+            if msg is None:
+                print("\nReplay finished.")
+                break
+            # Single quote or batch frame, decoded into the same record
+            for quote in iter_quotes(msg, quote):
+                strategy.on_quote(quote.bid, quote.ask, quote.ts, quote.symbol)
 
         except KeyboardInterrupt:
             print("\nStrategy stopped.")
-            quote_sock.close()
-            trade_sock.close()
-            context.term()
             break
         except Exception as e:
             print("Error:", e)
             time.sleep(1)
 
+    quote_sock.close()
+    trade_sock.close()
+    context.term()
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -195,10 +257,17 @@ if __name__ == '__main__':
     parser.add_argument('--trade_port', type=int, default=TRADE_PORT, help='Trade Port to connect to')   
     parser.add_argument('--backtest', action='store_true',
                     help='Set to True if connecting to backtester data feed.')
+    parser.add_argument('--replay_flow', choices=['credit', 'push'], default=REPLAY_FLOW,
+                    help='Flow control mode data_prep.py was started with (backtest only).')
+    parser.add_argument('--bars', type=float, default=BAR_INTERVAL, metavar='SECONDS',
+                    help='Trade on time-aligned bars of this many seconds instead of quotes.')
 
     args = parser.parse_args()
+    BAR_INTERVAL = args.bars
 
     if args.backtest == True:
+        BACKTEST = True
+        REPLAY_FLOW = args.replay_flow
         QUOTE_PORT = 5557  # Backtester data feed port
         QUOTE_URL = f"tcp://{HOST}:{QUOTE_PORT}"
 
@@ -206,4 +275,3 @@ if __name__ == '__main__':
         TRADE_URL = f"tcp://{HOST}:{TRADE_PORT}"
 
     run_strategy()
-```
\ No newline at end of file
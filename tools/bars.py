@@ -0,0 +1,111 @@
+# Time-aligned bars for one or more symbols
+#
+# BarBuilder aggregates quotes into OHLC + VWAP bars of the mid on one clock for
+# every symbol: bar k covers [k * interval, (k + 1) * interval) in quote time
+# (exchange timestamps). When a quote lands past the current bar, that bar is
+# closed for all symbols at once and on_bar(start, bars) gets one aligned
+# vector, a BAR_DTYPE array with a row per symbol in the order given:
+#
+#   builder = BarBuilder(['BTC/USDT', 'ETH/USDT'], 60, on_bar)
+#   builder.update(symbol, bid, ask, ts)    # per quote
+#
+#   def on_bar(start, bars):
+#       btc, eth = bars['close']
+#
+# A symbol with no quotes in a bar gets a flat bar at its last close (count 0),
+# NaN until its first quote. Intervals with no quotes at all are emitted too,
+# so consecutive vectors are always exactly one interval apart.
+#
+# Bars close on quote time, never the wall clock, so a live feed and a replay
+# of it give the same bars. advance(ts) closes bars up to ts without a quote
+# (e.g. from a timer). A quote older than the open bar (out of order across
+# venues) is folded into the open bar and counted in `late`.
+#
+# State is a handful of values per symbol; memory doesn't grow with ticks or time.
+import math
+
+import numpy as np
+
+BAR_DTYPE = np.dtype([('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'),
+                      ('vwap', 'f8'), ('count', 'i8')])
+
+
+class BarBuilder:
+    """OHLC + VWAP mid bars on a common clock, emitted as one aligned vector per interval"""
+
+    def __init__(self, symbols, interval, on_bar):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.interval = interval
+        self.on_bar = on_bar
+        n = len(self.symbols)
+        self.bar = None  # Index of the open bar, set by the first quote
+        self.late = 0
+        self.emitted = 0
+        # Open bar, one slot per symbol (plain lists: cheaper than NumPy for scalar updates)
+        self._open = [0.0] * n
+        self._high = [0.0] * n
+        self._low = [0.0] * n
+        self._close = [math.nan] * n  # Last close carries into empty bars
+        self._weight = [0.0] * n
+        self._weighted = [0.0] * n
+        self._count = [0] * n
+
+    def update(self, symbol, bid, ask, ts, size=1.0):
+        """Add one quote. Closes (and emits) every bar that ended before `ts` first.
+
+        size weights the mid in the bar's VWAP; 1 per quote when the feed has no sizes.
+        """
+        i = self.index.get(symbol)
+        if i is None:
+            return
+        k = int(ts // self.interval)
+        if self.bar is None:
+            self.bar = k
+        elif k > self.bar:
+            self._close_until(k)
+        elif k < self.bar:
+            self.late += 1
+
+        mid = (bid + ask) / 2
+        if self._count[i]:
+            if mid > self._high[i]:
+                self._high[i] = mid
+            elif mid < self._low[i]:
+                self._low[i] = mid
+        else:
+            self._open[i] = self._high[i] = self._low[i] = mid
+        self._close[i] = mid
+        self._weight[i] += size
+        self._weighted[i] += size * mid
+        self._count[i] += 1
+
+    def advance(self, ts):
+        """Close every bar that ended at or before `ts`"""
+        if self.bar is not None:
+            k = int(ts // self.interval)
+            if k > self.bar:
+                self._close_until(k)
+
+    def _close_until(self, k):
+        while self.bar < k:
+            bars = np.empty(len(self.symbols), BAR_DTYPE)
+            for i in range(len(self.symbols)):
+                close = self._close[i]
+                if self._count[i]:
+                    bars[i] = (self._open[i], self._high[i], self._low[i], close,
+                               self._weighted[i] / self._weight[i] if self._weight[i] else close,
+                               self._count[i])
+                    self._weight[i] = self._weighted[i] = 0.0
+                    self._count[i] = 0
+                else:
+                    bars[i] = (close, close, close, close, close, 0)
+            start = self.bar * self.interval
+            self.bar += 1
+            self.emitted += 1
+            self.on_bar(start, bars)
+
+    @property
+    def ready(self):
+        """True once every symbol has had a quote"""
+        return not any(math.isnan(close) for close in self._close)
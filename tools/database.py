@@ -1,68 +1,243 @@
-# Add a function to add trades to a PostgreSQL database
-import psycopg2
+# TimescaleDB access layer
+#
+# Nothing connects at import. A Database owns a psycopg2 ThreadedConnectionPool,
+# created on first use, that order workers, the trade writer and analytics
+# readers share:
+#
+#   db = Database.from_env()               # DB_NAME/DB_USER/DB_PASS/DB_HOST/DB_PORT
+#   with db.connection() as conn:          # checked out, health checked, returned
+#       ...
+#   db.insert_trades(records)              # prepared INSERT, one commit
+#
+# A connection idle for more than HEALTH_CHECK_AFTER seconds is pinged before
+# it's handed out. Broken connections are discarded, and reconnects back off
+# exponentially. Each pooled connection PREPAREs the trades insert on first use.
+# That state lives on the connection itself (PooledConnection), so a connection
+# the pool closes and replaces starts out unprepared.
+#
+# Against a local Postgres: python3 tools/database.py
+import os
+import random
+import threading
+import time
 import datetime
-from typing import Dict, Any
-
-def insert_trade(conn, trade_record: Dict[str, Any]):
-    cur = conn.cursor()
-    timestamp_dt = datetime.datetime.fromtimestamp(
-            trade_record['timestamp']
-        )
-    try:
-        cur.execute("""
-            INSERT INTO trades (
-                timestamp, order_id, order_type, symbol, price, 
-                    order_size, side, fee, exchange, status, strategy_name
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            timestamp_dt,
-            trade_record['order_id'],
-            trade_record['order_type'],
-            trade_record['symbol'],
-            trade_record['price'],
-            trade_record['order_size'],
-            trade_record['side'],
-            trade_record['fee'],
-            trade_record['exchange'],
-            trade_record['status'],
-            trade_record['strategy_name']
-        ))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error inserting trade: {e}")
+from contextlib import contextmanager
+from typing import Dict, Any, List
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import execute_batch
+
+MAX_CONNECTIONS = 8
+MIN_CONNECTIONS = MAX_CONNECTIONS  # The pool closes returned connections beyond minconn
+HEALTH_CHECK_AFTER = 30  # Seconds idle before a connection is pinged on checkout
+RETRIES = 5
+BACKOFF_START = 0.2  # Seconds
+BACKOFF_MAX = 10
+
+TRADE_COLUMNS = ('timestamp', 'order_id', 'order_type', 'symbol', 'price', 'order_size',
+                 'side', 'fee', 'exchange', 'status', 'strategy_name')
+
+PREPARE_INSERT_TRADE = f"""
+    PREPARE insert_trade AS
+    INSERT INTO trades ({', '.join(TRADE_COLUMNS)})
+    VALUES ({', '.join(f'${i + 1}' for i in range(len(TRADE_COLUMNS)))})
+"""
+EXECUTE_INSERT_TRADE = f"EXECUTE insert_trade ({', '.join(['%s'] * len(TRADE_COLUMNS))})"
+
+CREATE_TRADES = """
+    CREATE TABLE IF NOT EXISTS trades (
+        timestamp TIMESTAMPTZ NOT NULL,
+        order_id TEXT,
+        order_type TEXT,
+        symbol TEXT,
+        price DOUBLE PRECISION,
+        order_size DOUBLE PRECISION,
+        side TEXT,
+        fee DOUBLE PRECISION,
+        exchange TEXT,
+        status TEXT,
+        strategy_name TEXT
+    )
+"""
+
+# Errors that mean the connection (or server) is gone, not that the query was bad
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+# ...plus an exhausted or closed pool: the database can't take the query right now
+UNAVAILABLE_ERRORS = (PoolError, *CONNECTION_ERRORS)
+
+
+def trade_row(trade_record: Dict[str, Any]):
+    """Trade record dict -> trades table row tuple"""
+    fee = trade_record['fee']
+    if isinstance(fee, dict):
+        fee = fee.get('cost')  # ccxt fee structure
+    return (
+        datetime.datetime.fromtimestamp(trade_record['timestamp']),
+        trade_record['order_id'],
+        trade_record['order_type'],
+        trade_record['symbol'],
+        trade_record['price'],
+        trade_record['order_size'],
+        trade_record['side'],
+        fee,
+        trade_record['exchange'],
+        trade_record['status'],
+        trade_record['strategy_name']
+    )
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection carrying the pool's bookkeeping for it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = None  # Monotonic time it was last returned to the pool
+        self.prepared = False  # insert_trade PREPAREd in this session
+
+
+class Database:
+    """Thread-safe pooled access to the trades database"""
+
+    def __init__(self, minconn=MIN_CONNECTIONS, maxconn=MAX_CONNECTIONS,
+                 health_check_after=HEALTH_CHECK_AFTER, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_after = health_check_after
+        self.connect_kwargs = {'connection_factory': PooledConnection, **connect_kwargs}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(database=os.getenv('DB_NAME', 'postgres'),
+                   user=os.getenv('DB_USER', 'postgres'),
+                   password=os.getenv('DB_PASS'),
+                   host=os.getenv('DB_HOST', '127.0.0.1'),
+                   port=os.getenv('DB_PORT', '5432'),
+                   **kwargs)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+            return self._pool
+
+    def _checkout(self):
+        pool = self._get_pool()
+        conn = pool.getconn()
+        last_used = conn.last_used
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            if last_used is not None and time.monotonic() - last_used > self.health_check_after:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+        except CONNECTION_ERRORS:
+            self._discard(pool, conn)
+            raise
+        return pool, conn
+
+    def _discard(self, pool, conn):
+        pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self, retries=RETRIES):
+        """Check out a healthy connection, reconnecting with exponential backoff.
+
+        retries=0 fails fast (raises) when the database is unreachable.
+        """
+        backoff = BACKOFF_START
+        for attempt in range(retries + 1):
+            try:
+                pool, conn = self._checkout()
+                break
+            except UNAVAILABLE_ERRORS as e:
+                if attempt == retries:
+                    raise
+                print(f"Database unavailable ({e}), retrying in {backoff:.1f}s")
+                time.sleep(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, BACKOFF_MAX)
+        try:
+            yield conn
+        except CONNECTION_ERRORS:
+            self._discard(pool, conn)
+            raise
+        except BaseException:
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except CONNECTION_ERRORS:
+                pass
+            self._release(pool, conn)
+            raise
+        self._release(pool, conn)
+
+    def _release(self, pool, conn):
+        if conn.closed:
+            self._discard(pool, conn)
+        else:
+            conn.last_used = time.monotonic()
+            pool.putconn(conn)
+
+    def insert_trades(self, trade_records: List[Dict[str, Any]], page_size=500, retries=RETRIES):
+        """Insert trades with the prepared statement and one commit. Raises on failure"""
+        with self.connection(retries) as conn:
+            with conn.cursor() as cur:
+                if not conn.prepared:
+                    cur.execute(PREPARE_INSERT_TRADE)  # Session-level, survives the commit below
+                    conn.prepared = True
+                execute_batch(cur, EXECUTE_INSERT_TRADE, [trade_row(r) for r in trade_records],
+                              page_size=page_size)
+            conn.commit()
+
+    def insert_trade(self, trade_record: Dict[str, Any]):
+        try:
+            self.insert_trades([trade_record])
+            return True
+        except Exception as e:
+            print(f"Error inserting trade: {e}")
+            return False
+
+    def ensure_schema(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CREATE_TRADES)
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+if __name__ == '__main__':
+    # Smoke test against the database in the environment (a local Postgres by default)
+    db = Database.from_env()
+    db.ensure_schema()
+    print("Database connected successfully")
+
+    #example usage
+    trade_record = {
+        'timestamp': 1625247600,
+        'order_id': '12345',
+        'order_type': 'BUY',
+        'symbol': 'XRP/USDT',
+        'price': 0.75,
+        'order_size': 100,
+        'side': 'LONG',
+        'fee': 0.001,
+        'exchange': 'Binance',
+        'status': 'COMPLETED',
+        'strategy_name': 'MeanReversion'
+    }
+
+    print("Inserted" if db.insert_trade(trade_record) else "Insert failed")
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM trades")
+            print(f"trades rows: {cur.fetchone()[0]}")
         conn.rollback()
-        return False
-
-DB_NAME="postgres"
-DB_USER="postgres"
-DB_PASS="password"
-DB_HOST="100.127.11.87"
-DB_PORT=5433
-
-conn = psycopg2.connect(database=DB_NAME,
-                            user=DB_USER,
-                            password=DB_PASS,
-                            host=DB_HOST,
-                            port=DB_PORT)
-
-print("Database connected successfully")
-
-#example usage
-trade_record = {
-    'timestamp': 1625247600,
-    'order_id': '12345',
-    'order_type': 'BUY',
-    'symbol': 'XRP/USDT',
-    'price': 0.75,
-    'order_size': 100,
-    'side': 'LONG',
-    'fee': 0.001,
-    'exchange': 'Binance',
-    'status': 'COMPLETED',
-    'strategy_name': 'MeanReversion'
-}
-
-insert_trade(conn, trade_record)
-
-    
\ No newline at end of file
+    db.close()
@@ -0,0 +1,163 @@
+# Local fake venue that enforces a request-weight limit
+#
+# An HTTP server with a Binance-style limit: every request carries a weight
+# (?weight=N, default 1) and once more than --limit weight has arrived in the
+# last second, requests get 429 until the window clears. Paths are only labels
+# (/ticker, /depth, /order) used in the report.
+#
+# The bench starts the venue plus several market-data pollers and one order
+# sender, each in its own process, and reports 429s and order wait times:
+#
+#   python3 tools/fake_venue.py --pollers 4 --seconds 10            # one shared RateLimiter
+#   python3 tools/fake_venue.py --pollers 4 --seconds 10 --local    # a bucket per process, like enableRateLimit
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque, Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from rate_limit import RateLimiter, ORDER, MARKET_DATA
+
+LIMIT = 50  # Weight per WINDOW seconds
+WINDOW = 1.0
+PORT = 8790
+
+
+class FakeVenue(ThreadingHTTPServer):
+    """Counts request weight over a sliding window and answers 429 over the limit"""
+
+    daemon_threads = True
+
+    def __init__(self, port=PORT, limit=LIMIT, window=WINDOW):
+        super().__init__(('127.0.0.1', port), VenueHandler)
+        self.limit = limit
+        self.window = window
+        self.recent = deque()  # (time, weight)
+        self.used = 0
+        self.lock = threading.Lock()
+        self.ok = Counter()
+        self.limited = Counter()
+
+    def admit(self, path, weight):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0][0] >= self.window:
+                self.used -= self.recent.popleft()[1]
+            if self.used + weight > self.limit:
+                self.limited[path] += 1
+                return False
+            self.recent.append((now, weight))
+            self.used += weight
+            self.ok[path] += 1
+            return True
+
+
+class VenueHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        weight = int(parse_qs(url.query).get('weight', ['1'])[0])
+        status = 200 if self.server.admit(url.path, weight) else 429
+        body = json.dumps({'path': url.path, 'ts': time.time()}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def request(url, limiter, weight, priority):
+    """One limited request. Returns (status, seconds waited in the limiter)"""
+    waited = limiter.acquire(weight, priority)
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, waited
+    except urllib.error.HTTPError as e:
+        if e.code in (418, 429):
+            limiter.backoff(WINDOW)
+        return e.code, waited
+
+
+def poller(base, name, rate, burst, seconds, results):
+    limiter = RateLimiter(name, rate, burst)
+    statuses = Counter()
+    end = time.monotonic() + seconds
+    n = 0
+    while time.monotonic() < end:
+        path, weight = ('/depth', 5) if n % 10 == 0 else ('/ticker', 1)
+        status, _ = request(f"{base}{path}?weight={weight}", limiter, weight, MARKET_DATA)
+        statuses[status] += 1
+        n += 1
+    results.put(('poller', dict(statuses), []))
+
+
+def order_sender(base, name, rate, burst, seconds, every, results):
+    limiter = RateLimiter(name, rate, burst)
+    statuses = Counter()
+    waits = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        status, waited = request(f"{base}/order?weight=1", limiter, 1, ORDER)
+        statuses[status] += 1
+        waits.append(waited)
+        time.sleep(every)
+    results.put(('orders', dict(statuses), waits))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+                    prog='Fake Venue',
+                    description='Rate-limited local venue and a multi-process rate limiter bench.')
+
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--limit', type=int, default=LIMIT, help='Weight per second before 429s')
+    parser.add_argument('--pollers', type=int, default=4, help='Market-data processes polling flat out')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--order_every', type=float, default=0.1, help='Seconds between orders')
+    parser.add_argument('--local', action='store_true', help='One bucket per process instead of a shared one')
+
+    args = parser.parse_args()
+
+    # Token bucket bound: burst + rate * window <= limit, so the venue never sees more than its limit
+    rate, burst = args.limit * 0.8, args.limit * 0.2
+    names = [f'fake-local-{i}' if args.local else 'fake' for i in range(args.pollers + 1)]
+    for name in set(names):
+        RateLimiter(name, rate, burst).unlink()
+
+    venue = FakeVenue(args.port, args.limit)
+    threading.Thread(target=venue.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{args.port}"
+
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=poller, args=(base, names[i], rate, burst, args.seconds, results))
+             for i in range(args.pollers)]
+    procs.append(multiprocessing.Process(target=order_sender, args=(base, names[-1], rate, burst,
+                                                                    args.seconds, args.order_every, results)))
+    for p in procs:
+        p.start()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    venue.shutdown()
+
+    polled = Counter()
+    for role, statuses, waits in reports:
+        if role == 'poller':
+            polled.update(statuses)
+        else:
+            orders, order_waits = statuses, np.array(waits) * 1e3
+    print(f"{'local buckets' if args.local else 'shared bucket'}: {args.pollers} pollers + 1 order sender, "
+          f"venue limit {args.limit}/s, {args.seconds:.0f}s")
+    print(f"  market data: {polled.get(200, 0)} ok, {polled.get(429, 0)} rejected (429)")
+    print(f"  orders:      {orders.get(200, 0)} ok, {orders.get(429, 0)} rejected (429), limiter wait "
+          f"p50 {np.percentile(order_waits, 50):.1f} ms p99 {np.percentile(order_waits, 99):.1f} ms")
+    print(f"  venue saw:   {dict(venue.ok)} ok, {dict(venue.limited)} limited")
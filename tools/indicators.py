@@ -0,0 +1,224 @@
+# Streaming indicators, O(1) per update
+#
+# Every indicator keeps preallocated state and updates it in constant time, so a
+# strategy can run them on every tick and the cost doesn't grow with the window:
+#
+#   ema = EMA(9);            ema.update(price)            -> value
+#   stats = RollingStats(100); stats.update(price)         -> .mean .var .std
+#   ols = RollingOLS(100);   ols.update(x, y)             -> .beta .alpha .cov
+#   z = ols.spread_zscore(x, y)                           # y - beta*x vs its window
+#
+# Rolling windows add the new sample and remove the one falling out with Welford
+# style updates (numerically stable, unlike running sums of squares). They are
+# recomputed exactly from their ring buffers every RESYNC_EVERY updates so
+# rounding can't drift over long runs. Variances are population (ddof=0),
+# matching np.std / np.polyfit.
+import math
+
+import numpy as np
+
+RESYNC_EVERY = 100_000  # Updates between exact recomputes of a rolling window
+
+
+class RingBuffer:
+    """Fixed-size float window over a preallocated NumPy array"""
+
+    def __init__(self, size):
+        self.size = size
+        self.data = np.zeros(size)
+        self.head = 0  # Next write position
+        self.count = 0
+
+    def append(self, value):
+        """Add a value. Returns the value it evicted, or None while the buffer isn't full"""
+        head = self.head
+        evicted = float(self.data[head]) if self.count == self.size else None
+        self.data[head] = value
+        self.head = head + 1 if head + 1 < self.size else 0
+        if evicted is None:
+            self.count += 1
+        return evicted
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    @property
+    def last(self):
+        return float(self.data[self.head - 1])
+
+    def values(self):
+        """Oldest-first copy of the window"""
+        if self.count < self.size:
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+
+class EMA:
+    """Exponential moving average, seeded with the first value"""
+
+    def __init__(self, period):
+        self.period = period
+        self.k = 2 / (period + 1)
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = value * self.k + self.value * (1 - self.k)
+        return self.value
+
+
+class RollingStats:
+    """Mean and variance over the last `window` values"""
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = RingBuffer(window)
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self._updates = 0
+
+    def update(self, value):
+        evicted = self.buffer.append(value)
+        if evicted is None:
+            n = len(self.buffer)
+            delta = value - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (value - self.mean)
+        else:
+            old_mean = self.mean
+            self.mean += (value - evicted) / self.window
+            self.m2 += (value - evicted) * (value - self.mean + evicted - old_mean)
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self.resync()
+        return self.mean
+
+    def resync(self):
+        values = self.buffer.values()
+        self.mean = float(values.mean()) if len(values) else 0.0
+        self.m2 = float(((values - self.mean) ** 2).sum())
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def full(self):
+        return self.buffer.full
+
+    @property
+    def var(self):
+        n = len(self.buffer)
+        return max(self.m2, 0.0) / n if n else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+    def zscore(self, value):
+        """(value - mean) / std over the window, 0 when the window is flat"""
+        std = self.std
+        return (value - self.mean) / std if std != 0 else 0.0
+
+
+class RollingOLS:
+    """Rolling covariance and OLS fit of y on x over the last `window` (x, y) pairs"""
+
+    def __init__(self, window):
+        self.window = window
+        self.xs = RingBuffer(window)
+        self.ys = RingBuffer(window)
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0  # Sum of co-deviations
+        self._updates = 0
+
+    def update(self, x, y):
+        old_x = self.xs.append(x)
+        old_y = self.ys.append(y)
+        if old_x is not None:
+            self._remove(old_x, old_y, self.window)
+        self._add(x, y, len(self.xs))
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self.resync()
+
+    def _add(self, x, y, n):
+        # n is the count including (x, y)
+        dx = x - self.mean_x
+        self.mean_x += dx / n
+        dy = y - self.mean_y
+        self.mean_y += dy / n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def _remove(self, x, y, n):
+        # Exact inverse of _add for a window of n that still includes (x, y)
+        if n == 1:
+            self.mean_x = self.mean_y = self.m2_x = self.m2_y = self.c_xy = 0.0
+            return
+        mean_x = self.mean_x - (x - self.mean_x) / (n - 1)
+        mean_y = self.mean_y - (y - self.mean_y) / (n - 1)
+        self.m2_x -= (x - mean_x) * (x - self.mean_x)
+        self.m2_y -= (y - mean_y) * (y - self.mean_y)
+        self.c_xy -= (x - mean_x) * (y - self.mean_y)
+        self.mean_x, self.mean_y = mean_x, mean_y
+
+    def resync(self):
+        xs, ys = self.xs.values(), self.ys.values()
+        if not len(xs):
+            return
+        self.mean_x, self.mean_y = float(xs.mean()), float(ys.mean())
+        dx, dy = xs - self.mean_x, ys - self.mean_y
+        self.m2_x = float((dx * dx).sum())
+        self.m2_y = float((dy * dy).sum())
+        self.c_xy = float((dx * dy).sum())
+
+    def __len__(self):
+        return len(self.xs)
+
+    @property
+    def full(self):
+        return self.xs.full
+
+    @property
+    def var_x(self):
+        return max(self.m2_x, 0.0) / len(self.xs) if len(self.xs) else 0.0
+
+    @property
+    def var_y(self):
+        return max(self.m2_y, 0.0) / len(self.xs) if len(self.xs) else 0.0
+
+    @property
+    def cov(self):
+        return self.c_xy / len(self.xs) if len(self.xs) else 0.0
+
+    @property
+    def beta(self):
+        """Slope of y on x (np.polyfit(x, y, 1)[0]); 0 when x is flat"""
+        return self.c_xy / self.m2_x if self.m2_x > 0 else 0.0
+
+    @property
+    def alpha(self):
+        return self.mean_y - self.beta * self.mean_x
+
+    def spread_stats(self, beta=None):
+        """Mean and std of the window's spreads y - beta*x (default: the fitted beta)"""
+        beta = self.beta if beta is None else beta
+        mean = self.mean_y - beta * self.mean_x
+        var = self.var_y - 2 * beta * self.cov + beta * beta * self.var_x
+        return mean, math.sqrt(max(var, 0.0))
+
+    def spread_zscore(self, x, y, beta=None):
+        """Z-score of the spread y - beta*x against the window's spreads"""
+        beta = self.beta if beta is None else beta
+        mean, std = self.spread_stats(beta)
+        return (y - beta * x - mean) / std if std != 0 else 0.0
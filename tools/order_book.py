@@ -0,0 +1,223 @@
+# Incremental L2 order book
+#
+# Each side keeps two parallel Python lists, keys and sizes, sorted ascending
+# with the best level LAST (key = price for bids, -price for asks):
+#   - top of book is keys[-1], O(1)
+#   - a level update is one bisect, O(log n); inserts/deletes shift only the
+#     levels better than the updated one, and most traffic is near the top
+#   - depth queries copy the top N levels into NumPy arrays
+#
+# Books are built from snapshots + diffs (apply_snapshot / apply_diff), from a
+# full top-N state like ccxt's watch_order_book (sync_top), or from book
+# messages on the bus (apply_message, which refuses deltas after a sequence gap
+# until the next snapshot). Every level change is kept as a delta
+# (take_deltas) so a publisher can forward just what changed:
+#
+#   [quote_codec.book_topic(exchange, symbol), BookEncoder.encode(MSG_BOOK_DELTA, deltas)]
+import math
+from bisect import bisect_left
+import numpy as np
+
+from quote_codec import BID, ASK, MSG_BOOK_SNAPSHOT, decode_book
+
+
+class SequenceGap(Exception):
+    """A diff doesn't follow the book's last sequence number; resync from a snapshot"""
+
+
+class BookSide:
+    """One side of the book as sorted key/size lists, best level last"""
+
+    __slots__ = ('sign', 'keys', 'sizes')
+
+    def __init__(self, sign):
+        self.sign = sign  # 1 for bids, -1 for asks
+        self.keys = []
+        self.sizes = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, price, size):
+        """Set a level's size (0 deletes). Returns the previous size"""
+        keys = self.keys
+        key = price * self.sign
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            prev = self.sizes[i]
+            if size > 0:
+                self.sizes[i] = size
+            else:
+                del keys[i]
+                del self.sizes[i]
+            return prev
+        if size > 0:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+        return 0.0
+
+    def size_at(self, price):
+        key = price * self.sign
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.sizes[i]
+        return 0.0
+
+    def best(self):
+        """(price, size) of the best level, (nan, 0.0) when empty"""
+        if not self.keys:
+            return math.nan, 0.0
+        return self.keys[-1] * self.sign, self.sizes[-1]
+
+    def levels(self, n=None):
+        """(prices, sizes) NumPy arrays, best first, at most n levels"""
+        if n is None or n >= len(self.keys):
+            keys, sizes = self.keys, self.sizes
+        else:
+            keys, sizes = self.keys[-n:], self.sizes[-n:]
+        prices = np.array(keys[::-1], dtype=np.float64)
+        if self.sign < 0:
+            prices = -prices
+        return prices, np.array(sizes[::-1], dtype=np.float64)
+
+    def clear(self):
+        self.keys.clear()
+        self.sizes.clear()
+
+
+class OrderBook:
+    """L2 book for one symbol. Records every level change as a delta"""
+
+    def __init__(self, symbol=None, record_deltas=True):
+        self.symbol = symbol
+        self.bids = BookSide(1)
+        self.asks = BookSide(-1)
+        self.sides = (self.bids, self.asks)  # Indexed by quote_codec.BID / ASK
+        self.seq = None
+        self.ts_ns = 0
+        self.record_deltas = record_deltas
+        self.deltas = []
+
+    # --- updates ---
+
+    def update(self, side, price, size):
+        """Set one level (side is BID or ASK, size 0 deletes). Returns the previous size"""
+        prev = self.sides[side].set(price, size)
+        if self.record_deltas and prev != size:
+            self.deltas.append((side, price, size))
+        return prev
+
+    def apply_snapshot(self, bids, asks, seq=None, ts_ns=0):
+        """Replace the book with [(price, size)] levels"""
+        self.bids.clear()
+        self.asks.clear()
+        record, self.record_deltas = self.record_deltas, False
+        for price, size in bids:
+            self.bids.set(price, size)
+        for price, size in asks:
+            self.asks.set(price, size)
+        self.record_deltas = record
+        self.deltas.clear()  # Consumers should take a snapshot now, not deltas
+        self.seq = seq
+        self.ts_ns = ts_ns
+
+    def apply_diff(self, bids, asks, seq=None, prev_seq=None, ts_ns=0):
+        """Apply [(price, size)] level changes.
+
+        If prev_seq is given it has to match the book's sequence number, otherwise
+        SequenceGap is raised and nothing is applied.
+        """
+        if prev_seq is not None and self.seq is not None and prev_seq != self.seq:
+            raise SequenceGap(f"{self.symbol}: diff follows {prev_seq}, book is at {self.seq}")
+        for price, size in bids:
+            self.update(BID, price, size)
+        for price, size in asks:
+            self.update(ASK, price, size)
+        if seq is not None:
+            self.seq = seq
+        self.ts_ns = ts_ns or self.ts_ns
+
+    def sync_top(self, bids, asks, seq=None, ts_ns=0):
+        """Make the book equal to a full top-N state (e.g. ccxt's watch_order_book),
+        recording only the levels that changed"""
+        for side, levels in ((BID, bids), (ASK, asks)):
+            sign = self.sides[side].sign
+            new = {price: size for price, size, *_ in levels}
+            for key in [key for key in self.sides[side].keys if key * sign not in new]:
+                self.update(side, key * sign, 0.0)
+            for price, size in new.items():
+                self.update(side, price, size)
+        if seq is not None:
+            self.seq = seq
+        self.ts_ns = ts_ns or self.ts_ns
+
+    def apply_message(self, msg):
+        """Apply a quote_codec book message (snapshot or delta) from the bus.
+
+        A delta has to carry the sequence number right after the book's, otherwise
+        SequenceGap is raised, nothing is applied and every delta is refused until
+        the next snapshot.
+        """
+        msg_type, _, seq, exch_ts_ns, _, _, levels = decode_book(msg)
+        if msg_type == MSG_BOOK_SNAPSHOT:
+            self.bids.clear()
+            self.asks.clear()
+        elif self.seq is None or seq != self.seq + 1:
+            last, self.seq = self.seq, None  # Stale until the next snapshot
+            if last is None:
+                raise SequenceGap(f"{self.symbol}: delta {seq} before a snapshot")
+            raise SequenceGap(f"{self.symbol}: delta {seq} follows {last}, waiting for a snapshot")
+        side, price, size = levels['side'].tolist(), levels['price'].tolist(), levels['size'].tolist()
+        sides = self.sides
+        for s, p, q in zip(side, price, size):
+            sides[s].set(p, q)
+        self.seq = seq
+        self.ts_ns = exch_ts_ns
+
+    def take_deltas(self):
+        """Level changes since the last call, as [(side, price, size)]"""
+        deltas, self.deltas = self.deltas, []
+        return deltas
+
+    def snapshot_levels(self, n=None):
+        """Top n levels of both sides as [(side, price, size)], for a snapshot message"""
+        levels = []
+        for side in (BID, ASK):
+            prices, sizes = self.sides[side].levels(n)
+            levels.extend(zip([side] * len(prices), prices.tolist(), sizes.tolist()))
+        return levels
+
+    # --- queries ---
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid(self):
+        return (self.bids.best()[0] + self.asks.best()[0]) / 2
+
+    def depth(self, side, n=None):
+        """(prices, sizes) best first"""
+        return self.sides[side].levels(n)
+
+    def vwap(self, side, qty, max_levels=None):
+        """Average price to take qty from `side` (ASK to buy, BID to sell).
+
+        Returns (avg_price, filled_qty); filled_qty < qty if the book is too thin.
+        """
+        prices, sizes = self.sides[side].levels(max_levels)
+        return walk_levels(prices, sizes, qty)
+
+
+def walk_levels(prices, sizes, qty):
+    """Vectorized book walk over best-first level arrays -> (avg_price, filled_qty)"""
+    if qty <= 0 or len(prices) == 0:
+        return math.nan, 0.0
+    cum = np.cumsum(sizes)
+    filled = min(qty, float(cum[-1]))
+    i = int(np.searchsorted(cum, filled, side='left'))  # Last level touched
+    taken = sizes[:i + 1].copy()
+    taken[-1] = filled - (cum[i - 1] if i > 0 else 0.0)
+    return float(np.dot(prices[:i + 1], taken) / filled), filled
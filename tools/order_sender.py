@@ -0,0 +1,34 @@
+# Order sender shared by the strategies
+#
+# Strategy objects emit orders through a send_order(order_type, symbol, price,
+# strategy_name, ts) callback. zmq_order_sender builds the one that pushes them
+# as JSON to the trade daemon (trading/trade.py) or, with --backtest, to
+# backtester_core. 'timestamp' is the quote time the order was decided on, so a
+# replay is checked against replay time, not the wall clock.
+import json
+import time
+
+import zmq
+
+
+def zmq_order_sender(trade_sock):
+    """Build a send_order callback that pushes JSON orders to the trade daemon"""
+    def send_order(order_type, symbol, price, strategy_name, ts=None):
+        """Send order signal to trade daemon via ZMQ PUSH"""
+        order = {
+            'order_type': order_type,  # 'BUY' or 'SELL'
+            'symbol': symbol,
+            'price': price,
+            'strategy_name': strategy_name,
+            'timestamp': ts if ts is not None else time.time()
+        }
+        try:
+            trade_sock.send_string(json.dumps(order), zmq.NOBLOCK)
+            return True
+        except zmq.Again:
+            print(f"  Warning: Could not send {order_type} for {symbol} from {strategy_name} (queue full)")
+            return False
+        except Exception as e:
+            print(f"  Error sending order for {symbol} from {strategy_name}: {e}")
+            return False
+    return send_order
@@ -7,12 +7,14 @@ Real-time + REST snapshots for market making
 import ccxt
 import time
 from pprint import pprint
+from rate_limit import RateLimiter, attach, MARKET_DATA
 
 # Initialize Binance (use sandbox for testing)
 exchange = ccxt.binance({
     'sandbox': True,  # Testnet - change to False for live
     'enableRateLimit': True,
 })
+attach(exchange, RateLimiter.for_exchange(exchange), MARKET_DATA)
 
 symbol = 'BTC/USDT'
 
@@ -61,15 +63,52 @@ def print_websocket_orderbook():
             print(f"\nError: {e}")
             time.sleep(1)
 
+def print_bus_orderbook(url="tcp://127.0.0.1:5000", exchange_id='binance', vwap_size=1.0):
+    """Local book built from the quote daemon's book deltas (feeds with "book": true)"""
+    import zmq
+    from order_book import OrderBook, SequenceGap
+    from quote_codec import book_topic, BID, ASK
+
+    print("\n" + "="*60)
+    print(f"BUS ORDER BOOK {exchange_id} (Press Ctrl+C to stop)")
+    print("="*60)
+
+    context = zmq.Context()
+    sock = context.socket(zmq.SUB)
+    sock.connect(url)
+    sock.setsockopt(zmq.SUBSCRIBE, book_topic(exchange_id, symbol))
+    book = OrderBook(symbol)
+    try:
+        while True:
+            try:
+                book.apply_message(sock.recv_multipart()[-1])
+            except SequenceGap as e:
+                # The gateway republishes a snapshot every few seconds; skip deltas until then
+                print(f"\r⏳ {e}", end='', flush=True)
+                continue
+            (bid, bid_size), (ask, ask_size) = book.best_bid(), book.best_ask()
+            buy, _ = book.vwap(ASK, vwap_size)
+            sell, _ = book.vwap(BID, vwap_size)
+            print(f"\r🟢 Bid: ${bid:>8.2f} x {bid_size:>6.4f} | 🔴 Ask: ${ask:>8.2f} x {ask_size:>6.4f} | "
+                  f"📊 Spread: ${ask-bid:>5.2f} | {vwap_size} BTC buy ${buy:>8.2f} sell ${sell:>8.2f}", end='', flush=True)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        sock.close(linger=0)
+        context.term()
+
 if __name__ == "__main__":
     print("🚀 Binance BTC/USDT Order Book Demo")
     print("1. REST Snapshot (Backtesting)")
     print("2. Live WebSocket (Market Making)")
+    print("3. Local book from the quote bus")
     
-    choice = input("\nChoose (1/2): ")
+    choice = input("\nChoose (1/2/3): ")
     
     if choice == "1":
         print_rest_orderbook()
+    elif choice == "3":
+        print_bus_orderbook()
     else:
         print_websocket_orderbook()
     
@@ -0,0 +1,72 @@
+# Batched quote frames for the quote bus
+#
+# Frame layout lives in quote_codec.py: a batch header followed by count
+# quote records. Publishers use QuoteBatcher (quote at a time) or pack_batches
+# (whole arrays); consumers decode with quote_codec.iter_quotes / decode_frame.
+import time
+import numpy as np
+
+from quote_codec import (RECORD, BATCH_HEADER, RECORD_DTYPE, VERSION, MSG_QUOTE, MSG_BATCH,
+                         encode_batch)
+
+
+class QuoteBatcher:
+    """Packs quotes into one frame and hands it to send() on size or age.
+
+    send(frame) is usually socket.send, encoder a quote_codec.QuoteEncoder.
+    With max_records=1 every quote goes out as a plain single-quote message.
+    """
+
+    def __init__(self, send, encoder, max_records=256, max_delay=0.005):
+        self.send = send
+        self.encoder = encoder
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.buf = bytearray(BATCH_HEADER.size + RECORD.size * max_records)
+        self.count = 0
+        self.first_time = 0.0
+
+    def add(self, bid, ask, exch_ts_ns=None):
+        if self.max_records == 1:
+            self.send(self.encoder.encode(bid, ask, exch_ts_ns))
+            return
+        if self.count == 0:
+            self.first_time = time.perf_counter()
+        self.encoder.pack_into(self.buf, BATCH_HEADER.size + self.count * RECORD.size, bid, ask, exch_ts_ns)
+        self.count += 1
+        if self.count >= self.max_records or time.perf_counter() - self.first_time >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        """Send whatever is buffered"""
+        if self.count == 0:
+            return
+        BATCH_HEADER.pack_into(self.buf, 0, VERSION, MSG_BATCH, 0, self.count)
+        self.send(bytes(memoryview(self.buf)[:BATCH_HEADER.size + self.count * RECORD.size]))
+        self.count = 0
+
+    def flush_if_stale(self):
+        """Call from idle loops so a partial batch doesn't wait for the next quote"""
+        if self.count and time.perf_counter() - self.first_time >= self.max_delay:
+            self.flush()
+
+
+def pack_batches(bid, ask, exch_ts_ns, encoder, max_records=256):
+    """Vectorized batching of whole arrays -> list of batch frames.
+
+    Sequence numbers continue from encoder.seq; every record in the call gets
+    the same publish timestamp.
+    """
+    n = len(exch_ts_ns)
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records['version'] = VERSION
+    records['msg_type'] = MSG_QUOTE
+    records['exchange_id'] = encoder.exchange_id
+    records['seq'] = np.arange(encoder.seq + 1, encoder.seq + 1 + n, dtype=np.uint64)
+    records['exch_ts_ns'] = exch_ts_ns
+    records['pub_ts_ns'] = time.time_ns()
+    records['bid'] = bid
+    records['ask'] = ask
+    records['symbol'] = encoder.symbol_bytes
+    encoder.seq += n
+    return [encode_batch(records[lo:lo + max_records]) for lo in range(0, n, max_records)]
@@ -0,0 +1,338 @@
+# Versioned binary quote schema shared by every publisher and subscriber
+#
+# Quote record, version 1 (network byte order, 60 bytes):
+#
+#   version      B    VERSION
+#   msg_type     B    MSG_QUOTE
+#   exchange_id  H    see EXCHANGES
+#   seq          Q    per-publisher sequence number, starts at 1
+#   exch_ts_ns   q    exchange timestamp, ns since epoch (UTC)
+#   pub_ts_ns    q    time the publisher packed the record, ns since epoch
+#   bid          d
+#   ask          d
+#   symbol       16s  NUL padded
+#
+# Batch frame: '!BBHI' header (VERSION, MSG_BATCH, 0, count) + count quote records.
+#
+# BBO message (quoting/bbo_service.py): '!BBHQq16sdHdHB' header (VERSION, MSG_BBO,
+# 0, seq, ts_ns, symbol, best bid, its exchange id, best ask, its exchange id,
+# venue count) + one '!Hddq' (exchange id, bid, ask, ts_ns) per fresh venue.
+#
+# Book message (tools/order_book.py): '!BBHQqq16sH' header (VERSION,
+# MSG_BOOK_DELTA or MSG_BOOK_SNAPSHOT, exchange_id, seq, exch_ts_ns, pub_ts_ns,
+# symbol, level count) + one '!Bdd' (side, price, size) per level. Size 0
+# deletes a level; a snapshot replaces the whole book.
+#
+# On the bus a message may be preceded by a topic frame (see topic()), so
+# subscribers take the last frame of recv_multipart().
+#
+# Older frames are still decoded so recordings and not-yet-restarted publishers
+# keep working: 32 bytes '!dd16s' (bid, ask, symbol) and 40 bytes '!ddd16s'
+# (bid, ask, ts seconds, symbol). They come back with version 0.
+import struct
+import time
+import numpy as np
+
+VERSION = 1
+MSG_QUOTE = 1
+MSG_BATCH = 2
+MSG_BBO = 3
+MSG_BOOK_DELTA = 4
+MSG_BOOK_SNAPSHOT = 5
+BID = 0
+ASK = 1
+NO_EXCHANGE = 0xFFFF  # BBO side with no fresh venue
+
+RECORD = struct.Struct('!BBHQqqdd16s')
+BATCH_HEADER = struct.Struct('!BBHI')
+RECORD_DTYPE = np.dtype([
+    ('version', 'u1'), ('msg_type', 'u1'), ('exchange_id', '>u2'), ('seq', '>u8'),
+    ('exch_ts_ns', '>i8'), ('pub_ts_ns', '>i8'), ('bid', '>f8'), ('ask', '>f8'), ('symbol', 'S16'),
+])
+
+BBO_HEADER = struct.Struct('!BBHQq16sdHdHB')
+BBO_VENUE = struct.Struct('!Hddq')
+
+BOOK_HEADER = struct.Struct('!BBHQqq16sH')
+BOOK_LEVEL = struct.Struct('!Bdd')
+BOOK_LEVEL_DTYPE = np.dtype([('side', 'u1'), ('price', '>f8'), ('size', '>f8')])
+
+LEGACY_QUOTE = struct.Struct('!dd16s')
+LEGACY_TS_QUOTE = struct.Struct('!ddd16s')
+
+assert RECORD_DTYPE.itemsize == RECORD.size
+assert BOOK_LEVEL_DTYPE.itemsize == BOOK_LEVEL.size
+
+# ccxt exchange id -> wire id. Append only: ids are stored in recordings
+EXCHANGES = {
+    'replay': 0,
+    'binance': 1,
+    'cryptocom': 2,
+    'kraken': 3,
+    'kucoin': 4,
+}
+EXCHANGE_NAMES = {v: k for k, v in EXCHANGES.items()}
+
+
+def exchange_id(name):
+    try:
+        return EXCHANGES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown exchange {name!r}, add it to quote_codec.EXCHANGES") from None
+
+
+def topic(exchange, symbol):
+    """Bus topic of one feed, sent as the first frame of every quote message.
+
+    Symbol comes first so a prefix can select one symbol on every exchange,
+    see symbol_topic(). b'quote|' selects everything.
+    """
+    return f"quote|{symbol}|{exchange}|".encode()
+
+
+def symbol_topic(symbol):
+    return f"quote|{symbol}|".encode()
+
+
+def bbo_topic(symbol):
+    return f"bbo|{symbol}|".encode()
+
+
+def book_topic(exchange, symbol):
+    return f"book|{symbol}|{exchange}|".encode()
+
+
+def symbol_bytes(symbol):
+    encoded = symbol.encode()
+    if len(encoded) > 16:
+        raise ValueError(f"Symbol {symbol!r} is longer than 16 bytes")
+    return encoded.ljust(16, b'\0')
+
+
+class QuoteEncoder:
+    """Packs quotes for one (exchange, symbol) stream and numbers them"""
+
+    def __init__(self, exchange, symbol):
+        self.exchange_id = exchange_id(exchange)
+        self.symbol = symbol
+        self.symbol_bytes = symbol_bytes(symbol)
+        self.seq = 0
+
+    def encode(self, bid, ask, exch_ts_ns=None):
+        """One quote record as bytes. exch_ts_ns defaults to the publish time"""
+        self.seq += 1
+        pub_ts_ns = time.time_ns()
+        return RECORD.pack(VERSION, MSG_QUOTE, self.exchange_id, self.seq,
+                           pub_ts_ns if exch_ts_ns is None else exch_ts_ns, pub_ts_ns,
+                           bid, ask, self.symbol_bytes)
+
+    def pack_into(self, buf, offset, bid, ask, exch_ts_ns=None):
+        """Write one quote record into buf at offset (for batch frames)"""
+        self.seq += 1
+        pub_ts_ns = time.time_ns()
+        RECORD.pack_into(buf, offset, VERSION, MSG_QUOTE, self.exchange_id, self.seq,
+                         pub_ts_ns if exch_ts_ns is None else exch_ts_ns, pub_ts_ns,
+                         bid, ask, self.symbol_bytes)
+
+
+class QuoteRecord:
+    """Decoded quote. Decoders overwrite one instance in place instead of
+    building a new object per message; copy the fields you want to keep.
+
+    ts is exch_ts_ns in float seconds, what the strategies work in.
+    """
+
+    __slots__ = ('version', 'msg_type', 'exchange_id', 'seq', 'exch_ts_ns', 'pub_ts_ns',
+                 'bid', 'ask', 'symbol', 'ts')
+
+    def __init__(self):
+        self.version = VERSION
+        self.msg_type = MSG_QUOTE
+        self.exchange_id = 0
+        self.seq = 0
+        self.exch_ts_ns = 0
+        self.pub_ts_ns = 0
+        self.bid = 0.0
+        self.ask = 0.0
+        self.symbol = ''
+        self.ts = 0.0
+
+    @property
+    def exchange(self):
+        return EXCHANGE_NAMES.get(self.exchange_id, str(self.exchange_id))
+
+    def __repr__(self):
+        return (f"QuoteRecord({self.exchange} {self.symbol} seq={self.seq} "
+                f"bid={self.bid} ask={self.ask} exch_ts_ns={self.exch_ts_ns})")
+
+
+_symbols = {}
+
+
+def _symbol(raw):
+    symbol = _symbols.get(raw)
+    if symbol is None:
+        symbol = _symbols[raw] = raw.split(b'\0', 1)[0].decode().strip()
+    return symbol
+
+
+def _fill(rec, fields):
+    (rec.version, rec.msg_type, rec.exchange_id, rec.seq, rec.exch_ts_ns, rec.pub_ts_ns,
+     rec.bid, rec.ask, raw) = fields
+    rec.symbol = _symbol(raw)
+    rec.ts = rec.exch_ts_ns / 1e9
+
+
+def _fill_legacy(rec, msg):
+    if len(msg) == LEGACY_QUOTE.size:
+        rec.bid, rec.ask, raw = LEGACY_QUOTE.unpack(msg)
+        rec.exch_ts_ns = rec.pub_ts_ns = time.time_ns()  # No timestamp on the wire
+    else:
+        rec.bid, rec.ask, ts, raw = LEGACY_TS_QUOTE.unpack(msg)
+        rec.exch_ts_ns = rec.pub_ts_ns = int(ts * 1e9)
+    rec.version = 0
+    rec.msg_type = MSG_QUOTE
+    rec.exchange_id = 0
+    rec.seq = 0
+    rec.symbol = _symbol(raw)
+    rec.ts = rec.exch_ts_ns / 1e9
+
+
+def decode_into(msg, rec):
+    """Decode a single-quote message into rec (a QuoteRecord) and return it"""
+    if len(msg) == RECORD.size:
+        fields = RECORD.unpack(msg)
+        if fields[0] != VERSION or fields[1] != MSG_QUOTE:
+            raise ValueError(f"Unsupported quote record version {fields[0]} type {fields[1]}")
+        _fill(rec, fields)
+    elif len(msg) in (LEGACY_QUOTE.size, LEGACY_TS_QUOTE.size):
+        _fill_legacy(rec, msg)
+    else:
+        raise ValueError(f"Not a single quote message ({len(msg)} bytes)")
+    return rec
+
+
+def _batch_count(msg):
+    version, msg_type, _, count = BATCH_HEADER.unpack_from(msg)
+    if version != VERSION or msg_type != MSG_BATCH or len(msg) != BATCH_HEADER.size + count * RECORD.size:
+        raise ValueError(f"Bad quote batch frame ({len(msg)} bytes)")
+    return count
+
+
+def is_batch(msg):
+    # 8 + 60 * n is never 32, 40 or 60, so the length alone tells the formats apart
+    return len(msg) not in (RECORD.size, LEGACY_QUOTE.size, LEGACY_TS_QUOTE.size)
+
+
+def iter_quotes(msg, rec=None):
+    """Yield every quote in a single or batch frame.
+
+    The same QuoteRecord (rec, or a new one per call) is refilled for each
+    quote, so consume its fields before advancing the iterator.
+    """
+    if rec is None:
+        rec = QuoteRecord()
+    if not is_batch(msg):
+        yield decode_into(msg, rec)
+        return
+    _batch_count(msg)
+    for fields in RECORD.iter_unpack(memoryview(msg)[BATCH_HEADER.size:]):
+        _fill(rec, fields)
+        yield rec
+
+
+def decode_frame(msg):
+    """Single or batch frame -> structured array (RECORD_DTYPE) viewing msg, no copies"""
+    if len(msg) == RECORD.size:
+        return np.frombuffer(msg, dtype=RECORD_DTYPE)
+    count = _batch_count(msg)
+    return np.frombuffer(msg, dtype=RECORD_DTYPE, count=count, offset=BATCH_HEADER.size)
+
+
+def encode_batch(records):
+    """Batch frame from a RECORD_DTYPE array"""
+    return BATCH_HEADER.pack(VERSION, MSG_BATCH, 0, len(records)) + records.tobytes()
+
+
+class BboRecord:
+    """Decoded consolidated best bid/offer. venues is [(exchange_id, bid, ask, ts_ns)]"""
+
+    __slots__ = ('seq', 'ts_ns', 'symbol', 'bid', 'bid_exchange_id', 'ask', 'ask_exchange_id', 'venues')
+
+    def __init__(self):
+        self.seq = 0
+        self.ts_ns = 0
+        self.symbol = ''
+        self.bid = self.ask = float('nan')
+        self.bid_exchange_id = self.ask_exchange_id = NO_EXCHANGE
+        self.venues = []
+
+    @property
+    def bid_exchange(self):
+        return EXCHANGE_NAMES.get(self.bid_exchange_id)
+
+    @property
+    def ask_exchange(self):
+        return EXCHANGE_NAMES.get(self.ask_exchange_id)
+
+    def __repr__(self):
+        return (f"BboRecord({self.symbol} seq={self.seq} bid={self.bid}@{self.bid_exchange} "
+                f"ask={self.ask}@{self.ask_exchange} venues={len(self.venues)})")
+
+
+def encode_bbo(seq, ts_ns, symbol_raw, bid, bid_exchange_id, ask, ask_exchange_id, venues):
+    """BBO message. symbol_raw from symbol_bytes(); venues as in BboRecord"""
+    buf = bytearray(BBO_HEADER.size + BBO_VENUE.size * len(venues))
+    BBO_HEADER.pack_into(buf, 0, VERSION, MSG_BBO, 0, seq, ts_ns, symbol_raw,
+                         bid, bid_exchange_id, ask, ask_exchange_id, len(venues))
+    offset = BBO_HEADER.size
+    for venue in venues:
+        BBO_VENUE.pack_into(buf, offset, *venue)
+        offset += BBO_VENUE.size
+    return bytes(buf)
+
+
+def decode_bbo(msg, rec=None):
+    """Decode a BBO message into rec (a BboRecord, reused if given)"""
+    rec = BboRecord() if rec is None else rec
+    (version, msg_type, _, rec.seq, rec.ts_ns, raw, rec.bid, rec.bid_exchange_id,
+     rec.ask, rec.ask_exchange_id, count) = BBO_HEADER.unpack_from(msg)
+    if version != VERSION or msg_type != MSG_BBO or len(msg) != BBO_HEADER.size + count * BBO_VENUE.size:
+        raise ValueError(f"Bad BBO message ({len(msg)} bytes)")
+    rec.symbol = _symbol(raw)
+    rec.venues = list(BBO_VENUE.iter_unpack(memoryview(msg)[BBO_HEADER.size:]))
+    return rec
+
+
+class BookEncoder:
+    """Packs book snapshot/delta messages for one (exchange, symbol) stream"""
+
+    def __init__(self, exchange, symbol):
+        self.exchange_id = exchange_id(exchange)
+        self.symbol = symbol
+        self.symbol_bytes = symbol_bytes(symbol)
+        self.seq = 0
+
+    def encode(self, msg_type, levels, exch_ts_ns=None):
+        """levels: [(side, price, size)] or a BOOK_LEVEL_DTYPE array"""
+        self.seq += 1
+        pub_ts_ns = time.time_ns()
+        header = BOOK_HEADER.pack(VERSION, msg_type, self.exchange_id, self.seq,
+                                  pub_ts_ns if exch_ts_ns is None else exch_ts_ns, pub_ts_ns,
+                                  self.symbol_bytes, len(levels))
+        if isinstance(levels, np.ndarray):
+            return header + levels.astype(BOOK_LEVEL_DTYPE, copy=False).tobytes()
+        return header + b''.join([BOOK_LEVEL.pack(*level) for level in levels])
+
+
+def decode_book(msg):
+    """-> (msg_type, exchange_id, seq, exch_ts_ns, pub_ts_ns, symbol, levels).
+
+    levels is a BOOK_LEVEL_DTYPE array viewing msg.
+    """
+    version, msg_type, exch_id, seq, exch_ts_ns, pub_ts_ns, raw, count = BOOK_HEADER.unpack_from(msg)
+    if (version != VERSION or msg_type not in (MSG_BOOK_DELTA, MSG_BOOK_SNAPSHOT)
+            or len(msg) != BOOK_HEADER.size + count * BOOK_LEVEL.size):
+        raise ValueError(f"Bad book message ({len(msg)} bytes)")
+    levels = np.frombuffer(msg, dtype=BOOK_LEVEL_DTYPE, count=count, offset=BOOK_HEADER.size)
+    return msg_type, exch_id, seq, exch_ts_ns, pub_ts_ns, _symbol(raw), levels
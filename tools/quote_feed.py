@@ -0,0 +1,22 @@
+# Live quote bus subscriber with the same recv()/close() interface as
+# replay_feed.ReplayFeed, so strategies read live and replayed quotes alike.
+#
+# Publishers may send [topic, payload] (quoting/quote_daemon.py) or a bare
+# payload; recv() returns the payload either way.
+import zmq
+
+
+class QuoteFeed:
+    """SUB socket on the quote bus; recv() returns one quote frame"""
+
+    def __init__(self, context, url, topics=(b"",)):
+        self.sock = context.socket(zmq.SUB)
+        self.sock.connect(url)
+        for t in topics:
+            self.sock.setsockopt(zmq.SUBSCRIBE, t)
+
+    def recv(self):
+        return self.sock.recv_multipart()[-1]
+
+    def close(self):
+        self.sock.close(linger=0)
@@ -0,0 +1,174 @@
+# Shared token-bucket rate limiter
+#
+# ccxt's enableRateLimit throttles each client on its own, so quoting scripts and
+# the trade daemon on one IP/key can together exceed the venue's limit and get
+# 429s or an IP ban. Here every process on the host draws request weight from
+# one bucket per venue. The bucket is a few numbers in a memory-mapped file
+# (SHM_DIR/trading_bot-ratelimit-<venue>) updated under flock, so there is no
+# daemon to run or connect to, and a crashed process holds nothing.
+#
+# Orders get priority: market data may only take tokens while more than the
+# reserve (RESERVE_FRACTION of the burst) is left, so a polling loop can't drain
+# what an order needs. A 429/418 from the venue sets a shared back-off that
+# every process waits out.
+#
+#   limiter = RateLimiter.for_exchange(exchange)   # rate from exchange.rateLimit
+#   attach(exchange, limiter, ORDER)               # or MARKET_DATA
+#
+# The first process to create a venue's bucket sets its rate and burst; later
+# ones use what's in the file. python3 tools/fake_venue.py runs several
+# processes against a local venue that enforces a limit.
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+
+ORDER = 0
+MARKET_DATA = 1
+
+BURST_SECONDS = 1.0  # Default burst = this many seconds of refill
+RESERVE_FRACTION = 0.25  # Share of the burst only orders may use
+BACKOFF = 10.0  # Seconds every process waits after a 429/418
+MAX_WAIT = 1.0  # Longest single sleep before re-checking the bucket
+
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+# tokens, last refill (monotonic), rate/s, burst, reserve, blocked until (monotonic),
+# granted, waited, backoffs
+STATE = struct.Struct('=6d3Q')
+
+
+class RateLimiter:
+    """Token bucket shared by every process using the same venue name"""
+
+    def __init__(self, name, rate, burst=None, reserve=None, directory=SHM_DIR):
+        self.name = name
+        self.path = os.path.join(directory, f'trading_bot-ratelimit-{name}')
+        burst = rate * BURST_SECONDS if burst is None else burst
+        reserve = burst * RESERVE_FRACTION if reserve is None else reserve
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < STATE.size:
+                os.ftruncate(self._fd, STATE.size)
+                self._mm = mmap.mmap(self._fd, STATE.size)
+                self._init(rate, burst, reserve)
+            else:
+                self._mm = mmap.mmap(self._fd, STATE.size)
+                if STATE.unpack_from(self._mm)[1] > time.monotonic():
+                    self._init(rate, burst, reserve)  # Left over from before a reboot
+
+    @classmethod
+    def for_exchange(cls, exchange, **kwargs):
+        """Bucket named after the ccxt exchange id, refilled at its rateLimit (ms per cost unit)"""
+        return cls(exchange.id, 1000.0 / exchange.rateLimit, **kwargs)
+
+    def _init(self, rate, burst, reserve):
+        STATE.pack_into(self._mm, 0, burst, time.monotonic(), rate, burst, reserve, 0.0, 0, 0, 0)
+
+    @contextmanager
+    def _file_lock(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def try_acquire(self, cost=1.0, priority=MARKET_DATA):
+        """Take `cost` tokens if allowed now. Returns 0.0, or seconds to wait before trying again"""
+        with self._file_lock():
+            tokens, last, rate, burst, reserve, blocked, granted, waited, backoffs = STATE.unpack_from(self._mm)
+            now = time.monotonic()
+            if now < blocked:
+                return blocked - now
+            tokens = min(burst, tokens + (now - last) * rate)
+            floor = reserve if priority == MARKET_DATA else 0.0
+            need = min(cost, burst - floor)  # Bigger requests take a full bucket and go into debt
+            if tokens - need >= floor:
+                STATE.pack_into(self._mm, 0, tokens - cost, now, rate, burst, reserve, blocked,
+                                granted + 1, waited, backoffs)
+                return 0.0
+            STATE.pack_into(self._mm, 0, tokens, now, rate, burst, reserve, blocked,
+                            granted, waited + 1, backoffs)
+            return (floor + need - tokens) / rate
+
+    def acquire(self, cost=1.0, priority=MARKET_DATA):
+        """Block until `cost` tokens are granted. Returns seconds waited"""
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(cost, priority)
+            if wait == 0.0:
+                return time.monotonic() - start
+            time.sleep(min(wait, MAX_WAIT))
+
+    async def acquire_async(self, cost=1.0, priority=MARKET_DATA):
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(cost, priority)
+            if wait == 0.0:
+                return time.monotonic() - start
+            await asyncio.sleep(min(wait, MAX_WAIT))
+
+    def backoff(self, seconds=BACKOFF):
+        """Stop every process from sending to this venue for `seconds`"""
+        with self._file_lock():
+            state = list(STATE.unpack_from(self._mm))
+            state[5] = max(state[5], time.monotonic() + seconds)
+            state[8] += 1
+            STATE.pack_into(self._mm, 0, *state)
+
+    def stats(self):
+        tokens, last, rate, burst, reserve, blocked, granted, waited, backoffs = STATE.unpack_from(self._mm)
+        return {'rate': rate, 'burst': burst, 'reserve': reserve, 'granted': granted,
+                'waited': waited, 'backoffs': backoffs}
+
+    def unlink(self):
+        """Remove the shared bucket; the next RateLimiter for this name starts fresh"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+def attach(exchange, limiter, priority=MARKET_DATA):
+    """Route a ccxt (sync, async_support or pro) exchange's REST throttling through `limiter`.
+
+    Request costs are ccxt's endpoint weights. A RateLimitExceeded/DDoSProtection
+    error backs off every process sharing the limiter before it's re-raised.
+    """
+    import ccxt
+    limited = (ccxt.RateLimitExceeded, ccxt.DDoSProtection)
+    fetch2 = exchange.fetch2
+    exchange.enableRateLimit = True  # ccxt only calls throttle() when this is set
+
+    if asyncio.iscoroutinefunction(fetch2):
+        async def throttle(cost=None):
+            await limiter.acquire_async(cost or 1, priority)
+
+        async def limited_fetch2(*args, **kwargs):
+            try:
+                return await fetch2(*args, **kwargs)
+            except limited:
+                limiter.backoff()
+                raise
+    else:
+        def throttle(cost=None):
+            limiter.acquire(cost or 1, priority)
+
+        def limited_fetch2(*args, **kwargs):
+            try:
+                return fetch2(*args, **kwargs)
+            except limited:
+                limiter.backoff()
+                raise
+
+    exchange.throttle = throttle
+    exchange.fetch2 = limited_fetch2
+    return exchange
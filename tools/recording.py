@@ -0,0 +1,150 @@
+# Quote bus recordings: append-only, hourly files of compressed blocks
+#
+#   <root>/<YYYY-MM-DD>/<HH>.qrec      (UTC hour the block's first frame arrived)
+#
+# A file is a sequence of blocks, each a BLOCK_HEADER followed by its payload:
+#
+#   '!4sBIIIqq'  magic b'QREC', codec (0 raw, 1 zlib), frame count, raw length,
+#                payload length, first/last receive timestamp (ns since epoch)
+#
+# The uncompressed payload is the frames back to back, each '!qHI' (receive ns,
+# topic length, message length) + topic + message, i.e. exactly what came off
+# the bus. Blocks are only ever appended, so a crash can at worst leave a
+# truncated last block, which readers skip.
+#
+# Quote frames decode straight into quote_codec RECORD_DTYPE arrays
+# (load_quotes / quote_arrays), the same (ts, bid, ask) arrays the backtest
+# engines take from the tick store.
+import os
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+
+from quote_codec import RECORD, RECORD_DTYPE, decode_frame, exchange_id, symbol_bytes
+
+MAGIC = b'QREC'
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+BLOCK_HEADER = struct.Struct('!4sBIIIqq')
+FRAME_HEADER = struct.Struct('!qHI')
+SUFFIX = '.qrec'
+NS_PER_HOUR = 3_600 * 1_000_000_000
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'recordings')
+
+
+def hour_path(root, ts_ns):
+    hour = pd.Timestamp(ts_ns - ts_ns % NS_PER_HOUR)
+    return os.path.join(root, hour.strftime('%Y-%m-%d'), hour.strftime('%H') + SUFFIX)
+
+
+def pack_block(payload, count, first_ns, last_ns, codec=CODEC_ZLIB, level=1):
+    """Block bytes (header + payload) for `count` packed frames"""
+    body = zlib.compress(payload, level) if codec == CODEC_ZLIB else bytes(payload)
+    return BLOCK_HEADER.pack(MAGIC, codec, count, len(payload), len(body), first_ns, last_ns) + body
+
+
+def iter_blocks(path):
+    """Yield (first_ns, last_ns, count, payload bytes) per complete block of a file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    off = 0
+    while off + BLOCK_HEADER.size <= len(data):
+        magic, codec, count, raw_len, body_len, first_ns, last_ns = BLOCK_HEADER.unpack_from(data, off)
+        start = off + BLOCK_HEADER.size
+        if magic != MAGIC or start + body_len > len(data):
+            break  # Truncated or corrupt tail
+        body = data[start:start + body_len]
+        payload = zlib.decompress(body) if codec == CODEC_ZLIB else body
+        if len(payload) != raw_len:
+            break
+        yield first_ns, last_ns, count, payload
+        off = start + body_len
+
+
+def iter_frames(path):
+    """Yield (recv_ns, topic, message) for every recorded frame of a file"""
+    for _, _, count, payload in iter_blocks(path):
+        view = memoryview(payload)
+        off = 0
+        for _ in range(count):
+            recv_ns, topic_len, msg_len = FRAME_HEADER.unpack_from(payload, off)
+            off += FRAME_HEADER.size
+            topic = bytes(view[off:off + topic_len])
+            off += topic_len
+            yield recv_ns, topic, view[off:off + msg_len]
+            off += msg_len
+
+
+def list_files(root, start_ns=None, end_ns=None):
+    """Recording files overlapping [start_ns, end_ns), in time order"""
+    files = []
+    if not os.path.isdir(root):
+        return files
+    for day in sorted(os.listdir(root)):
+        day_dir = os.path.join(root, day)
+        if not os.path.isdir(day_dir):
+            continue
+        for name in sorted(os.listdir(day_dir)):
+            if not name.endswith(SUFFIX):
+                continue
+            hour_ns = pd.Timestamp(f"{day} {name[:-len(SUFFIX)]}:00").value
+            if end_ns is not None and hour_ns >= end_ns:
+                continue
+            if start_ns is not None and hour_ns + NS_PER_HOUR <= start_ns:
+                continue
+            files.append(os.path.join(day_dir, name))
+    return files
+
+
+def iter_quote_chunks(root, exchange=None, symbol=None, start_ns=None, end_ns=None, prefix=b'quote|'):
+    """RECORD_DTYPE arrays of recorded quotes, one per file, filtered by exchange/symbol.
+
+    Quotes are selected by receive time, so a range matches what the bus carried then.
+    """
+    want_exchange = None if exchange is None else exchange_id(exchange)
+    want_symbol = None if symbol is None else symbol_bytes(symbol)
+    for path in list_files(root, start_ns, end_ns):
+        parts = []
+        singles = []  # Runs of single-record frames are decoded with one frombuffer
+        for recv_ns, topic, msg in iter_frames(path):
+            if not topic.startswith(prefix):
+                continue
+            if (start_ns is not None and recv_ns < start_ns) or (end_ns is not None and recv_ns >= end_ns):
+                continue
+            if len(msg) == RECORD.size:
+                singles.append(msg)
+                continue
+            if singles:
+                parts.append(np.frombuffer(b''.join(singles), dtype=RECORD_DTYPE))
+                singles = []
+            parts.append(decode_frame(msg))
+        if singles:
+            parts.append(np.frombuffer(b''.join(singles), dtype=RECORD_DTYPE))
+        if not parts:
+            continue
+        records = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        mask = np.ones(len(records), dtype=bool)
+        if want_exchange is not None:
+            mask &= records['exchange_id'] == want_exchange
+        if want_symbol is not None:
+            mask &= records['symbol'] == want_symbol
+        if not mask.all():
+            records = records[mask]
+        if len(records):
+            yield records
+
+
+def load_quotes(root, exchange=None, symbol=None, start_ns=None, end_ns=None):
+    """All matching recorded quotes as one RECORD_DTYPE array"""
+    chunks = list(iter_quote_chunks(root, exchange, symbol, start_ns, end_ns))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def quote_arrays(root, exchange, symbol, start_ns=None, end_ns=None):
+    """(ts seconds, bid, ask) float64 arrays by exchange timestamp, like tick_store.quote_arrays"""
+    records = load_quotes(root, exchange, symbol, start_ns, end_ns)
+    order = np.argsort(records['exch_ts_ns'], kind='stable')
+    records = records[order]
+    return (records['exch_ts_ns'].astype(np.int64) / 1e9, records['bid'].astype(np.float64),
+            records['ask'].astype(np.float64))
@@ -0,0 +1,174 @@
+# Lossless replay transport between backtesting/sample-test/data_prep.py and strategies
+#
+# flow='credit' (default): PUB data socket + ROUTER control socket.
+#   1. Each subscriber connects SUB + DEALER and sends HELLO with its topics.
+#   2. Once N subscribers said HELLO, the server sends PING on PUB until every
+#      subscriber answers READY (so its SUB subscription is live - no slow joiner).
+#   3. Subscribers grant credit (messages they can take); the server never sends
+#      a subscriber more matching messages than it granted, so nothing piles up
+#      past the HWM and nothing drops.
+# flow='push': PUSH/PULL to a single consumer; ZMQ blocks the sender when full.
+#
+# The server ends the stream with END; ReplayFeed.recv() then returns None.
+# Data goes out as [topic, payload] like the live quote bus; PING/END start with
+# a NUL byte, so a feed subscribed to quote topics also subscribes to b"\x00".
+import struct
+import time
+import zmq
+
+PING = b"\x00PING"
+END = b"\x00END"
+HELLO = b"HELLO"
+READY = b"READY"
+CREDIT = b"CREDIT"
+_COUNT = struct.Struct("!I")
+
+DEFAULT_CONTROL_URL = "tcp://127.0.0.1:5559"
+DEFAULT_WINDOW = 10000  # Messages a subscriber lets the server have in flight
+
+
+class _Subscriber:
+    __slots__ = ('topics', 'sent', 'granted')
+
+    def __init__(self, topics):
+        self.topics = topics or [b""]
+        self.sent = 0
+        self.granted = 0
+
+    def wants(self, topic):
+        return any(topic.startswith(t) for t in self.topics)
+
+
+class ReplayServer:
+    """Publishing side of the replay transport"""
+
+    def __init__(self, context, data_url, control_url=None, flow='credit', subscribers=1):
+        self.flow = flow
+        self.subscribers = subscribers
+        self.sent = 0
+        if flow == 'push':
+            self.data_sock = context.socket(zmq.PUSH)
+            self.control_sock = None
+        else:
+            self.data_sock = context.socket(zmq.PUB)
+            self.data_sock.setsockopt(zmq.SNDHWM, 0)  # Credits bound what's in flight
+            self.control_sock = context.socket(zmq.ROUTER)
+            self.control_sock.bind(control_url or DEFAULT_CONTROL_URL.replace("127.0.0.1", "*"))
+        self.data_sock.bind(data_url)
+        self.subs = {}  # identity -> _Subscriber
+        self._targets = {}  # topic -> subscribers that take it
+
+    def wait_for_subscribers(self, log=print):
+        """Block until `subscribers` peers have joined and are receiving"""
+        if self.flow == 'push':
+            return
+        log(f"Waiting for {self.subscribers} subscriber(s)...")
+        while len(self.subs) < self.subscribers:
+            identity, cmd, *rest = self.control_sock.recv_multipart()
+            if cmd == HELLO and identity not in self.subs:
+                self.subs[identity] = _Subscriber(rest)
+                log(f"  subscriber {len(self.subs)}/{self.subscribers} joined")
+
+        # PING until each subscriber has seen one on its SUB socket
+        while any(sub.granted == 0 for sub in self.subs.values()):
+            self.data_sock.send(PING)
+            if self.control_sock.poll(10):
+                self._drain_control()
+        log("All subscribers ready.")
+
+    def _drain_control(self):
+        while True:
+            try:
+                identity, cmd, *rest = self.control_sock.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            sub = self.subs.get(identity)
+            if sub is not None and cmd in (READY, CREDIT):
+                sub.granted += _COUNT.unpack(rest[0])[0]
+
+    def send(self, msg, topic=None):
+        """Send one data message, waiting for credit if a subscriber that takes it is behind"""
+        if self.control_sock is not None:
+            key = b"" if topic is None else topic
+            targets = self._targets.get(key)
+            if targets is None:
+                targets = self._targets[key] = [sub for sub in self.subs.values() if sub.wants(key)]
+            for sub in targets:
+                while sub.sent >= sub.granted:
+                    if self.control_sock.poll(100):
+                        self._drain_control()
+                sub.sent += 1
+        if topic is None:
+            self.data_sock.send(msg)
+        else:
+            self.data_sock.send_multipart([topic, msg])
+        self.sent += 1
+
+    def close(self):
+        """Signal END to subscribers and close the sockets"""
+        self.data_sock.send(END)
+        # Let END reach subscribers before the sockets go away
+        self.data_sock.setsockopt(zmq.LINGER, 5000)
+        self.data_sock.close()
+        if self.control_sock is not None:
+            self.control_sock.close(linger=0)
+
+
+class ReplayFeed:
+    """Subscribing side: recv() returns raw quote messages, None at END.
+
+    With flow='credit' only messages on `topics` (prefixes, as SUBSCRIBE) are
+    delivered, and only those count against the subscriber's credit.
+    """
+
+    def __init__(self, context, data_url, control_url=DEFAULT_CONTROL_URL, flow='credit',
+                 window=DEFAULT_WINDOW, topics=(b"",)):
+        self.flow = flow
+        self.window = window
+        self.consumed = 0
+        if flow == 'push':
+            self.data_sock = context.socket(zmq.PULL)
+            self.data_sock.connect(data_url)
+            self.control_sock = None
+            return
+
+        self.data_sock = context.socket(zmq.SUB)
+        self.data_sock.setsockopt(zmq.RCVHWM, 0)
+        self.data_sock.connect(data_url)
+        for topic in topics:
+            self.data_sock.setsockopt(zmq.SUBSCRIBE, topic)
+        if b"" not in topics:
+            self.data_sock.setsockopt(zmq.SUBSCRIBE, b"\x00")  # PING / END
+        self.topics = list(topics)
+        self.control_sock = context.socket(zmq.DEALER)
+        self.control_sock.connect(control_url)
+        self._handshake()
+
+    def _handshake(self):
+        last_hello = 0
+        while True:
+            if time.time() - last_hello > 1:
+                self.control_sock.send_multipart([HELLO, *self.topics])
+                last_hello = time.time()
+            if self.data_sock.poll(100) and self.data_sock.recv_multipart()[-1] == PING:
+                break
+        self.control_sock.send_multipart([READY, _COUNT.pack(self.window)])
+
+    def recv(self):
+        while True:
+            msg = self.data_sock.recv_multipart()[-1]
+            if msg == END:
+                return None
+            if msg != PING:
+                break
+        if self.control_sock is not None:
+            self.consumed += 1
+            if self.consumed >= self.window // 2:
+                self.control_sock.send_multipart([CREDIT, _COUNT.pack(self.consumed)])
+                self.consumed = 0
+        return msg
+
+    def close(self):
+        self.data_sock.close(linger=0)
+        if self.control_sock is not None:
+            self.control_sock.close(linger=0)
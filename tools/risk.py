@@ -0,0 +1,246 @@
+# Position and risk engine
+#
+# Net position, average cost, realised P&L and mark per (strategy, symbol, venue)
+# live in flat numpy arrays indexed by a slot number. The live trade daemon and
+# backtester_core run the same engine:
+#
+#   risk = RiskEngine(max_order_notional=100, max_orders_per_sec=5, max_drawdown=50)
+#   reason = risk.check(strategy, symbol, venue, 'BUY', qty, price, now)  # None = OK
+#   risk.on_fill(strategy, symbol, venue, 'BUY', qty, fill_price)
+#   risk.release(strategy, symbol, venue, 'BUY', qty)  # ...or, if the order failed
+#
+# check() only reads precomputed state (kill flag, position, a rate window), so
+# it costs a few microseconds. An accepted order counts as pending exposure until
+# on_fill() or release(), so a burst of orders queued behind the exchange can't
+# overshoot the position limit together. Drawdown is evaluated in on_fill()/mark(): a
+# strategy whose equity falls max_drawdown below its peak is killed and every
+# later order from it is rejected until reset_kill().
+#
+# Position snapshots are published as JSON on topic position|<strategy>| (see
+# position_topic / encode_positions); they change at fill rate, not quote rate.
+import json
+import threading
+from collections import deque
+
+import numpy as np
+
+MAX_ORDER_NOTIONAL = 1000.0  # Per order, quote currency
+MAX_POSITION_NOTIONAL = 5000.0  # Per (strategy, symbol, venue) after the order fills
+MAX_ORDERS_PER_SEC = 10  # Per strategy
+MAX_DRAWDOWN = 500.0  # Quote currency below the strategy's equity peak
+INITIAL_SLOTS = 64
+
+SIDE_SIGN = {'BUY': 1.0, 'SELL': -1.0}
+
+
+def position_topic(strategy=''):
+    """position|<strategy>| (empty strategy = every strategy)"""
+    return f"position|{strategy}|".encode() if strategy else b"position|"
+
+
+class RiskEngine:
+    """Positions and pre-trade limits. Thread safe; None disables a limit"""
+
+    def __init__(self, max_order_notional=MAX_ORDER_NOTIONAL, max_position_notional=MAX_POSITION_NOTIONAL,
+                 max_orders_per_sec=MAX_ORDERS_PER_SEC, max_drawdown=MAX_DRAWDOWN, capacity=INITIAL_SLOTS):
+        self.max_order_notional = max_order_notional
+        self.max_position_notional = max_position_notional
+        self.max_orders_per_sec = max_orders_per_sec
+        self.max_drawdown = max_drawdown
+        self._lock = threading.Lock()
+        self.keys = []  # slot -> (strategy, symbol, venue)
+        self._slots = {}  # (strategy, symbol, venue) -> slot
+        self._by_symbol = {}  # symbol -> [slots], for mark()
+        self._by_strategy = {}  # strategy -> np.array of slots
+        self.position = np.zeros(capacity)  # Signed base quantity
+        self.avg_cost = np.zeros(capacity)
+        self.realized = np.zeros(capacity)
+        self.mark_price = np.zeros(capacity)
+        self.pending = np.zeros(capacity)  # Signed base quantity accepted by check(), not filled yet
+        self.peak = {}  # strategy -> equity peak
+        self.killed = set()  # strategies stopped by the drawdown kill switch
+        self._orders = {}  # strategy -> deque of recent order times, for the rate limit
+        self.rejected = 0
+        self.version = 0  # Bumped on every fill/mark, so publishers can skip unchanged snapshots
+
+    def reset(self):
+        with self._lock:
+            self.keys.clear()
+            self._slots.clear()
+            self._by_symbol.clear()
+            self._by_strategy.clear()
+            for array in (self.position, self.avg_cost, self.realized, self.mark_price, self.pending):
+                array[:] = 0
+            self.peak.clear()
+            self.killed.clear()
+            self._orders.clear()
+            self.rejected = 0
+            self.version += 1
+
+    def _slot(self, strategy, symbol, venue):
+        key = (strategy, symbol, venue)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = len(self.keys)
+            self.keys.append(key)
+            if slot == len(self.position):
+                grow = len(self.position)
+                self.position, self.avg_cost, self.realized, self.mark_price, self.pending = (
+                    np.concatenate([a, np.zeros(grow)])
+                    for a in (self.position, self.avg_cost, self.realized, self.mark_price, self.pending))
+            self._by_symbol.setdefault(symbol, []).append(slot)
+            self._by_strategy[strategy] = np.append(self._by_strategy.get(strategy, []), slot).astype(np.intp)
+            self.peak.setdefault(strategy, 0.0)
+        return slot
+
+    def check(self, strategy, symbol, venue, side, qty, price, now):
+        """Pre-trade limits for an order at time `now` (seconds). Returns None or the reason it's rejected.
+
+        An accepted order counts towards the strategy's order rate, and its qty
+        is pending exposure until on_fill() or release().
+        """
+        with self._lock:
+            reason = self._check(strategy, symbol, venue, side, qty, price, now)
+            if reason is not None:
+                self.rejected += 1
+            else:
+                self.pending[self._slot(strategy, symbol, venue)] += SIDE_SIGN[side] * qty
+            return reason
+
+    def release(self, strategy, symbol, venue, side, qty):
+        """Drop an accepted order that won't fill from the pending exposure"""
+        with self._lock:
+            self.pending[self._slot(strategy, symbol, venue)] -= SIDE_SIGN[side] * qty
+
+    def _check(self, strategy, symbol, venue, side, qty, price, now):
+        if strategy in self.killed:
+            return f"{strategy} stopped by drawdown kill switch"
+        sign = SIDE_SIGN.get(side)
+        if sign is None:
+            return f"unknown side {side}"
+        notional = qty * price
+        if self.max_order_notional is not None and notional > self.max_order_notional:
+            return f"order notional {notional:.2f} > {self.max_order_notional:.2f}"
+        if self.max_position_notional is not None:
+            slot = self._slots.get((strategy, symbol, venue))
+            position = self.position[slot] + self.pending[slot] if slot is not None else 0.0
+            after = abs(position + sign * qty) * price
+            if after > self.max_position_notional and after > abs(position) * price:
+                return f"position notional {after:.2f} > {self.max_position_notional:.2f}"
+        if self.max_orders_per_sec is not None:
+            times = self._orders.get(strategy)
+            if times is None:
+                times = self._orders[strategy] = deque(maxlen=self.max_orders_per_sec)
+            if len(times) == self.max_orders_per_sec and now - times[0] < 1.0:
+                return f"more than {self.max_orders_per_sec} orders/sec"
+            times.append(now)
+        return None
+
+    def on_fill(self, strategy, symbol, venue, side, qty, price, fee=0.0, accepted=None):
+        """Apply a fill to the position, average cost and realised P&L.
+
+        accepted is the qty check() accepted for the order (default qty); it stops
+        counting as pending.
+        """
+        with self._lock:
+            slot = self._slot(strategy, symbol, venue)
+            self.pending[slot] -= SIDE_SIGN[side] * (qty if accepted is None else accepted)
+            fill = SIDE_SIGN[side] * qty
+            position = self.position[slot]
+            avg = self.avg_cost[slot]
+            if position == 0 or (position > 0) == (fill > 0):
+                self.avg_cost[slot] = (position * avg + fill * price) / (position + fill)
+            else:
+                closed = min(abs(fill), abs(position))
+                self.realized[slot] += closed * (price - avg) * (1.0 if position > 0 else -1.0)
+                if abs(fill) > abs(position):
+                    self.avg_cost[slot] = price  # Flipped: the remainder opens at the fill price
+                elif abs(fill) == abs(position):
+                    self.avg_cost[slot] = 0.0
+            self.position[slot] = position + fill
+            self.realized[slot] -= fee
+            self._mark(symbol, price)
+            self._update_drawdown(strategy)
+            self.version += 1
+
+    def mark(self, symbol, price):
+        """Mark every position in `symbol` at `price` and re-check drawdowns"""
+        with self._lock:
+            if symbol not in self._by_symbol:
+                return
+            self._mark(symbol, price)
+            for strategy in {self.keys[slot][0] for slot in self._by_symbol[symbol]}:
+                self._update_drawdown(strategy)
+            self.version += 1
+
+    def _mark(self, symbol, price):
+        self.mark_price[self._by_symbol[symbol]] = price
+
+    def _equity(self, slots):
+        return float(self.realized[slots].sum()
+                     + ((self.mark_price[slots] - self.avg_cost[slots]) * self.position[slots]).sum())
+
+    def _update_drawdown(self, strategy):
+        equity = self._equity(self._by_strategy[strategy])
+        if equity > self.peak[strategy]:
+            self.peak[strategy] = equity
+        elif self.max_drawdown is not None and self.peak[strategy] - equity > self.max_drawdown:
+            if strategy not in self.killed:
+                self.killed.add(strategy)
+                print(f"RISK: {strategy} killed, equity {equity:.2f} is "
+                      f"{self.peak[strategy] - equity:.2f} below peak {self.peak[strategy]:.2f}")
+
+    def reset_kill(self, strategy):
+        with self._lock:
+            self.killed.discard(strategy)
+            self.peak[strategy] = self._equity(self._by_strategy[strategy]) if strategy in self._by_strategy else 0.0
+
+    def equity(self, strategy):
+        """Realised + unrealised P&L of a strategy"""
+        with self._lock:
+            slots = self._by_strategy.get(strategy)
+            return 0.0 if slots is None else self._equity(slots)
+
+    def net_position(self, strategy, symbol, venue):
+        with self._lock:
+            slot = self._slots.get((strategy, symbol, venue))
+            return 0.0 if slot is None else float(self.position[slot])
+
+    def open_positions(self):
+        with self._lock:
+            return int(np.count_nonzero(self.position[:len(self.keys)]))
+
+    def positions(self, strategy=None):
+        """Snapshot rows (dicts), one per (strategy, symbol, venue) seen"""
+        with self._lock:
+            rows = []
+            for slot, (strat, symbol, venue) in enumerate(self.keys):
+                if strategy is not None and strat != strategy:
+                    continue
+                position = float(self.position[slot])
+                mark = float(self.mark_price[slot])
+                rows.append({
+                    'strategy': strat,
+                    'symbol': symbol,
+                    'venue': venue,
+                    'position': position,
+                    'avg_cost': float(self.avg_cost[slot]),
+                    'realized': float(self.realized[slot]),
+                    'unrealized': (mark - float(self.avg_cost[slot])) * position,
+                    'exposure': position * mark,
+                    'mark': mark,
+                    'killed': strat in self.killed,
+                })
+            return rows
+
+    def strategies(self):
+        with self._lock:
+            return list(self._by_strategy)
+
+
+def encode_positions(rows, ts):
+    return json.dumps({'ts': ts, 'positions': rows}).encode()
+
+
+def decode_positions(msg):
+    return json.loads(msg)
@@ -1,7 +1,7 @@
-import struct
 import time
 import argparse
 import zmq
+from quote_codec import QuoteRecord, iter_quotes
 
 # Configuration should match the publisher
 HOST = 'localhost'
@@ -14,6 +14,8 @@ if __name__ == '__main__':
 
     parser.add_argument('--host', type=str, default=HOST, help='Host to connect to')     
     parser.add_argument('--port', type=int, default=PORT, help='Port to connect to')   
+    parser.add_argument('--topic', type=str, default='',
+                    help="Topic prefix to subscribe to, e.g. 'quote|BTC/USDT|' (default: everything)")
     parser.add_argument('--backtest', action='store_true',
                     help='Set to True if connecting to backtester data feed.')
 
@@ -27,18 +29,20 @@ if __name__ == '__main__':
     context = zmq.Context()
     sub = context.socket(zmq.SUB)
     sub.connect(URL)
-    sub.setsockopt(zmq.SUBSCRIBE, b'')  # subscribe to everything
+    sub.setsockopt(zmq.SUBSCRIBE, args.topic.encode())
 
     print("Listening for quotes... on ", URL)
     print("-" * 40)
 
+    quote = QuoteRecord()
     while True:
         try:
-            msg = sub.recv()
-            bid, ask, ts, symbol_bytes = struct.unpack('!ddd16s', msg)
-            symbol = symbol_bytes.decode().rstrip('\0')
-            ts = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-            print(f"[{ts}] {symbol}: bid={bid:.2f} ask={ask:.2f}")
+            msg = sub.recv_multipart()[-1]  # Topic frame first if the publisher sends one
+            for quote in iter_quotes(msg, quote):
+                ts = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+                age_ms = (time.time_ns() - quote.pub_ts_ns) / 1e6
+                print(f"[{ts}] {quote.exchange} {quote.symbol} #{quote.seq}: "
+                      f"bid={quote.bid:.2f} ask={quote.ask:.2f} ({age_ms:.1f} ms since publish)")
         except KeyboardInterrupt:
             print("\nStopped.")
             break
@@ -0,0 +1,182 @@
+# Background trade persistence
+#
+# trade.py hands every fill to TradeWriter.submit(), which only appends to an
+# in-memory queue. A writer thread drains it and inserts batches through the
+# pooled database layer (Database.insert_trades) once batch_size trades are
+# waiting or the oldest has waited max_delay seconds, so order latency never
+# includes a database round-trip.
+#
+# While Postgres is unreachable (database.UNAVAILABLE_ERRORS), batches are
+# appended to a local WAL (one JSON trade per line) and the database is retried
+# with exponential backoff. On reconnect the WAL is inserted in one transaction,
+# ahead of newer trades, and then truncated.
+#
+# Any other failure means a record is bad (a DataError, a missing field), and
+# retrying won't help. The batch is then inserted one trade at a time, and the
+# trades that fail go to a reject file with their error instead of the WAL, so
+# one bad record can't block everything after it.
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from database import UNAVAILABLE_ERRORS
+
+
+BATCH_SIZE = 500
+MAX_DELAY = 0.2  # Seconds a trade may wait for its batch
+WAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'trades.wal')
+REJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'trades.rejects')
+RETRY_START = 0.5  # Seconds before the first reconnect attempt
+RETRY_MAX = 30
+
+
+class TradeWriter(threading.Thread):
+    """Batches trade records into a database.Database on its own thread, spilling to a WAL when it's down"""
+
+    def __init__(self, db, wal_path=WAL_PATH, batch_size=BATCH_SIZE, max_delay=MAX_DELAY,
+                 reject_path=REJECT_PATH):
+        super().__init__(name='trade-writer', daemon=True)
+        self.db = db
+        self.wal_path = wal_path
+        self.reject_path = reject_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.pending = queue.SimpleQueue()
+        self.down = False
+        self.retry_at = 0.0
+        self.backoff = RETRY_START
+        self.written = 0
+        self.spilled = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def submit(self, trade_record):
+        """Queue a trade for persistence. Never blocks on the database"""
+        self.pending.put(trade_record)
+
+    def close(self):
+        """Flush everything still queued, then stop the thread"""
+        self.pending.put(None)
+        self.join()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self.pending.get(timeout=self.max_delay)
+            except queue.Empty:
+                self._write([])  # Idle: still retry the connection and drain the WAL
+                continue
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self.pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+        self._write([])
+
+    def _write(self, batch):
+        if self.down and time.monotonic() < self.retry_at:
+            self._spill(batch)
+            return
+        was_down, self.down = self.down, False
+        # WAL first so trades stay in order; if it can't all go in, the batch queues behind it
+        if self._replay_wal() and batch:
+            batch = self._insert(batch)
+            if not batch:
+                self.batches += 1
+        self._spill(batch)
+        if not self.down:
+            if was_down:
+                print("Trade writer: database back")
+            self.backoff = RETRY_START
+
+    def _insert(self, records):
+        """Insert records, rejecting bad ones. Returns the ones left unwritten because the database went down"""
+        try:
+            self.db.insert_trades(records, page_size=self.batch_size, retries=0)
+            self.written += len(records)
+            return []
+        except UNAVAILABLE_ERRORS as e:
+            self._went_down(e)
+            return records
+        except Exception:
+            pass  # A bad record: find it one insert at a time
+        for i, record in enumerate(records):
+            try:
+                self.db.insert_trades([record], retries=0)
+                self.written += 1
+            except UNAVAILABLE_ERRORS as e:
+                self._went_down(e)
+                return records[i:]
+            except Exception as e:
+                self._reject(record, e)
+        return []
+
+    def _went_down(self, error):
+        # Fail fast and spill; the pool reconnects on the next attempt
+        now = time.monotonic()
+        self.down = True
+        self.retry_at = now + self.backoff * random.uniform(0.5, 1.0)
+        self.backoff = min(self.backoff * 2, RETRY_MAX)
+        print(f"Trade writer: database unavailable ({error}), spilling to {self.wal_path}, "
+              f"retrying in {self.retry_at - now:.1f}s")
+
+    def _append(self, path, lines):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spill(self, batch):
+        if batch:
+            self._append(self.wal_path, [json.dumps(record, default=str) + '\n' for record in batch])
+            self.spilled += len(batch)
+
+    def _reject(self, record, error):
+        """Set a trade the database refuses aside, with the error, for a human to look at"""
+        self._append(self.reject_path, [json.dumps({'error': repr(error), 'trade': record}, default=str) + '\n'])
+        self.rejected += 1
+        print(f"Trade writer: rejected trade {record.get('order_id') if isinstance(record, dict) else record!r} "
+              f"({error!r}), written to {self.reject_path}")
+
+    def _replay_wal(self):
+        """Insert spilled trades in one transaction and truncate the WAL. False if the database went down"""
+        if not os.path.exists(self.wal_path) or os.path.getsize(self.wal_path) == 0:
+            return True
+        records = []
+        with open(self.wal_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print(f"Trade writer: skipping unreadable WAL line {line[:80]!r}")  # Torn write
+        left = self._insert(records) if records else []
+        if left:
+            # Keep only what's still unwritten, replaced atomically
+            tmp = self.wal_path + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(''.join(json.dumps(record, default=str) + '\n' for record in left))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.wal_path)
+            return False
+        if records:
+            print(f"Trade writer: replayed {len(records)} trades from {self.wal_path}")
+        os.truncate(self.wal_path, 0)
+        return True
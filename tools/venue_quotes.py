@@ -0,0 +1,68 @@
+# Latest quote per venue for one symbol, and the cross-venue best bid/ask
+#
+# Quotes older than max_age seconds (measured against the newest quote's
+# timestamp, so it works the same in replays) are left out of best().
+import math
+
+STALE_AFTER = 2.0  # Seconds
+
+
+class VenueQuotes:
+    """Per-venue latest bid/ask/ts table. Venues are added on first quote"""
+
+    def __init__(self, venues=(), max_age=STALE_AFTER):
+        self.max_age = max_age
+        self.venues = []
+        self.index = {}
+        self.bid = []
+        self.ask = []
+        self.ts = []
+        self.last_ts = -math.inf
+        for venue in venues:
+            self._add(venue)
+
+    def _add(self, venue):
+        self.index[venue] = len(self.venues)
+        self.venues.append(venue)
+        self.bid.append(math.nan)
+        self.ask.append(math.nan)
+        self.ts.append(-math.inf)
+
+    def update(self, venue, bid, ask, ts):
+        """Store a venue's quote. Returns True if its bid or ask changed"""
+        i = self.index.get(venue)
+        if i is None:
+            self._add(venue)
+            i = len(self.venues) - 1
+        changed = bid != self.bid[i] or ask != self.ask[i]
+        self.bid[i] = bid
+        self.ask[i] = ask
+        self.ts[i] = ts
+        if ts > self.last_ts:
+            self.last_ts = ts
+        return changed
+
+    def fresh(self, i, now=None):
+        now = self.last_ts if now is None else now
+        return now - self.ts[i] <= self.max_age
+
+    def best(self, now=None):
+        """(bid venue, best bid, ask venue, best ask) over fresh venues.
+
+        Venues are None and prices nan when no venue has a fresh quote.
+        """
+        cutoff = (self.last_ts if now is None else now) - self.max_age
+        bid_venue = ask_venue = None
+        best_bid, best_ask = -math.inf, math.inf
+        for i, venue in enumerate(self.venues):
+            if self.ts[i] < cutoff:
+                continue
+            if self.bid[i] > best_bid:
+                best_bid, bid_venue = self.bid[i], venue
+            if self.ask[i] < best_ask:
+                best_ask, ask_venue = self.ask[i], venue
+        if bid_venue is None:
+            best_bid = math.nan
+        if ask_venue is None:
+            best_ask = math.nan
+        return bid_venue, best_bid, ask_venue, best_ask
@@ -0,0 +1,174 @@
+# Asyncio order execution on ccxt.async_support
+#
+# One event loop on its own thread owns one exchange instance and one aiohttp
+# session. Orders from every strategy are in flight at once; orders for the
+# same (symbol, strategy) still run one after another, in arrival order.
+#
+# The exchange is warmed before start() returns, so the first order costs
+# what every later one does:
+#   - load_markets(), so order placement never triggers a metadata fetch
+#   - server time sync (adjustForTimeDifference), so signed requests aren't
+#     rejected for clock skew and retried
+#   - WARM_CONNECTIONS parallel public requests to open TLS connections in the
+#     pool, then a keep-alive ping every KEEPALIVE_EVERY seconds so they never
+#     idle out
+import asyncio
+import threading
+import time
+
+from execution import LatencyStats, order_key, MAX_QUEUE_SIZE
+
+MAX_IN_FLIGHT = 32  # Orders waiting on the exchange at once
+WARM_CONNECTIONS = 4
+KEEPALIVE_EVERY = 20  # Seconds; below typical server-side idle timeouts
+POOL_LIMIT = 64  # Open connections per session
+DNS_CACHE_TTL = 300
+
+
+def pooled_session():
+    """aiohttp session with a keep-alive connection pool. Call from the event loop"""
+    import aiohttp
+    connector = aiohttp.TCPConnector(limit=POOL_LIMIT, ttl_dns_cache=DNS_CACHE_TTL,
+                                     keepalive_timeout=KEEPALIVE_EVERY * 3, enable_cleanup_closed=True)
+    return aiohttp.ClientSession(connector=connector, trust_env=True)
+
+
+async def ping(exchange, connections):
+    await asyncio.gather(*(exchange.fetch_time() for _ in range(connections)))
+
+
+async def warm_up(exchange, connections=WARM_CONNECTIONS):
+    start = time.perf_counter()
+    await exchange.load_markets()
+    if exchange.options.get('adjustForTimeDifference'):
+        await exchange.load_time_difference()
+    await ping(exchange, connections)
+    print(f"Exchange {exchange.id} warm: {len(exchange.markets)} markets, "
+          f"{connections} connections, {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+async def keep_alive(exchange, connections=WARM_CONNECTIONS, every=KEEPALIVE_EVERY):
+    while True:
+        await asyncio.sleep(every)
+        try:
+            await ping(exchange, connections)
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] Keep-alive failed: {e}")
+
+
+class AsyncExecutionEngine:
+    """Runs `await execute(exchange, order)` on a background event loop.
+
+    make_exchange(session) builds the ccxt.async_support exchange around the
+    pooled session (None with pooled=False, for the mock exchange). Same submit()/qsize()/close()/stats interface as
+    execution.ExecutionEngine.
+    """
+
+    def __init__(self, make_exchange, execute, max_queue=MAX_QUEUE_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                 pooled=True):
+        self.make_exchange = make_exchange
+        self.pooled = pooled
+        self.execute = execute
+        self.max_in_flight = max_in_flight
+        self.stats = LatencyStats()
+        self.exchange = None
+        self._slots = threading.BoundedSemaphore(max_queue)  # Orders accepted but not started
+        self._queued = 0
+        self._count_lock = threading.Lock()
+        self._queues = {}  # key -> asyncio.Queue, each drained by one task
+        self._tasks = []
+        self._session = None
+        self._ready = threading.Event()
+        self._error = None
+        self._loop = None
+        self._thread = threading.Thread(target=self._run, name='async-exec', daemon=True)
+
+    def start(self):
+        """Start the loop and warm the exchange. Raises if warm-up failed"""
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+        return self
+
+    def submit(self, order, timeout=None):
+        """Queue an order from any thread. Returns False if the engine stayed full for `timeout`"""
+        if not self._slots.acquire(timeout=timeout):
+            return False
+        with self._count_lock:
+            self._queued += 1
+        self._loop.call_soon_threadsafe(self._enqueue, order, time.perf_counter())
+        return True
+
+    def qsize(self):
+        return self._queued
+
+    def close(self):
+        """Finish every queued order, close the exchange and stop the loop"""
+        if self._loop is not None and self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._open())
+        except Exception as e:
+            self._error = e
+            self._loop.run_until_complete(self._close_exchange())
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _open(self):
+        self._session = pooled_session() if self.pooled else None
+        self.exchange = self.make_exchange(self._session)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        await warm_up(self.exchange)
+        self._keep_alive = asyncio.ensure_future(keep_alive(self.exchange))
+
+    def _enqueue(self, order, received):
+        key = order_key(order)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+            self._tasks.append(asyncio.ensure_future(self._drain(queue)))
+        queue.put_nowait((order, received))
+
+    async def _drain(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            order, received = item
+            with self._count_lock:
+                self._queued -= 1
+            self._slots.release()
+            async with self._in_flight:
+                started = time.perf_counter()
+                try:
+                    await self.execute(self.exchange, order)
+                except Exception as e:
+                    print(f"[{time.strftime('%H:%M:%S')}] ERROR in async execution: {e}")
+                self.stats.record(started - received, time.perf_counter() - started)
+
+    async def _shutdown(self):
+        for queue in self._queues.values():
+            queue.put_nowait(None)
+        await asyncio.gather(*self._tasks)
+        self._keep_alive.cancel()
+        await self._close_exchange()
+        self._loop.call_soon(self._loop.stop)
+
+    async def _close_exchange(self):
+        if self.exchange is not None:
+            await self.exchange.close()
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,129 @@
+# Order execution worker pool
+#
+# Each (symbol, strategy) key has its own FIFO of pending orders, and N worker
+# threads take turns on the keys that have work: a key is held by at most one
+# worker at a time, so its orders run strictly in the order they arrived, while
+# other keys run in parallel on the other workers. One slow fill only delays
+# the orders queued behind it for the same key.
+#
+# Every order's queue wait (received -> picked up by a worker) and execution
+# time (the blocking exchange call) are recorded; report() prints percentiles.
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+WORKERS = 4
+MAX_QUEUE_SIZE = 1000  # Pending orders across all keys
+LATENCY_WINDOW = 10000  # Orders kept for the percentile report
+
+
+def order_key(order):
+    return order['symbol'], order.get('strategy_name', 'unknown')
+
+
+class LatencyStats:
+    """Rolling queue-wait / execution latencies (seconds) over the last `window` orders"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.wait = deque(maxlen=window)
+        self.execution = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, wait, execution):
+        self.wait.append(wait)
+        self.execution.append(execution)
+        self.count += 1
+
+    def report(self):
+        if not self.wait:
+            return "no orders yet"
+        wait = np.array(self.wait) * 1e3
+        execution = np.array(self.execution) * 1e3
+        p = [50, 99]
+        w50, w99 = np.percentile(wait, p)
+        e50, e99 = np.percentile(execution, p)
+        return (f"{self.count} orders | queue wait p50 {w50:.2f} ms p99 {w99:.2f} ms | "
+                f"exchange p50 {e50:.1f} ms p99 {e99:.1f} ms")
+
+
+class ExecutionEngine:
+    """N worker threads running execute(order), ordered per (symbol, strategy)"""
+
+    def __init__(self, execute, workers=WORKERS, max_queue=MAX_QUEUE_SIZE):
+        self.execute = execute
+        self.max_queue = max_queue
+        self.stats = LatencyStats()
+        self._cond = threading.Condition()
+        self._pending = {}  # key -> deque of (order, received); present while queued or running
+        self._ready = deque()  # Keys with orders and no worker on them, round robin
+        self._size = 0
+        self._running = 0
+        self._closing = False
+        self.threads = [threading.Thread(target=self._work, name=f'exec-{i}', daemon=True)
+                        for i in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def submit(self, order, timeout=None):
+        """Queue an order. Returns False if the engine stayed full for `timeout` seconds"""
+        key = order_key(order)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size < self.max_queue, timeout):
+                return False
+            item = (order, time.perf_counter())
+            queue = self._pending.get(key)
+            if queue is None:
+                self._pending[key] = deque([item])
+                self._ready.append(key)
+                self._cond.notify_all()
+            else:
+                queue.append(item)  # Its worker (or its place in _ready) picks it up
+            self._size += 1
+        return True
+
+    def qsize(self):
+        return self._size
+
+    def close(self):
+        """Finish every queued order, then stop the workers"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def _work(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._ready:
+                    if self._closing and not self._running:
+                        cond.notify_all()
+                        return
+                    cond.wait()
+                key = self._ready.popleft()
+                order, received = self._pending[key].popleft()
+                self._size -= 1
+                self._running += 1
+                cond.notify_all()  # Room for submit()
+
+            started = time.perf_counter()
+            try:
+                self.execute(order)
+            except Exception as e:
+                print(f"[{time.strftime('%H:%M:%S')}] ERROR in execution worker: {e}")
+            done = time.perf_counter()
+
+            with cond:
+                self.stats.record(started - received, done - started)
+                self._running -= 1
+                if self._pending[key]:
+                    self._ready.append(key)
+                else:
+                    del self._pending[key]
+                cond.notify_all()
@@ -0,0 +1,146 @@
+# Local stand-in for the ccxt exchange in trade.py
+#
+# Fills market orders in full after a configurable delay, so the execution
+# engine can be exercised without an exchange or API keys:
+#
+#   python3 trading/trade.py --mock 0.2                  # every order takes ~200 ms
+#   python3 trading/mock_exchange.py --latency 0.2 --slow BTC/USDT=2.0
+#
+# The second form runs an ExecutionEngine against the mock directly and prints
+# per-symbol completion order and latencies; add --async to run the
+# AsyncExecutionEngine against AsyncMockExchange instead.
+import argparse
+import asyncio
+import itertools
+import random
+import threading
+import time
+
+
+class MockExchange:
+    """ccxt-like market order API with per-symbol latency (seconds) and jitter"""
+
+    id = 'mock'
+
+    def __init__(self, latency=0.05, jitter=0.0, symbol_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.symbol_latency = symbol_latency or {}
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_market_buy_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    def create_market_sell_order(self, symbol, amount, params=None):
+        return self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        order_id, delay = self._next(symbol)
+        time.sleep(delay)
+        return self._filled(order_id, symbol, type, side, amount, price, params)
+
+    def _next(self, symbol):
+        with self._lock:
+            order_id = next(self._ids)
+            delay = self.symbol_latency.get(symbol, self.latency) + self._rng.uniform(0, self.jitter)
+        return order_id, delay
+
+    def _filled(self, order_id, symbol, type, side, amount, price, params):
+        return {
+            'id': str(order_id),
+            'clientOrderId': (params or {}).get('clientOrderId'),
+            'timestamp': int(time.time() * 1000),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'price': price,
+            'amount': amount,
+            'filled': amount,
+            'remaining': 0.0,
+            'status': 'closed',
+            'fee': {'cost': 0.0, 'currency': 'USDT'},
+        }
+
+
+class AsyncMockExchange(MockExchange):
+    """ccxt.async_support-like MockExchange: orders await instead of blocking"""
+
+    def __init__(self, latency=0.05, jitter=0.0, symbol_latency=None, seed=None, session=None):
+        super().__init__(latency, jitter, symbol_latency, seed)
+        self.session = session
+        self.options = {}
+        self.markets = {}
+
+    async def load_markets(self, reload=False):
+        return self.markets
+
+    async def fetch_time(self):
+        return int(time.time() * 1000)
+
+    async def create_market_buy_order(self, symbol, amount, params=None):
+        return await self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    async def create_market_sell_order(self, symbol, amount, params=None):
+        return await self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        order_id, delay = self._next(symbol)
+        await asyncio.sleep(delay)
+        return self._filled(order_id, symbol, type, side, amount, price, params)
+
+    async def close(self):
+        pass
+
+
+if __name__ == '__main__':
+    from execution import ExecutionEngine
+
+    parser = argparse.ArgumentParser(
+                    prog='Mock Exchange',
+                    description='Run the execution engine against a mock exchange with configurable latency.')
+
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per order')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra uniform random seconds per order')
+    parser.add_argument('--slow', nargs='*', default=[], help='Per-symbol latency, e.g. BTC/USDT=2.0')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--orders', type=int, default=20, help='Orders per symbol')
+    parser.add_argument('--symbols', nargs='*', default=['BTC/USDT', 'ETH/USDT', 'XRP/USDT', 'SOL/USDT'])
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the asyncio engine (orders in flight limited by MAX_IN_FLIGHT, not --workers)')
+
+    args = parser.parse_args()
+
+    slow = {s.split('=')[0]: float(s.split('=')[1]) for s in args.slow}
+    done = {symbol: [] for symbol in args.symbols}
+
+    if args.use_async:
+        from async_execution import AsyncExecutionEngine
+
+        async def execute(exchange, order):
+            await exchange.create_market_buy_order(order['symbol'], 1.0)
+            done[order['symbol']].append(order['n'])
+
+        engine = AsyncExecutionEngine(
+            lambda session: AsyncMockExchange(args.latency, args.jitter, slow, session=session), execute,
+            pooled=False).start()
+    else:
+        exchange = MockExchange(args.latency, args.jitter, slow)
+
+        def execute(order):
+            exchange.create_market_buy_order(order['symbol'], 1.0)
+            done[order['symbol']].append(order['n'])
+
+        engine = ExecutionEngine(execute, args.workers).start()
+    start = time.perf_counter()
+    for n in range(args.orders):
+        for symbol in args.symbols:
+            engine.submit({'symbol': symbol, 'strategy_name': 'mock', 'n': n})
+    engine.close()
+    elapsed = time.perf_counter() - start
+
+    for symbol, seq in done.items():
+        print(f"{symbol:<10} {len(seq)} orders, in order: {seq == sorted(seq)}")
+    print(engine.stats.report())
+    print(f"{args.orders * len(args.symbols)} orders in {elapsed:.2f}s")
@@ -1,17 +1,37 @@
 # trade_daemon/trade.py
 import ccxt
+import ccxt.async_support as ccxt_async
 import zmq
 import json
 import time
 import os
+import argparse
+import sys
 import threading
-from queue import Queue
 from collections import deque
-import psycopg2
-from database import insert_trade
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from database import Database
+from trade_writer import TradeWriter
+from risk import RiskEngine, position_topic, encode_positions
+from rate_limit import RateLimiter, attach, ORDER
+from execution import ExecutionEngine, WORKERS
+from async_execution import AsyncExecutionEngine
+from mock_exchange import MockExchange, AsyncMockExchange
 from dotenv import load_dotenv
 load_dotenv()
 
+parser = argparse.ArgumentParser(
+                prog='Trade Daemon',
+                description='Execute strategy orders on the exchange.')
+parser.add_argument('--engine', choices=['async', 'threads'], default='async',
+                    help='async: one warmed ccxt.async_support session, many orders in flight; '
+                         'threads: blocking ccxt on --workers threads')
+parser.add_argument('--workers', type=int, default=WORKERS, help='Execution worker threads (--engine threads)')
+parser.add_argument('--mock', type=float, metavar='LATENCY',
+                    help='Fill orders on a local mock exchange taking LATENCY seconds per order')
+args = parser.parse_args()
+
 # === CONFIG ===
 API_KEY = os.getenv('BINANCE_TESTNET_KEY')
 API_SECRET = os.getenv('BINANCE_TESTNET_SECRET')
@@ -20,23 +40,19 @@ TEST_TRADE_SIZE_USD = 10
 TRADE_PORT = 5001  # Port for receiving trade orders from strategies
 TRADE_URL = f"tcp://127.0.0.1:{TRADE_PORT}"
 MAX_QUEUE_SIZE = 1000  # Maximum orders in queue
+STATS_EVERY = 60  # Seconds between latency reports
+POSITION_PORT = 5002  # PUB: position|<strategy>| snapshots
+POSITION_URL = f"tcp://127.0.0.1:{POSITION_PORT}"
+POSITION_EVERY = 1.0  # Seconds between snapshots, only when positions changed
 # ==================
 
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASS = os.getenv('DB_PASS')
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-
-try:
-    conn = psycopg2.connect(database=DB_NAME,
-                            user=DB_USER,
-                            password=DB_PASS,
-                            host=DB_HOST,
-                            port=DB_PORT)
-    print("Database connected successfully")
-except:
-    print("Database not connected successfully")
+# Pooled connections from DB_NAME/DB_USER/DB_PASS/DB_HOST/DB_PORT, opened on first use
+db = Database.from_env()
+
+# Trades are persisted in batches on the writer's thread (spilled to a local WAL
+# while the database is down), so order execution never waits on Postgres
+trade_writer = TradeWriter(db)
+trade_writer.start()
 
 # Binance with API keys
 # exchange = ccxt.binance({
@@ -46,7 +62,7 @@ except:
 #     'options': {'defaultType': 'spot'}
 # })
 
-exchange = ccxt.binance({
+BINANCE_CONFIG = {
     'apiKey': API_KEY,
     'secret': API_SECRET,
     'enableRateLimit': True,
@@ -58,19 +74,43 @@ exchange = ccxt.binance({
     },
     'options': {
         'defaultType': 'spot',
+        'adjustForTimeDifference': True,  # Synced against server time at startup
     },
     'timeout': 30000,
-})
+}
+
+
+def make_async_exchange(session):
+    """Exchange for the async engine, built on its event loop around the pooled session"""
+    if args.mock is not None:
+        return AsyncMockExchange(latency=args.mock)
+    exchange = ccxt_async.binance({**BINANCE_CONFIG, 'session': session})
+    exchange.set_sandbox_mode(True)
+    return attach(exchange, RateLimiter.for_exchange(exchange), ORDER)
+
+
+VENUE = 'mock' if args.mock is not None else 'binance'
 
-exchange.set_sandbox_mode(True)
-print("Using Binance TESTNET endpoints")
+if args.mock is not None:
+    print(f"Using mock exchange ({args.mock * 1000:.0f} ms per order)")
+else:
+    print("Using Binance TESTNET endpoints")
 
-# === Order Queue ===
-order_queue = Queue(maxsize=MAX_QUEUE_SIZE)
+if args.engine == 'threads':
+    if args.mock is not None:
+        exchange = MockExchange(latency=args.mock)
+    else:
+        exchange = ccxt.binance(BINANCE_CONFIG)
+        exchange.set_sandbox_mode(True)
+        attach(exchange, RateLimiter.for_exchange(exchange), ORDER)
 
 # === Trade Records ===
 trade_records = deque(maxlen=10000)  # Keep last 10,000 trades in memory
 total_trades_count = 0  # Total number of trades executed
+count_lock = threading.Lock()  # Orders execute on several workers
+
+# Net positions and pre-trade limits per (strategy, symbol, venue), shared with backtester_core
+risk = RiskEngine()
 
 # === ZMQ PULL socket (receives orders from strategies) ===
 context = zmq.Context()
@@ -78,88 +118,161 @@ pull_sock = context.socket(zmq.PULL)
 pull_sock.bind(TRADE_URL)
 pull_sock.setsockopt(zmq.RCVTIMEO, 1000)  # 1 second timeout for non-blocking
 
-print(f"Trade Daemon listening on {TRADE_URL}")
+position_sock = context.socket(zmq.PUB)
+position_sock.bind(POSITION_URL)
+
+print(f"Trade Daemon listening on {TRADE_URL} | positions on {POSITION_URL}")
 print(f"Will place ${TEST_TRADE_SIZE_USD} {SYMBOL} orders")
-print(f"Max queue size: {MAX_QUEUE_SIZE}")
+print(f"Max queue size: {MAX_QUEUE_SIZE} | Engine: {args.engine}"
+      + (f" | Workers: {args.workers}" if args.engine == 'threads' else ""))
 print("-" * 60)
 
-def execute_order(order_data):
-    """Execute a trade order on the exchange"""
+def order_amount(order_data):
+    """Order size for a strategy order, or None for an unknown order type"""
+    if order_data['order_type'] not in ('BUY', 'SELL'):
+        print(f"Unknown order type: {order_data['order_type']}")
+        return None
+    # Fixed USD size both ways; risk.net_position() has the strategy's position if
+    # SELL should close it instead
+    return TEST_TRADE_SIZE_USD / order_data['price']
+
+
+def record_trade(order_data, order, amount, exchange_ms, exchange_id):
+    """Keep, persist and print an executed order"""
     global total_trades_count
-    
+
+    order_type = order_data['order_type']
+    symbol = order_data['symbol']
+    price = order_data['price']
+    strategy_name = order_data.get('strategy_name', 'unknown')
+
+    # Record the trade
+    trade_record = {
+        'timestamp': time.time(),
+        'order_id': order['id'],
+        'order_type': "MARKET",  #'MARKET', 'LIMIT', etc.
+        'symbol': symbol,
+        'price': price,
+        'order_size': amount,
+        'side': order_type, #buy or sell
+        'fee': order.get('fee', {}),
+        'exchange': exchange_id,
+        'status': order.get('status', 'unknown'),
+        'strategy_name': strategy_name
+    }
+
+    trade_records.append(trade_record)
+    trade_writer.submit(trade_record)
+    risk.on_fill(strategy_name, symbol, exchange_id, order_type, order.get('filled') or amount,
+                 order.get('average') or order.get('price') or price, accepted=amount)
+    with count_lock:
+        total_trades_count += 1
+        count = total_trades_count
+
+    # One print per order so lines from parallel orders don't interleave
+    print(f"[{time.strftime('%H:%M:%S')}] {order_type} ORDER EXECUTED in {exchange_ms:.1f} ms\n"
+          f"  Order ID: {order['id']}\n"
+          f"  Strategy: {strategy_name}\n"
+          f"  Symbol: {symbol}\n"
+          f"  Type: {order_type}\n"
+          f"  Amount: {amount:.6f}\n"
+          f"  Price: ${price:.6f}\n"
+          f"  Total Trades: {count}\n" + "-" * 60)
+
+    return trade_record
+
+
+def release_order(order_data):
+    """An accepted order that won't fill no longer counts towards its position limit"""
+    risk.release(order_data.get('strategy_name', 'unknown'), order_data['symbol'], VENUE,
+                 order_data['order_type'], order_data['amount'])
+
+
+def execute_order(order_data):
+    """Execute a trade order on the exchange (threads engine)"""
+    order = None
     try:
-        order_type = order_data['order_type']
-        symbol = order_data['symbol']
-        price = order_data['price']
-        strategy_name = order_data.get('strategy_name', 'unknown')
-        
-        # Calculate order amount based on USD size
-        if order_type == 'BUY':
-            amount = TEST_TRADE_SIZE_USD / price
-            order = exchange.create_market_buy_order(symbol, amount)
-            print(f"[{time.strftime('%H:%M:%S')}] BUY ORDER EXECUTED")
-        elif order_type == 'SELL':
-            # For SELL, we need to know how much we have, or use a fixed amount
-            # This is simplified - you may want to track your position
-            amount = TEST_TRADE_SIZE_USD / price
-            order = exchange.create_market_sell_order(symbol, amount)
-            print(f"[{time.strftime('%H:%M:%S')}] SELL ORDER EXECUTED")
+        amount = order_data['amount']
+        sent = time.perf_counter()
+        if order_data['order_type'] == 'BUY':
+            order = exchange.create_market_buy_order(order_data['symbol'], amount)
         else:
-            print(f"Unknown order type: {order_type}")
-            return
-        
-        # Record the trade
-        trade_record = {
-            'timestamp': time.time(),
-            'order_id': order['id'],
-            'order_type': "MARKET",  #'MARKET', 'LIMIT', etc.
-            'symbol': symbol,
-            'price': price,
-            'order_size': amount,
-            'side': order_type, #buy or sell
-            'fee': order.get('fee', {}),
-            'exchange': 'binance',
-            'status': order.get('status', 'unknown'),
-            'strategy_name': strategy_name
-        }
-        
-        trade_records.append(trade_record)
-        trade_record_db = insert_trade(conn, trade_record)
-        total_trades_count += 1
-        
-        print(f"  Order ID: {order['id']}")
-        print(f"  Strategy: {strategy_name}")
-        print(f"  Symbol: {symbol}")
-        print(f"  Type: {order_type}")
-        print(f"  Amount: {amount:.6f}")
-        print(f"  Price: ${price:.6f}")
-        print(f"  Total Trades: {total_trades_count}")
-        print("-" * 60)
-        
-        return trade_record
-        
+            order = exchange.create_market_sell_order(order_data['symbol'], amount)
+        exchange_ms = (time.perf_counter() - sent) * 1000
+        return record_trade(order_data, order, amount, exchange_ms, exchange.id)
+
+    except Exception as e:
+        if order is None:
+            release_order(order_data)  # No order came back from the exchange
+        print(f"[{time.strftime('%H:%M:%S')}] ERROR executing order: {e}")
+        print(f"  Order data: {order_data}")
+        return None
+
+
+async def execute_order_async(exchange, order_data):
+    """Execute a trade order on the shared async exchange (async engine)"""
+    order = None
+    try:
+        amount = order_data['amount']
+        sent = time.perf_counter()
+        if order_data['order_type'] == 'BUY':
+            order = await exchange.create_market_buy_order(order_data['symbol'], amount)
+        else:
+            order = await exchange.create_market_sell_order(order_data['symbol'], amount)
+        exchange_ms = (time.perf_counter() - sent) * 1000
+        return record_trade(order_data, order, amount, exchange_ms, exchange.id)
+
     except Exception as e:
+        if order is None:
+            release_order(order_data)  # No order came back from the exchange
         print(f"[{time.strftime('%H:%M:%S')}] ERROR executing order: {e}")
         print(f"  Order data: {order_data}")
         return None
 
-def process_order_queue():
-    """Process orders from the queue"""
-    while True:
-        try:
-            # Get order from queue (blocks until available)
-            order_data = order_queue.get(timeout=1)
-            execute_order(order_data)
-            order_queue.task_done()
-        except:
-            # Timeout - continue loop
-            continue
-
-# Start order processing thread
-processing_thread = threading.Thread(target=process_order_queue, daemon=True)
-processing_thread.start()
-
-print("Order processing thread started...")
+# Orders run in parallel across (symbol, strategy) keys, in arrival order within a key.
+# The async engine warms the exchange (markets, time sync, open connections) before
+# returning, so no order is accepted until the first one can go out at full speed.
+if args.engine == 'async':
+    engine = AsyncExecutionEngine(make_async_exchange, execute_order_async, MAX_QUEUE_SIZE,
+                                  pooled=args.mock is None).start()
+else:
+    engine = ExecutionEngine(execute_order, args.workers, MAX_QUEUE_SIZE).start()
+last_stats = time.time()
+last_positions = time.time()
+positions_version = risk.version
+
+
+def accept_order(order_data):
+    """Size an incoming order, run the pre-trade checks and queue it"""
+    strategy_name = order_data.get('strategy_name', 'unknown')
+    amount = order_amount(order_data)
+    if amount is None:
+        return
+    # Re-mark open positions at the strategy's price, so the drawdown kill switch
+    # sees losses between fills
+    risk.mark(order_data['symbol'], order_data['price'])
+    reason = risk.check(strategy_name, order_data['symbol'], VENUE, order_data['order_type'],
+                        amount, order_data['price'], time.time())
+    if reason is not None:
+        print(f"[{time.strftime('%H:%M:%S')}] REJECTED order from {strategy_name}: {reason}")
+        return
+    order_data['amount'] = amount
+
+    # Add to queue (will block if queue is full)
+    if engine.submit(order_data, timeout=1):
+        print(f"[{time.strftime('%H:%M:%S')}] Order received from {strategy_name}: {order_data['order_type']} {order_data['symbol']} @ ${order_data['price']:.6f} | Queue: {engine.qsize()}/{MAX_QUEUE_SIZE}")
+    else:
+        release_order(order_data)
+        print(f"[{time.strftime('%H:%M:%S')}] WARNING: Order queue full! Dropping order from {strategy_name}")
+
+
+def publish_positions():
+    now = time.time()
+    for strategy in risk.strategies():
+        position_sock.send_multipart([position_topic(strategy), encode_positions(risk.positions(strategy), now)])
+
+
+print("Execution engine started...")
 print("Waiting for orders from strategies...\n")
 
 # Main loop: receive orders and add to queue
@@ -169,26 +282,37 @@ while True:
         msg = pull_sock.recv_string()
         order_data = json.loads(msg)
         
-        # Add to queue (will block if queue is full)
-        try:
-            order_queue.put(order_data, timeout=1)
-            queue_size = order_queue.qsize()
-            strategy_name = order_data.get('strategy_name', 'unknown')
-            print(f"[{time.strftime('%H:%M:%S')}] Order received from {strategy_name}: {order_data['order_type']} {order_data['symbol']} @ ${order_data['price']:.6f} | Queue: {queue_size}/{MAX_QUEUE_SIZE}")
-        except Exception as queue_error:
-            strategy_name = order_data.get('strategy_name', 'unknown') if 'order_data' in locals() else 'unknown'
-            print(f"[{time.strftime('%H:%M:%S')}] WARNING: Order queue full! Dropping order from {strategy_name}")
-            
+        accept_order(order_data)
+
     except zmq.Again:
         # Timeout - no message received, continue loop
-        continue
+        pass
     except KeyboardInterrupt:
         print("\n\nTrade Daemon stopped.")
-        print(f"Total trades executed: {total_trades_count}")
+        engine.close()
+        print(engine.stats.report())
+        for row in risk.positions():
+            print(f"  {row['strategy']} {row['symbol']}@{row['venue']}: {row['position']:+.6f} "
+                  f"avg {row['avg_cost']:.6f} realized {row['realized']:+.2f} unrealized {row['unrealized']:+.2f}")
+        print(f"Total trades executed: {total_trades_count} | rejected by risk: {risk.rejected}")
         print(f"Recent trades in memory: {len(trade_records)}")
+        trade_writer.close()
+        db.close()
+        print(f"Trades persisted: {trade_writer.written} | spilled to WAL: {trade_writer.spilled} | "
+              f"rejected: {trade_writer.rejected}")
         pull_sock.close()
+        position_sock.close()
         context.term()
         break
     except Exception as e:
         print(f"[{time.strftime('%H:%M:%S')}] Error receiving order: {e}")
-        time.sleep(1)
\ No newline at end of file
+        time.sleep(1)
+
+    if risk.version != positions_version and time.time() - last_positions >= POSITION_EVERY:
+        positions_version = risk.version
+        publish_positions()
+        last_positions = time.time()
+
+    if time.time() - last_stats >= STATS_EVERY:
+        print(f"[{time.strftime('%H:%M:%S')}] Execution: {engine.stats.report()}")
+        last_stats = time.time()
\ No newline at end of file